@@ -0,0 +1,79 @@
+import argparse
+import time
+import torch
+from torch.utils.data import DataLoader
+from transformers import Blip2Processor, Blip2ForConditionalGeneration
+from blip2_finetuning import DATA_ROOT, MODEL_ID, ChartImageDataset, Blip2Collator, get_tensor_cache_source
+from streaming_dataset import StreamingChartDataset
+from tensor_cache import TensorCacheDataset, TensorCacheCollator, build_tensor_cache, has_tensor_cache
+
+
+def measure(loader, num_steps: int, model=None) -> tuple:
+    # Seconds to the first batch, then steps/s and samples/s over the next num_steps batches.
+    # With a model, each step also runs forward and backward.
+    steps, samples = 0, 0
+    start_time = time.perf_counter()
+    batches = iter(loader)
+    next(batches)
+    first_batch_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    while True:
+        for batch in batches:
+            if model is not None:
+                labels = batch.pop("labels")
+                logits = model(**batch).logits
+                loss = torch.nn.functional.cross_entropy(logits.view(-1, logits.size(-1)), labels.view(-1))
+                loss.backward()
+                model.zero_grad(set_to_none=True)
+            steps += 1
+            samples += len(batch["pixel_values"])
+            if steps == num_steps:
+                elapsed = time.perf_counter() - start_time
+                return first_batch_time, steps / elapsed, samples / elapsed
+        batches = iter(loader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BLIP-2 input pipelines: PNGs, tensor cache and streaming.")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--tensor-cache", default="tensor_cache")
+    parser.add_argument("--model-id", default=MODEL_ID, help="Hub id or local folder of the processor and model.")
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=8, help="Batch size of the cached and streaming pipelines.")
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--render-workers", type=int, default=2, help="Render processes of the streaming pipeline.")
+    parser.add_argument("--with-model", action="store_true", help="Also run forward and backward passes.")
+    args = parser.parse_args()
+
+    processor = Blip2Processor.from_pretrained(args.model_id)
+    chart_dataset = ChartImageDataset(args.data_root)
+    source = get_tensor_cache_source(args.data_root, chart_dataset, args.model_id)
+    if not has_tensor_cache(args.tensor_cache, source):
+        start_time = time.perf_counter()
+        build_tensor_cache(chart_dataset, processor, args.tensor_cache, source)
+        print(f"Built the tensor cache in {time.perf_counter() - start_time:.1f}s (one-time cost)")
+    model = Blip2ForConditionalGeneration.from_pretrained(args.model_id).train() if args.with_model else None
+
+    cached = TensorCacheDataset(args.tensor_cache)
+    pipelines = [
+        ("PNG + processor, batch 1", DataLoader(
+            chart_dataset, batch_size=1, shuffle=True, collate_fn=Blip2Collator(processor)
+        )),
+        (f"tensor cache, batch {args.batch_size}, {args.num_workers} workers", DataLoader(
+            cached, batch_size=args.batch_size, shuffle=True, num_workers=args.num_workers,
+            collate_fn=TensorCacheCollator(cached.pad_token_id), persistent_workers=args.num_workers > 0
+        )),
+        (f"streaming, batch {args.batch_size}, {args.render_workers} render workers", DataLoader(
+            StreamingChartDataset(render_workers=args.render_workers), batch_size=args.batch_size,
+            collate_fn=Blip2Collator(processor)
+        ))
+    ]
+    # Streaming has to start its render processes and fill the shuffle buffer first, so that is reported apart
+    print(f"{'pipeline':45} {'first s':>8} {'steps/s':>9} {'samples/s':>10}")
+    for label, loader in pipelines:
+        first_batch_time, steps_per_second, samples_per_second = measure(loader, args.steps, model)
+        print(f"{label:45} {first_batch_time:8.2f} {steps_per_second:9.2f} {samples_per_second:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import os
 import json
 from PIL import Image
@@ -10,14 +11,12 @@ from transformers import (
     TrainingArguments,
     Trainer
 )
+from tensor_cache import TensorCacheDataset, TensorCacheCollator, build_tensor_cache, has_tensor_cache
+from streaming_dataset import StreamingChartDataset, create_question
 
 DATA_ROOT = "test_images"
 MODEL_ID = "Salesforce/blip2-flan-t5-xl"
 
-processor = Blip2Processor.from_pretrained(MODEL_ID)
-model = Blip2ForConditionalGeneration.from_pretrained(MODEL_ID, device_map="auto")
-
-from transformers import Trainer
 
 class CustomTrainer(Trainer):
     def __init__(self, *args, tokenizer=None, **kwargs):
@@ -36,19 +35,14 @@ class CustomTrainer(Trainer):
         return (loss, outputs) if return_outputs else loss
 
 def create_prompt(entry):
-    chart_type = entry.get("type", "bar")
     points = entry.get("points", [])
     if len(points) < 3:
         return None, None
-    x_val = points[2]["x"]
-    y_val = points[2]["y"]
-    if chart_type == "bar":
-        return f"What is the y value for x = {x_val} in the bar chart?", str(y_val)
-    elif chart_type == "line":
-        return f"What is the y value for x = {x_val} on the line?", str(round(y_val, 2))
-    elif chart_type == "scatter":
-        return f"What is the y value of the point closest to x = {x_val}?", str(round(y_val, 2))
-    return None, None
+    return create_question(entry.get("type", "bar"), points[2])
+
+def get_tensor_cache_source(data_root: str, dataset, model_id: str = MODEL_ID) -> dict:
+    # What the cached tensors were computed from; charts added to data_root later change num_samples
+    return {"data_root": os.path.abspath(data_root), "model_id": model_id, "num_samples": len(dataset)}
 
 class ChartImageDataset(Dataset):
     def __init__(self, folder):
@@ -58,6 +52,14 @@ class ChartImageDataset(Dataset):
             "line_poly_charts": "line_poly_metadata.jsonl",
             "scatter_charts": "scatter_metadata.jsonl"
         }
+        # Output of images_generator/generate_charts.py is split into shard-NNNNN folders of the same layout
+        shard_dirs = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder) if name.startswith("shard-")
+        )
+        for root in [folder] + shard_dirs:
+            self._load_folder(root, type_to_metadata)
+
+    def _load_folder(self, folder, type_to_metadata):
         for chart_type, metadata_file in type_to_metadata.items():
             type_dir = os.path.join(folder, chart_type)
             metadata_path = os.path.join(type_dir, metadata_file)
@@ -112,26 +114,68 @@ class Blip2Collator:
 
         return inputs
 
-dataset = ChartImageDataset(DATA_ROOT)
-print(f"Loaded {len(dataset)} multimodal examples.")
-
-training_args = TrainingArguments(
-    output_dir="./finetuned-blip2",
-    per_device_train_batch_size=1,  # CPU-friendly
-    num_train_epochs=3,
-    logging_dir="./logs",
-    logging_steps=10,
-    save_steps=500,
-    save_total_limit=2,
-    remove_unused_columns=False
-)
-
-trainer = CustomTrainer(
-    tokenizer=processor.tokenizer,
-    model=model,
-    args=training_args,
-    train_dataset=dataset,
-    data_collator=Blip2Collator(processor)
-)
-
-trainer.train()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fine-tune BLIP-2 on the synthetic chart Q/A samples.")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--tensor-cache", help="Train from pre-processed memory-mapped tensors in this folder; "
+                                               "built from --data-root on the first run.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Render charts in memory while training instead of reading --data-root. "
+                             "Needs --max-steps.")
+    parser.add_argument("--max-steps", type=int, default=-1)
+    parser.add_argument("--render-workers", type=int, default=2, help="Chart rendering processes for --stream.")
+    parser.add_argument("--questions-per-chart", type=int, default=8, help="Samples per rendered chart for --stream.")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--num-workers", type=int, default=0, help="DataLoader worker processes.")
+    parser.add_argument("--epochs", type=float, default=3)
+    args = parser.parse_args(argv)
+    if args.stream and args.max_steps <= 0:
+        parser.error("--stream has no epochs; set --max-steps")
+
+    processor = Blip2Processor.from_pretrained(MODEL_ID)
+    if args.stream:
+        dataset = StreamingChartDataset(
+            questions_per_chart=args.questions_per_chart, render_workers=args.render_workers
+        )
+        collator = Blip2Collator(processor)
+    elif args.tensor_cache:
+        chart_dataset = ChartImageDataset(args.data_root)
+        source = get_tensor_cache_source(args.data_root, chart_dataset)
+        if not has_tensor_cache(args.tensor_cache, source):
+            build_tensor_cache(chart_dataset, processor, args.tensor_cache, source)
+        dataset = TensorCacheDataset(args.tensor_cache)
+        collator = TensorCacheCollator(dataset.pad_token_id)
+    else:
+        dataset = ChartImageDataset(args.data_root)
+        collator = Blip2Collator(processor)
+    if not args.stream:
+        print(f"Loaded {len(dataset)} multimodal examples.")
+
+    model = Blip2ForConditionalGeneration.from_pretrained(MODEL_ID, device_map="auto")
+    training_args = TrainingArguments(
+        output_dir="./finetuned-blip2",
+        per_device_train_batch_size=args.batch_size,
+        num_train_epochs=args.epochs,
+        max_steps=args.max_steps,
+        dataloader_num_workers=args.num_workers,
+        logging_dir="./logs",
+        logging_steps=10,
+        save_steps=500,
+        save_total_limit=2,
+        remove_unused_columns=False
+    )
+
+    trainer = CustomTrainer(
+        tokenizer=processor.tokenizer,
+        model=model,
+        args=training_args,
+        train_dataset=dataset,
+        data_collator=collator
+    )
+
+    metrics = trainer.train().metrics
+    print(f"{metrics['train_steps_per_second']:.3f} steps/s, {metrics['train_samples_per_second']:.3f} samples/s")
+
+
+if __name__ == "__main__":
+    main()
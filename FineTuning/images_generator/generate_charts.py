@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+SHARD_DIR_FORMAT = "shard-{:05d}"
+
+SCATTER_FUNCTIONS = {
+    "sin": lambda x: np.sin(x) * 10,
+    "cos": lambda x: np.cos(x) * 15,
+    "linear": lambda x: 5 * x,
+    "quad": lambda x: 0.5 * (x - 5) ** 2
+}
+
+
+def sample_bar_chart(rng) -> dict:
+    num_bars = int(rng.integers(10, 31))
+    x = np.arange(num_bars)
+    y_shift = rng.uniform(10, 40)
+    y = rng.uniform(10, 60, size=num_bars) + rng.normal(0, 3.5, size=num_bars) + y_shift
+    return {
+        "metadata": {"num_bars": num_bars, "y_shift": round(y_shift, 2)},
+        "x": x,
+        "y": y,
+        "points": [{"x": int(xi), "y": round(float(yi), 2)} for xi, yi in zip(x, y)]
+    }
+
+
+def sample_line_chart(rng) -> dict:
+    num_points = int(rng.integers(20, 31))
+    x_min = rng.uniform(0, 5)
+    x_max = rng.uniform(10, 20)
+    x = np.linspace(x_min, x_max, num_points)
+    degree = int(rng.integers(1, 5))
+    coeffs = rng.uniform(-2, 2, size=degree + 1)
+    y_shift = rng.uniform(20, 80)
+    y = np.polyval(coeffs, x) + rng.normal(0, 2.0, num_points) + y_shift
+    return {
+        "metadata": {
+            "degree": degree,
+            "coefficients": [round(float(c), 3) for c in coeffs],
+            "num_points": num_points,
+            "x_range": [round(x_min, 2), round(x_max, 2)],
+            "y_shift": round(y_shift, 2)
+        },
+        "x": x,
+        "y": y,
+        "points": [{"x": round(float(xi), 2), "y": round(float(yi), 2)} for xi, yi in zip(x, y)]
+    }
+
+
+def sample_scatter_chart(rng) -> dict:
+    num_points = int(rng.integers(20, 51))
+    x_min = rng.uniform(0, 5)
+    x_max = rng.uniform(10, 20)
+    x = np.linspace(x_min, x_max, num_points)
+    func_name = str(rng.choice(list(SCATTER_FUNCTIONS)))
+    y_shift = rng.uniform(20, 80)
+    y = SCATTER_FUNCTIONS[func_name](x) + rng.normal(0, 1.5, num_points) + y_shift
+    return {
+        "metadata": {
+            "function": func_name,
+            "num_points": num_points,
+            "x_range": [round(x_min, 2), round(x_max, 2)],
+            "y_shift": round(y_shift, 2)
+        },
+        "x": x,
+        "y": y,
+        "points": [{"x": round(float(xi), 2), "y": round(float(yi), 2)} for xi, yi in zip(x, y)]
+    }
+
+
+def draw_bar_chart(ax, chart: dict, number: int):
+    ax.bar(chart["x"], chart["y"], color="steelblue", alpha=0.9)
+    ax.set_title(f"Bar Chart #{number}")
+    ax.set_xlabel("Category Index")
+    ax.set_ylabel("Value")
+    ax.grid(axis='y')
+
+
+def draw_line_chart(ax, chart: dict, number: int):
+    ax.plot(chart["x"], chart["y"], linestyle='-', color="darkgreen", alpha=0.9)
+    ax.set_title(f"Line/Poly Chart #{number} (degree {chart['metadata']['degree']})")
+    ax.set_xlabel("X Axis")
+    ax.set_ylabel("Y Axis")
+    ax.grid(True)
+
+
+def draw_scatter_chart(ax, chart: dict, number: int):
+    ax.scatter(chart["x"], chart["y"], color="darkblue", alpha=0.8)
+    ax.set_title(f"Scatter Chart #{number} ({chart['metadata']['function']})")
+    ax.set_xlabel("X Axis")
+    ax.set_ylabel("Y Axis")
+    ax.grid(True)
+
+
+# Directory and metadata names match what ChartImageDataset and run_benchmark.py read
+CHART_TYPES = {
+    "bar": {
+        "dir": "bar_charts",
+        "metadata": "bar_metadata.jsonl",
+        "figsize": (8, 4),
+        "sample": sample_bar_chart,
+        "draw": draw_bar_chart
+    },
+    "line": {
+        "dir": "line_poly_charts",
+        "metadata": "line_poly_metadata.jsonl",
+        "figsize": (6, 4),
+        "sample": sample_line_chart,
+        "draw": draw_line_chart
+    },
+    "scatter": {
+        "dir": "scatter_charts",
+        "metadata": "scatter_metadata.jsonl",
+        "figsize": (6, 4),
+        "sample": sample_scatter_chart,
+        "draw": draw_scatter_chart
+    }
+}
+
+# One figure per chart type per worker process, cleared and redrawn for every chart
+_figures = {}
+
+
+def _get_figure(chart_type: str) -> Figure:
+    if chart_type not in _figures:
+        figure = Figure(figsize=CHART_TYPES[chart_type]["figsize"])
+        figure.add_subplot()
+        _figures[chart_type] = figure
+    return _figures[chart_type]
+
+
+def draw_chart(chart_type: str, chart: dict, number: int) -> Figure:
+    figure = _get_figure(chart_type)
+    ax = figure.axes[0]
+    ax.clear()
+    CHART_TYPES[chart_type]["draw"](ax, chart, number)
+    figure.tight_layout()
+    return figure
+
+
+def render_chart(chart_type: str, chart: dict, number: int, dpi: int) -> np.ndarray:
+    # RGB pixels straight from the Agg buffer, for training streams that never write a PNG
+    figure = _get_figure(chart_type)
+    figure.set_dpi(dpi)
+    canvas = FigureCanvasAgg(draw_chart(chart_type, chart, number))
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())[:, :, :3].copy()
+
+
+def shard_rng(seed: int, chart_type: str, shard_index: int):
+    # Depends only on (seed, type, shard), so a shard renders the same charts whichever worker runs it
+    return np.random.default_rng([seed, list(CHART_TYPES).index(chart_type), shard_index])
+
+
+def _count_complete_lines(metadata_path: str) -> int:
+    # Drops a line cut short by an interrupted run, so the shard can continue after the last whole chart
+    if not os.path.exists(metadata_path):
+        return 0
+    with open(metadata_path, "rb") as f:
+        content = f.read()
+    complete = content[:content.rfind(b"\n") + 1]
+    if len(complete) != len(content):
+        with open(metadata_path, "wb") as f:
+            f.write(complete)
+    return complete.count(b"\n")
+
+
+def generate_shard(output_dir: str, chart_type: str, shard_index: int, num_charts: int, shard_size: int,
+                   seed: int, dpi: int) -> dict:
+    cfg = CHART_TYPES[chart_type]
+    shard_name = SHARD_DIR_FORMAT.format(shard_index)
+    type_dir = os.path.join(output_dir, shard_name, cfg["dir"])
+    os.makedirs(type_dir, exist_ok=True)
+    metadata_path = os.path.join(type_dir, cfg["metadata"])
+    already_done = _count_complete_lines(metadata_path)
+
+    rng = shard_rng(seed, chart_type, shard_index)
+    start_time = time.perf_counter()
+    rendered = 0
+
+    with open(metadata_path, "a", encoding="utf-8") as f:
+        for i in range(num_charts):
+            # Sampling always runs, so skipped charts still advance the generator and resumed shards match
+            chart = cfg["sample"](rng)
+            chart_id = str(uuid.UUID(bytes=rng.bytes(16), version=4))
+            if i < already_done:
+                continue
+
+            filename = f"{chart_id}.png"
+            figure = draw_chart(chart_type, chart, shard_index * shard_size + i + 1)
+            figure.savefig(os.path.join(type_dir, filename), dpi=dpi)
+
+            f.write(json.dumps({
+                "id": chart_id,
+                **chart["metadata"],
+                "image": f"{shard_name}/{cfg['dir']}/{filename}",
+                "points": chart["points"]
+            }) + "\n")
+            f.flush()
+            rendered += 1
+
+    return {
+        "chart_type": chart_type,
+        "shard": shard_name,
+        "rendered": rendered,
+        "skipped": min(already_done, num_charts),
+        "seconds": time.perf_counter() - start_time
+    }
+
+
+def plan_shards(chart_types: list, num_charts: int, shard_size: int) -> list:
+    shards = []
+    for chart_type in chart_types:
+        for shard_index in range((num_charts + shard_size - 1) // shard_size):
+            shards.append((chart_type, shard_index, min(shard_size, num_charts - shard_index * shard_size)))
+    return shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render synthetic bar, line and scatter charts with ground truth.")
+    parser.add_argument("--output", default="test_images", help="Output root; each shard-NNNNN directory in it is a ChartImageDataset folder")
+    parser.add_argument("--types", nargs="+", choices=list(CHART_TYPES), default=list(CHART_TYPES))
+    parser.add_argument("--num-charts", type=int, default=20, help="Charts per chart type")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Charts per shard directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=100)
+    args = parser.parse_args()
+
+    shards = plan_shards(args.types, args.num_charts, args.shard_size)
+    print(f"{args.num_charts} charts per type in {len(shards)} shards, {args.workers} workers, seed {args.seed}")
+
+    start_time = time.perf_counter()
+    total_rendered = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(generate_shard, args.output, chart_type, shard_index, count, args.shard_size,
+                            args.seed, args.dpi)
+            for chart_type, shard_index, count in shards
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            total_rendered += result["rendered"]
+            resumed = f", {result['skipped']} already done" if result["skipped"] else ""
+            print(f"[{done}/{len(shards)}] {result['chart_type']} {result['shard']}: "
+                  f"{result['rendered']} charts in {result['seconds']:.1f}s{resumed}")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Rendered {total_rendered} charts in {elapsed:.1f}s ({total_rendered / max(elapsed, 1e-9):.1f} charts/s) "
+          f"into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import multiprocessing
+import queue
+import numpy as np
+from PIL import Image
+from torch.utils.data import IterableDataset, get_worker_info
+from images_generator.generate_charts import CHART_TYPES, render_chart
+
+
+def create_question(chart_type, point):
+    x_val = point["x"]
+    y_val = point["y"]
+    if chart_type == "bar":
+        return f"What is the y value for x = {x_val} in the bar chart?", str(y_val)
+    elif chart_type == "line":
+        return f"What is the y value for x = {x_val} on the line?", str(round(y_val, 2))
+    elif chart_type == "scatter":
+        return f"What is the y value of the point closest to x = {x_val}?", str(round(y_val, 2))
+    return None, None
+
+
+def _render_worker(seed, stream_index, worker_index, chart_types, questions_per_chart, dpi, output_queue,
+                   stop_event):
+    # Items left in the pipe must not keep this process alive once training has stopped reading
+    output_queue.cancel_join_thread()
+    rng = np.random.default_rng([seed, stream_index, worker_index])
+    number = 0
+    while not stop_event.is_set():
+        chart_type = chart_types[int(rng.integers(len(chart_types)))]
+        chart = CHART_TYPES[chart_type]["sample"](rng)
+        number += 1
+        pixels = render_chart(chart_type, chart, number, dpi)
+        picked = rng.choice(len(chart["points"]), min(questions_per_chart, len(chart["points"])), replace=False)
+        samples = [create_question(chart_type, chart["points"][index]) for index in picked]
+
+        while not stop_event.is_set():
+            try:
+                output_queue.put((pixels, samples), timeout=0.5)
+                break
+            except queue.Full:
+                continue
+
+
+class StreamingChartDataset(IterableDataset):
+    # Charts are sampled and rendered in memory by background processes, using the same distributions
+    # as generate_charts.py, and every chart yields several question/answer samples.
+    # A bounded queue keeps rendering at most prefetch_charts ahead of training.
+    def __init__(self, num_charts=None, chart_types=None, questions_per_chart=8, render_workers=2,
+                 prefetch_charts=32, shuffle_buffer=256, dpi=100, seed=0):
+        self.num_charts = num_charts
+        self.chart_types = list(chart_types or CHART_TYPES)
+        self.questions_per_chart = questions_per_chart
+        self.render_workers = render_workers
+        self.prefetch_charts = prefetch_charts
+        self.shuffle_buffer = shuffle_buffer
+        self.dpi = dpi
+        self.seed = seed
+
+    def _charts(self, stream_index):
+        context = multiprocessing.get_context("spawn")
+        output_queue = context.Queue(maxsize=self.prefetch_charts)
+        stop_event = context.Event()
+        workers = [
+            context.Process(
+                target=_render_worker, daemon=True,
+                args=(self.seed, stream_index, worker_index, self.chart_types, self.questions_per_chart, self.dpi,
+                      output_queue, stop_event)
+            )
+            for worker_index in range(self.render_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            produced = 0
+            while self.num_charts is None or produced < self.num_charts:
+                try:
+                    item = output_queue.get(timeout=1)
+                except queue.Empty:
+                    # Without this check a crashed renderer would leave training waiting forever
+                    if not any(worker.is_alive() for worker in workers):
+                        raise RuntimeError(
+                            f"The chart render workers exited (exit codes {[worker.exitcode for worker in workers]})"
+                        )
+                    continue
+                yield item
+                produced += 1
+        finally:
+            stop_event.set()
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+
+    def __iter__(self):
+        # Under a multi-worker DataLoader every loader worker runs its own render processes and seeds
+        worker_info = get_worker_info()
+        stream_index = worker_info.id if worker_info else 0
+        rng = np.random.default_rng([self.seed, stream_index])
+
+        # Samples of one chart are spread out, so a batch rarely holds several questions about the same image
+        buffer = []
+        for pixels, samples in self._charts(stream_index):
+            image = Image.fromarray(pixels)
+            for prompt, answer in samples:
+                buffer.append({"image": image, "prompt": prompt, "answer": answer})
+            while len(buffer) > self.shuffle_buffer:
+                index = int(rng.integers(len(buffer)))
+                buffer[index], buffer[-1] = buffer[-1], buffer[index]
+                yield buffer.pop()
+        rng.shuffle(buffer)
+        yield from buffer
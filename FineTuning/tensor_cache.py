@@ -0,0 +1,174 @@
+import json
+import os
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+INDEX_FILE = "index.json"
+SHARD_DIR_FORMAT = "shard-{:05d}"
+CACHE_ARRAYS = ("pixel_values", "input_ids", "input_lengths", "labels", "label_lengths")
+
+
+def _pack_rows(ids: np.ndarray, mask: np.ndarray, max_length: int) -> tuple:
+    # Left-aligns the real tokens of every row, so a batch can later be cut to its longest row
+    lengths = mask.sum(axis=1).astype(np.int32)
+    if lengths.max() > max_length:
+        raise ValueError(f"A sequence has {lengths.max()} tokens, more than the cache's {max_length}; raise the limit.")
+    rows = np.zeros((len(ids), max_length), dtype=np.int32)
+    for row, (row_ids, row_mask) in enumerate(zip(ids, mask)):
+        rows[row, :lengths[row]] = row_ids[row_mask.astype(bool)]
+    return rows, lengths
+
+
+def _open_shard_arrays(shard_dir: str, count: int, pixel_shape: tuple, pixel_dtype: str,
+                       max_prompt_length: int, max_label_length: int) -> dict:
+    shapes = {
+        "pixel_values": ((count,) + pixel_shape, pixel_dtype),
+        "input_ids": ((count, max_prompt_length), np.int32),
+        "input_lengths": ((count,), np.int32),
+        "labels": ((count, max_label_length), np.int32),
+        "label_lengths": ((count,), np.int32)
+    }
+    return {
+        name: np.lib.format.open_memmap(os.path.join(shard_dir, name + ".npy"), mode="w+", dtype=dtype, shape=shape)
+        for name, (shape, dtype) in shapes.items()
+    }
+
+
+def _cache_settings(source: dict, max_prompt_length: int, max_label_length: int, pixel_dtype: str) -> dict:
+    return {**source, "max_prompt_length": max_prompt_length, "max_label_length": max_label_length,
+            "pixel_dtype": pixel_dtype}
+
+
+def build_tensor_cache(dataset, processor, cache_dir: str, source: dict, shard_size: int = 1024, batch_size: int = 32,
+                       max_prompt_length: int = 128, max_label_length: int = 16, pixel_dtype: str = "float16"):
+    # One pass of the image processor and tokenizer over a ChartImageDataset. float16 pixels halve the
+    # cache and are widened back to float32 by TensorCacheCollator. source describes what the cache was
+    # built from (see get_tensor_cache_source) and is stored in the index for has_tensor_cache.
+    os.makedirs(cache_dir, exist_ok=True)
+    # A rebuild replaces the shards in place, so the old index must not outlive them
+    if os.path.exists(os.path.join(cache_dir, INDEX_FILE)):
+        os.remove(os.path.join(cache_dir, INDEX_FILE))
+    shards = []
+    for shard_index, shard_start in enumerate(range(0, len(dataset), shard_size)):
+        count = min(shard_size, len(dataset) - shard_start)
+        shard_name = SHARD_DIR_FORMAT.format(shard_index)
+        shard_dir = os.path.join(cache_dir, shard_name)
+        os.makedirs(shard_dir, exist_ok=True)
+
+        arrays = None
+        for offset in range(0, count, batch_size):
+            items = [dataset[shard_start + i] for i in range(offset, min(offset + batch_size, count))]
+            inputs = processor(
+                images=[item["image"] for item in items], text=[item["prompt"] for item in items],
+                padding="longest", return_tensors="np"
+            )
+            labels = processor.tokenizer([item["answer"] for item in items], padding="longest", return_tensors="np")
+            if arrays is None:
+                arrays = _open_shard_arrays(shard_dir, count, inputs["pixel_values"].shape[1:], pixel_dtype,
+                                            max_prompt_length, max_label_length)
+
+            end = offset + len(items)
+            arrays["pixel_values"][offset:end] = inputs["pixel_values"]
+            arrays["input_ids"][offset:end], arrays["input_lengths"][offset:end] = _pack_rows(
+                inputs["input_ids"], inputs["attention_mask"], max_prompt_length
+            )
+            arrays["labels"][offset:end], arrays["label_lengths"][offset:end] = _pack_rows(
+                labels["input_ids"], labels["attention_mask"], max_label_length
+            )
+
+        for array in arrays.values():
+            array.flush()
+        shards.append({"dir": shard_name, "size": count})
+        print(f"Cached {shard_start + count}/{len(dataset)} samples")
+
+    # Written last, so an interrupted build is never mistaken for a complete cache
+    index = {
+        "shards": shards,
+        "pad_token_id": processor.tokenizer.pad_token_id,
+        "settings": _cache_settings(source, max_prompt_length, max_label_length, pixel_dtype)
+    }
+    with open(os.path.join(cache_dir, INDEX_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(os.path.join(cache_dir, INDEX_FILE + ".tmp"), os.path.join(cache_dir, INDEX_FILE))
+
+
+def has_tensor_cache(cache_dir: str, source: dict, max_prompt_length: int = 128, max_label_length: int = 16,
+                     pixel_dtype: str = "float16") -> bool:
+    # A cache built from other charts, with another model's processor or other limits has to be rebuilt
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path, "r", encoding="utf-8") as f:
+        settings = json.load(f).get("settings")
+    if settings != _cache_settings(source, max_prompt_length, max_label_length, pixel_dtype):
+        print(f"The tensor cache in {cache_dir} was built with other settings ({settings}); rebuilding it")
+        return False
+    return True
+
+
+class TensorCacheDataset(Dataset):
+    # Items are read-only views into the memory-mapped shards; nothing is decoded or tokenized per step
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.pad_token_id = self.index["pad_token_id"]
+        self.offsets = np.cumsum([0] + [shard["size"] for shard in self.index["shards"]])
+        self._shards = None
+
+    def __getstate__(self):
+        # DataLoader workers map the files themselves instead of receiving pickled copies of the arrays
+        state = self.__dict__.copy()
+        state["_shards"] = None
+        return state
+
+    def _open_shards(self):
+        self._shards = [
+            {name: np.load(os.path.join(self.cache_dir, shard["dir"], name + ".npy"), mmap_mode="r")
+             for name in CACHE_ARRAYS}
+            for shard in self.index["shards"]
+        ]
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, idx):
+        if self._shards is None:
+            self._open_shards()
+        shard_index = int(np.searchsorted(self.offsets, idx, side="right")) - 1
+        row = idx - self.offsets[shard_index]
+        return {name: array[row] for name, array in self._shards[shard_index].items()}
+
+
+class TensorCacheCollator:
+    # Produces the same inputs as Blip2Collator; stacking the rows is the only copy a batch needs
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
+
+    def _pad(self, rows: list, lengths: list) -> tuple:
+        lengths = np.array(lengths)
+        max_length = int(lengths.max())
+        ids = np.stack(rows)[:, :max_length].astype(np.int64)
+        mask = np.arange(max_length)[None, :] < lengths[:, None]
+        ids[~mask] = self.pad_token_id
+        return torch.from_numpy(ids), torch.from_numpy(mask.astype(np.int64))
+
+    def __call__(self, batch):
+        pixel_values = torch.from_numpy(np.stack([item["pixel_values"] for item in batch])).float()
+        input_ids, attention_mask = self._pad(
+            [item["input_ids"] for item in batch], [item["input_lengths"] for item in batch]
+        )
+        labels, _ = self._pad([item["labels"] for item in batch], [item["label_lengths"] for item in batch])
+
+        decoder_input_ids = labels.clone()
+        decoder_input_ids[:, 1:] = labels[:, :-1]
+        decoder_input_ids[:, 0] = self.pad_token_id
+
+        return {
+            "pixel_values": pixel_values,
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": labels,
+            "decoder_input_ids": decoder_input_ids
+        }
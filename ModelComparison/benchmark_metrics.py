@@ -0,0 +1,247 @@
+import argparse
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+METRIC_COLUMNS = ["chart_type", "y_true", "abs_error", "inference_time"]
+ACCURACY_THRESHOLD = 5.0
+LATENCY_PERCENTILES = (50, 95, 99)
+CONFIDENCE_LEVEL = 0.95
+# Cap on bootstrap samples drawn at once (replicates * rows), to bound memory on large groups
+BOOTSTRAP_BATCH_ELEMENTS = 10_000_000
+# Streaming mode approximates quantiles with fixed log-spaced histograms (about 1% bin width)
+LATENCY_HISTOGRAM_EDGES = np.logspace(-4, 4, 1601)
+ERROR_HISTOGRAM_EDGES = np.logspace(-6, 9, 3001)
+
+
+def find_result_files(results_dir: str) -> dict:
+    # "<model>_results_<chart type>.csv", as written by run_benchmark.py and the notebooks
+    result_files = {}
+    for path in sorted(glob.glob(os.path.join(results_dir, "*_results_*.csv"))):
+        model = os.path.basename(path).rsplit("_results_", 1)[0]
+        result_files.setdefault(model, []).append(path)
+    return result_files
+
+
+def bootstrap_mean_ci(values: np.ndarray, num_resamples: int, rng, confidence: float = CONFIDENCE_LEVEL):
+    if len(values) == 0:
+        return np.nan, np.nan
+    means = np.empty(num_resamples)
+    batch_size = max(1, BOOTSTRAP_BATCH_ELEMENTS // len(values))
+    for start in range(0, num_resamples, batch_size):
+        stop = min(start + batch_size, num_resamples)
+        indices = rng.integers(0, len(values), size=(stop - start, len(values)), dtype=np.int32)
+        means[start:stop] = values[indices].mean(axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return low, high
+
+
+def _relative_errors(abs_error: np.ndarray, y_true: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_error = abs_error / np.abs(y_true)
+    return rel_error[np.isfinite(rel_error)]
+
+
+def compute_metrics(y_true: np.ndarray, abs_error: np.ndarray, inference_time: np.ndarray,
+                    num_resamples: int, rng) -> dict:
+    # Rows without a parsed prediction have no error; like the notebooks, they count as misses in accuracy
+    valid_errors = abs_error[~np.isnan(abs_error)]
+    latencies = inference_time[~np.isnan(inference_time)]
+    mae_ci_low, mae_ci_high = bootstrap_mean_ci(valid_errors, num_resamples, rng)
+    latency_percentiles = (
+        np.percentile(latencies, LATENCY_PERCENTILES) if len(latencies) else [np.nan] * len(LATENCY_PERCENTILES)
+    )
+    latency_avg = latencies.mean() if len(latencies) else np.nan
+    rel_errors = _relative_errors(abs_error, y_true)
+    return {
+        "rows": len(abs_error),
+        "mae": valid_errors.mean() if len(valid_errors) else np.nan,
+        "mae_ci_low": mae_ci_low,
+        "mae_ci_high": mae_ci_high,
+        "abs_error_median": np.median(valid_errors) if len(valid_errors) else np.nan,
+        "rel_error_avg": rel_errors.mean() if len(rel_errors) else np.nan,
+        "accuracy_within_5": np.mean(abs_error <= ACCURACY_THRESHOLD) if len(abs_error) else np.nan,
+        "latency_avg": latency_avg,
+        **{f"latency_p{q}": value for q, value in zip(LATENCY_PERCENTILES, latency_percentiles)},
+        # 1 / latency for a single worker issuing queries one after another, not the run's throughput:
+        # the result files hold no wall-clock times, and concurrent runs finish several queries at once
+        "qps_per_worker": 1 / latency_avg if latency_avg else np.nan
+    }
+
+
+def _load_results(result_files: dict) -> pd.DataFrame:
+    frames = []
+    for model, paths in result_files.items():
+        for path in paths:
+            frame = pd.read_csv(path, usecols=METRIC_COLUMNS)
+            frame.insert(0, "model", model)
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_results(result_files: dict, num_resamples: int = 2000, seed: int = 0) -> pd.DataFrame:
+    results = _load_results(result_files)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for model, model_results in results.groupby("model", sort=True):
+        groups = list(model_results.groupby("chart_type", sort=True)) + [("ALL", model_results)]
+        for chart_type, group in groups:
+            metrics = compute_metrics(
+                group["y_true"].to_numpy(dtype=float),
+                group["abs_error"].to_numpy(dtype=float),
+                group["inference_time"].to_numpy(dtype=float),
+                num_resamples, rng
+            )
+            rows.append({"model": model, "chart_type": chart_type, **metrics})
+    return pd.DataFrame(rows)
+
+
+def _new_accumulator() -> dict:
+    return {
+        "rows": 0,
+        "error_count": 0,
+        "error_sum": 0.0,
+        "rel_error_count": 0,
+        "rel_error_sum": 0.0,
+        "within_threshold": 0,
+        "latency_count": 0,
+        "latency_sum": 0.0,
+        "latency_histogram": np.zeros(len(LATENCY_HISTOGRAM_EDGES) + 1, dtype=np.int64),
+        "error_histogram": np.zeros(len(ERROR_HISTOGRAM_EDGES) + 1, dtype=np.int64),
+        # Exact per-bin sums, so the bootstrap below resamples bin means rather than bin centers
+        "error_bin_sums": np.zeros(len(ERROR_HISTOGRAM_EDGES) + 1)
+    }
+
+
+def _update_accumulator(accumulator: dict, y_true: np.ndarray, abs_error: np.ndarray, inference_time: np.ndarray):
+    valid_errors = abs_error[~np.isnan(abs_error)]
+    latencies = inference_time[~np.isnan(inference_time)]
+    rel_errors = _relative_errors(abs_error, y_true)
+
+    accumulator["rows"] += len(abs_error)
+    accumulator["error_count"] += len(valid_errors)
+    accumulator["error_sum"] += valid_errors.sum()
+    accumulator["rel_error_count"] += len(rel_errors)
+    accumulator["rel_error_sum"] += rel_errors.sum()
+    accumulator["within_threshold"] += int(np.count_nonzero(abs_error <= ACCURACY_THRESHOLD))
+    accumulator["latency_count"] += len(latencies)
+    accumulator["latency_sum"] += latencies.sum()
+    accumulator["latency_histogram"] += np.bincount(
+        np.searchsorted(LATENCY_HISTOGRAM_EDGES, latencies), minlength=len(LATENCY_HISTOGRAM_EDGES) + 1
+    )
+    error_bins = np.searchsorted(ERROR_HISTOGRAM_EDGES, valid_errors)
+    accumulator["error_histogram"] += np.bincount(error_bins, minlength=len(ERROR_HISTOGRAM_EDGES) + 1)
+    accumulator["error_bin_sums"] += np.bincount(
+        error_bins, weights=valid_errors, minlength=len(ERROR_HISTOGRAM_EDGES) + 1
+    )
+
+
+def _histogram_quantile(histogram: np.ndarray, edges: np.ndarray, q: float) -> float:
+    total = histogram.sum()
+    if total == 0:
+        return np.nan
+    bin_index = int(np.searchsorted(np.cumsum(histogram), q * total))
+    # Bin 0 holds everything below the first edge, above all exact zeros (a correctly read value),
+    # so it reports 0; the last bin reports the last edge
+    if bin_index == 0:
+        return 0.0
+    if bin_index >= len(edges):
+        return edges[-1]
+    return float(np.sqrt(edges[bin_index - 1] * edges[bin_index]))
+
+
+def histogram_bootstrap_mean_ci(counts: np.ndarray, bin_sums: np.ndarray, num_resamples: int, rng,
+                                confidence: float = CONFIDENCE_LEVEL):
+    # Resampling n rows with replacement is a multinomial draw over the bins, so each replicate
+    # costs O(bins) instead of O(rows). Values are only approximated within a bin, not across bins.
+    total = counts.sum()
+    if total == 0:
+        return np.nan, np.nan
+    occupied = counts > 0
+    bin_means = bin_sums[occupied] / counts[occupied]
+    replicate_counts = rng.multinomial(total, counts[occupied] / total, size=num_resamples)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(replicate_counts @ bin_means / total, [alpha, 1 - alpha])
+    return low, high
+
+
+def _finalize_accumulator(accumulator: dict, num_resamples: int, rng) -> dict:
+    def ratio(numerator, denominator):
+        return numerator / denominator if denominator else np.nan
+
+    mae_ci_low, mae_ci_high = histogram_bootstrap_mean_ci(
+        accumulator["error_histogram"], accumulator["error_bin_sums"], num_resamples, rng
+    )
+    latency_avg = ratio(accumulator["latency_sum"], accumulator["latency_count"])
+    return {
+        "rows": accumulator["rows"],
+        "mae": ratio(accumulator["error_sum"], accumulator["error_count"]),
+        "mae_ci_low": mae_ci_low,
+        "mae_ci_high": mae_ci_high,
+        "abs_error_median": _histogram_quantile(accumulator["error_histogram"], ERROR_HISTOGRAM_EDGES, 0.5),
+        "rel_error_avg": ratio(accumulator["rel_error_sum"], accumulator["rel_error_count"]),
+        "accuracy_within_5": ratio(accumulator["within_threshold"], accumulator["rows"]),
+        "latency_avg": latency_avg,
+        **{
+            f"latency_p{q}": _histogram_quantile(accumulator["latency_histogram"], LATENCY_HISTOGRAM_EDGES, q / 100)
+            for q in LATENCY_PERCENTILES
+        },
+        "qps_per_worker": 1 / latency_avg if latency_avg else np.nan
+    }
+
+
+def summarize_results_streaming(result_files: dict, num_resamples: int = 2000, seed: int = 0,
+                                chunk_size: int = 500_000) -> pd.DataFrame:
+    # Reads each file in chunks and keeps only running sums and histograms, so memory does not
+    # grow with the number of rows. Medians and percentiles are accurate to the histogram bin width.
+    rng = np.random.default_rng(seed)
+    rows = []
+    for model, paths in sorted(result_files.items()):
+        accumulators = {}
+        for path in paths:
+            for chunk in pd.read_csv(path, usecols=METRIC_COLUMNS, chunksize=chunk_size):
+                for chart_type, group in list(chunk.groupby("chart_type", sort=False)) + [("ALL", chunk)]:
+                    if chart_type not in accumulators:
+                        accumulators[chart_type] = _new_accumulator()
+                    _update_accumulator(
+                        accumulators[chart_type],
+                        group["y_true"].to_numpy(dtype=float),
+                        group["abs_error"].to_numpy(dtype=float),
+                        group["inference_time"].to_numpy(dtype=float)
+                    )
+        chart_types = sorted(chart_type for chart_type in accumulators if chart_type != "ALL") + ["ALL"]
+        for chart_type in chart_types:
+            metrics = _finalize_accumulator(accumulators[chart_type], num_resamples, rng)
+            rows.append({"model": model, "chart_type": chart_type, **metrics})
+    return pd.DataFrame(rows)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Compare models across all *_results_*.csv benchmark files.")
+    parser.add_argument("--results-dir", default=BENCHMARK_DIR)
+    parser.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap resamples for the MAE interval.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--streaming", action="store_true", help="Aggregate in chunks instead of loading whole files.")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    parser.add_argument("--output", help="Also write the comparison table to this CSV file.")
+    args = parser.parse_args(argv)
+
+    result_files = find_result_files(args.results_dir)
+    if not result_files:
+        parser.error(f"no *_results_*.csv files found in {args.results_dir}")
+
+    if args.streaming:
+        summary = summarize_results_streaming(result_files, args.bootstrap, args.seed, args.chunk_size)
+    else:
+        summary = summarize_results(result_files, args.bootstrap, args.seed)
+
+    print(summary.round(3).to_string(index=False))
+    if args.output:
+        summary.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
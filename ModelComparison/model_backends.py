@@ -0,0 +1,197 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_handler import get_gemini_model, get_values_at_x
+from local_backend import LocalVisionBackend
+from request_scheduler import schedule_request
+
+GEMINI_SYSTEM_PROMPT = """
+You are a smart assistant specialized in reading numerical values from scientific charts.
+Each chart may contain bars, lines, or scattered points. When answering, always follow these steps:
+1. Analyze the X and Y axes — determine the visible ranges and scale (linear/log).
+2. Identify the element at the specified X value (e.g., a bar, point, or line).
+3. Estimate the Y value using the scale.
+Only return a single float number, like "42.7". Do not explain or use units.
+"""
+
+GEMMA_SYSTEM_PROMPT = """
+You are an intelligent assistant that helps extract precise numeric values from scientific charts.
+Each chart may include bar plots, line graphs, or scatter points. To answer accurately:
+
+1. First, analyze the chart axes — determine the visible x and y ranges, including tick values and scales (linear/logarithmic).
+2. Then, identify the specific visual element referenced in the user's question — such as a bar, point, or curve corresponding to a particular x-value.
+3. Carefully estimate the corresponding y-value by using the position of the element relative to the axis scale.
+4. Always return a single numeric value (float) as your answer, without explanation, unit, or additional text.
+"""
+
+QWEN_SYSTEM_PROMPT = """
+You are a smart assistant specialized in reading numerical values from scientific charts.
+
+Each chart may contain bars, lines, or scattered points. When answering, always follow these steps:
+
+1. First, analyze the X and Y axes — understand the scale, numeric ranges, and tick intervals.
+2. Then, locate the chart element corresponding to the X value requested by the user.
+3. Estimate the precise Y value by visually aligning the element with the Y-axis.
+4. Return the value as a **single float number only**, without any explanation, unit, or extra wording.
+
+Your answer should look like this: `42.7`
+Never reply with full sentences or approximations like "around 40".
+"""
+
+
+def build_question(x_val) -> str:
+    return f"What is the Y value at X={x_val} in this chart?"
+
+
+class GeminiBackend:
+    # Remote backends are I/O bound, so the runner sends several requests at once
+    is_remote = True
+
+    def __init__(self, model_name: str, output_prefix: str, max_output_tokens: int):
+        self.output_prefix = output_prefix
+        self.model_name = model_name
+        self.max_output_tokens = max_output_tokens
+        self.api_key = os.environ.get("GOOGLE_API_KEY")
+        self.model = get_gemini_model(self.api_key, model_name)
+        if self.model is None:
+            raise RuntimeError(f"Could not create Gemini model '{model_name}'. Is GOOGLE_API_KEY set?")
+
+    def query(self, image, x_val) -> str:
+        # Shares the app's scheduler, so rate limiting, backoff and adaptive concurrency apply here too
+        response = schedule_request(self.api_key, lambda: self.model.generate_content(
+            [GEMINI_SYSTEM_PROMPT.strip(), image, build_question(x_val)],
+            generation_config={"temperature": 0.0, "max_output_tokens": self.max_output_tokens},
+            request_options={"retry": None}
+        ))
+        if response.candidates and response.candidates[0].content.parts:
+            return response.candidates[0].content.parts[0].text.strip()
+        return "[NO OUTPUT]"
+
+    def query_many(self, image, x_values: list) -> tuple:
+        # One request for every x on the chart; returns (aligned predictions, per-value errors)
+        return get_values_at_x(self.api_key, image, x_values, use_cache=False, raise_errors=True,
+                               model_name=self.model_name)
+
+
+class GemmaBackend:
+    is_remote = False
+
+    def __init__(self, model_id: str, output_prefix: str):
+        import torch
+        from transformers import AutoProcessor, Gemma3ForConditionalGeneration
+
+        self.torch = torch
+        self.output_prefix = output_prefix
+        self.model = Gemma3ForConditionalGeneration.from_pretrained(model_id, device_map="auto").eval()
+        self.processor = AutoProcessor.from_pretrained(model_id)
+
+    def query(self, image, x_val) -> str:
+        messages = [
+            {"role": "system", "content": [{"type": "text", "text": GEMMA_SYSTEM_PROMPT}]},
+            {"role": "user", "content": [
+                {"type": "image", "image": image},
+                {"type": "text", "text": build_question(x_val)}
+            ]}
+        ]
+        inputs = self.processor.apply_chat_template(
+            messages, add_generation_prompt=True, tokenize=True,
+            return_dict=True, return_tensors="pt"
+        ).to(self.model.device, dtype=self.torch.bfloat16)
+
+        input_len = inputs["input_ids"].shape[-1]
+        with self.torch.inference_mode():
+            output = self.model.generate(**inputs, max_new_tokens=100, do_sample=False)
+        return self.processor.decode(output[0][input_len:], skip_special_tokens=True).strip()
+
+
+class QwenBackend:
+    is_remote = False
+
+    def __init__(self, model_id: str, output_prefix: str):
+        import torch
+        from transformers import AutoProcessor, Qwen2_5_VLForConditionalGeneration
+        from qwen_vl_utils import process_vision_info
+
+        self.torch = torch
+        self.process_vision_info = process_vision_info
+        self.output_prefix = output_prefix
+        self.model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
+            model_id, torch_dtype=torch.bfloat16, device_map="auto"
+        )
+        self.processor = AutoProcessor.from_pretrained(model_id)
+
+    def query(self, image, x_val) -> str:
+        messages = [{
+            "role": "user",
+            "content": [
+                {"type": "image", "image": image},
+                {"type": "text", "text": build_question(x_val)}
+            ]
+        }]
+        text = self.processor.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True, system=QWEN_SYSTEM_PROMPT.strip()
+        )
+        image_inputs, video_inputs = self.process_vision_info(messages)
+        inputs = self.processor(
+            text=[text], images=image_inputs, videos=video_inputs, padding=True, return_tensors="pt"
+        ).to(self.model.device)
+
+        with self.torch.inference_mode():
+            outputs = self.model.generate(**inputs, max_new_tokens=64)
+        generated_ids_trimmed = outputs[:, inputs.input_ids.shape[-1]:]
+        return self.processor.batch_decode(
+            generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
+        )[0].strip()
+
+
+class BatchedLocalBackend:
+    # The runner's concurrent queries are what the batcher groups, so it is driven like a remote backend
+    is_remote = True
+
+    def __init__(self, model_id: str, output_prefix: str, max_batch_size: int = 8):
+        self.output_prefix = output_prefix
+        self.backend = LocalVisionBackend(model_id, max_batch_size=max_batch_size)
+
+    def query(self, image, x_val) -> str:
+        prompt = f"{GEMINI_SYSTEM_PROMPT.strip()}\n{build_question(x_val)}"
+        return self.backend.generate(image, prompt, max_new_tokens=16)
+
+
+class MockBackend:
+    # Answers instantly-ish with a deterministic guess; used to exercise the runner without a model
+    is_remote = True
+
+    def __init__(self, output_prefix: str = "mock", latency_seconds: float = 0.05):
+        self.output_prefix = output_prefix
+        self.latency_seconds = latency_seconds
+
+    def query(self, image, x_val) -> str:
+        time.sleep(self.latency_seconds)
+        return f"{random.Random(f'{image.size}:{x_val}').uniform(0, 100):.2f}"
+
+    def query_many(self, image, x_values: list) -> tuple:
+        time.sleep(self.latency_seconds)
+        predictions = [random.Random(f"{image.size}:{x_val}").uniform(0, 100) for x_val in x_values]
+        return predictions, [None] * len(x_values)
+
+
+BACKENDS = {
+    "gemini-1.5": lambda: GeminiBackend("gemini-1.5-flash", "gemini_1_5", max_output_tokens=64),
+    "gemini-2.5": lambda: GeminiBackend("gemini-2.5-flash", "gemini_2_5", max_output_tokens=2048),
+    "gemma-3-4b": lambda: GemmaBackend("google/gemma-3-4b-it", "gemma3_4b"),
+    "gemma-3-12b": lambda: GemmaBackend("google/gemma-3-12b-it", "gemma3_12b"),
+    "qwen2.5-vl-3b": lambda: QwenBackend("Qwen/Qwen2.5-VL-3B-Instruct", "qwen2_5"),
+    "gemma-3-4b-batched": lambda: BatchedLocalBackend("google/gemma-3-4b-it", "gemma3_4b_batched"),
+    "qwen2.5-vl-3b-batched": lambda: BatchedLocalBackend("Qwen/Qwen2.5-VL-3B-Instruct", "qwen2_5_batched"),
+    "mock": lambda: MockBackend()
+}
+
+
+def create_backend(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
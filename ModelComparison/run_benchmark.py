@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from PIL import Image
+from chart_extraction import run_extractions
+from model_backends import BACKENDS, create_backend
+
+DATASETS = {
+    "bar": {
+        "jsonl": "benchmark_images/bar_charts/bar_metadata.jsonl",
+        "img_dir": "benchmark_images/bar_charts"
+    },
+    "line": {
+        "jsonl": "benchmark_images/line_poly_charts/line_poly_metadata.jsonl",
+        "img_dir": "benchmark_images/line_poly_charts"
+    },
+    "scatter": {
+        "jsonl": "benchmark_images/scatter_charts/scatter_metadata.jsonl",
+        "img_dir": "benchmark_images/scatter_charts"
+    }
+}
+RESULT_COLUMNS = ["chart_type", "image_id", "x", "y_true", "y_pred", "abs_error", "raw_output", "inference_time"]
+
+
+def sample_queries(chart_type: str, seed: int, sample_fraction: float, points_per_image: int) -> list:
+    # Each chart type gets its own generator, so the sample of one type does not depend on the others
+    rng = random.Random(f"{seed}:{chart_type}")
+    cfg = DATASETS[chart_type]
+    with open(os.path.join(BENCHMARK_DIR, cfg["jsonl"]), "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+
+    queries = []
+    for entry in rng.sample(entries, round(len(entries) * sample_fraction)):
+        image_path = os.path.join(BENCHMARK_DIR, cfg["img_dir"], os.path.basename(entry["image"].replace("\\", "/")))
+        for point in rng.sample(entry["points"], min(points_per_image, len(entry["points"]))):
+            queries.append({
+                "chart_type": chart_type,
+                "image_id": entry["id"],
+                "image_path": image_path,
+                "x": point["x"],
+                "y_true": point["y"]
+            })
+    return queries
+
+
+def parse_prediction(raw_output: str):
+    try:
+        return float(raw_output.split()[0].replace(",", "."))
+    except Exception:
+        return None
+
+
+def _row_key(chart_type, image_id, x) -> tuple:
+    return chart_type, image_id, str(x)
+
+
+def read_finished_rows(output_csv: str) -> set:
+    if not os.path.exists(output_csv):
+        return set()
+    with open(output_csv, "r", encoding="utf-8", newline="") as f:
+        return {_row_key(row["chart_type"], row["image_id"], row["x"]) for row in csv.DictReader(f)}
+
+
+def open_results_csv(output_csv: str):
+    is_new = not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0
+    output = open(output_csv, "a", encoding="utf-8", newline="")
+    writer = csv.DictWriter(output, fieldnames=RESULT_COLUMNS)
+    if is_new:
+        writer.writeheader()
+    return output, writer
+
+
+def _result_row(query: dict, y_pred, raw_output: str, inference_time: float) -> dict:
+    return {
+        "chart_type": query["chart_type"],
+        "image_id": query["image_id"],
+        "x": query["x"],
+        "y_true": query["y_true"],
+        "y_pred": y_pred,
+        "abs_error": abs(y_pred - query["y_true"]) if y_pred is not None else None,
+        "raw_output": raw_output,
+        "inference_time": inference_time
+    }
+
+
+def run_query(backend, query: dict) -> dict:
+    image = Image.open(query["image_path"]).convert("RGB")
+    start_time = time.perf_counter()
+    raw_output = backend.query(image, query["x"])
+    inference_time = time.perf_counter() - start_time
+    return _result_row(query, parse_prediction(raw_output), raw_output, inference_time)
+
+
+def run_batched_query(backend, queries: list) -> list:
+    # All queries share one chart and are answered by a single model call
+    image = Image.open(queries[0]["image_path"]).convert("RGB")
+    start_time = time.perf_counter()
+    predictions, errors = backend.query_many(image, [query["x"] for query in queries])
+    # The call's time is split over its values, so inference_time stays a per-value figure
+    inference_time = (time.perf_counter() - start_time) / len(queries)
+    return [
+        _result_row(query, None if error else float(y_pred), error or f"{y_pred:g}", inference_time)
+        for query, y_pred, error in zip(queries, predictions, errors)
+    ]
+
+
+def group_queries_by_image(queries: list) -> list:
+    batches = {}
+    for query in queries:
+        batches.setdefault(query["image_path"], []).append(query)
+    return list(batches.values())
+
+
+def run_benchmark(backend_name: str, chart_types: list, seed: int = 0, sample_fraction: float = 0.5,
+                  points_per_image: int = 1, concurrency: int = 8, output_dir: str = BENCHMARK_DIR,
+                  batch_points: bool = False):
+    backend = create_backend(backend_name)
+    if batch_points and not hasattr(backend, "query_many"):
+        raise ValueError(f"Backend '{backend_name}' does not support batched queries.")
+    # Local models hold one GPU; only remote backends benefit from concurrent requests
+    max_workers = concurrency if backend.is_remote else 1
+
+    for chart_type in chart_types:
+        output_csv = os.path.join(output_dir, f"{backend.output_prefix}_results_{chart_type}.csv")
+        finished = read_finished_rows(output_csv)
+        queries = [
+            query for query in sample_queries(chart_type, seed, sample_fraction, points_per_image)
+            if _row_key(query["chart_type"], query["image_id"], query["x"]) not in finished
+        ]
+        print(f"{chart_type}: {len(queries)} queries to run, {len(finished)} already in {output_csv}")
+
+        if batch_points:
+            tasks, run_task = group_queries_by_image(queries), lambda batch: run_batched_query(backend, batch)
+        else:
+            tasks, run_task = [[query] for query in queries], lambda batch: [run_query(backend, batch[0])]
+
+        start_time = time.perf_counter()
+        failed = 0
+        completed = 0
+        output, writer = open_results_csv(output_csv)
+        with output:
+            for batch, rows, error in run_extractions(tasks, run_task, max_workers):
+                if error is not None:
+                    # Not written, so the queries are retried when the benchmark is run again
+                    failed += len(batch)
+                    print(f"  error on {batch[0]['image_id']} at x={', '.join(str(query['x']) for query in batch)}: "
+                          f"{error}", file=sys.stderr)
+                    continue
+                # One request at a time, so an interrupted run loses at most the requests in flight
+                writer.writerows(rows)
+                output.flush()
+                completed += len(rows)
+                if completed % 50 < len(rows):
+                    print(f"  {completed}/{len(queries)}")
+        print(f"{chart_type}: done in {time.perf_counter() - start_time:.1f}s, {len(tasks)} requests, {failed} failed")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmark a chart-reading model on the benchmark images.")
+    parser.add_argument("backend", choices=list(BACKENDS))
+    parser.add_argument("--chart-types", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample-fraction", type=float, default=0.5, help="Share of images queried per chart type.")
+    parser.add_argument("--points-per-image", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight (remote backends only).")
+    parser.add_argument("--output-dir", default=BENCHMARK_DIR)
+    parser.add_argument("--batch-points", action="store_true",
+                        help="Ask for all sampled points of an image in one request (backends with query_many).")
+    args = parser.parse_args(argv)
+
+    run_benchmark(
+        args.backend, args.chart_types, seed=args.seed, sample_fraction=args.sample_fraction,
+        points_per_image=args.points_per_image, concurrency=args.concurrency, output_dir=args.output_dir,
+        batch_points=args.batch_points
+    )
+
+
+if __name__ == "__main__":
+    main()
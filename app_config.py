@@ -1,10 +1,76 @@
+import os
+
 APP_TITLE = "Graph Chat"
 APP_ICON = "📈"
-GEMINI_MODEL_NAME = "gemini-1.5-flash-latest"
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "gemini-1.5-flash-latest")
+# Overrides the Gemini endpoint (REST transport), e.g. "http://127.0.0.1:8765" for mock_gemini_server.py
+GEMINI_API_ENDPOINT = os.environ.get("GEMINI_API_ENDPOINT") or None
+
+# "local:<Hugging Face id or folder>" models run in-process (local_backend.py, needs torch and transformers).
+# GEMINI_MODEL_NAME may name one of them too.
+LOCAL_MODEL_NAMES = ["local:google/gemma-3-4b-it", "local:Qwen/Qwen2.5-VL-3B-Instruct"]
+LOCAL_MAX_BATCH_SIZE = 8
+LOCAL_BATCH_WAIT_SECONDS = 0.05
+LOCAL_MAX_NEW_TOKENS = 512
+# "int8" applies dynamic quantization to the Linear layers, for CPU inference
+LOCAL_QUANTIZATION = os.environ.get("LOCAL_QUANTIZATION", "")
+
+# Request scheduling per API key: a token bucket in front of an AIMD concurrency limit
+GEMINI_REQUESTS_PER_MINUTE = 120
+GEMINI_REQUEST_BURST = 10
+GEMINI_INITIAL_CONCURRENCY = 4
+GEMINI_MAX_CONCURRENCY = 16
+AIMD_DECREASE_FACTOR = 0.5
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 32.0
 SUPPORTED_IMAGE_TYPES = ["png", "jpg", "jpeg", "webp"]
+BATCH_DEFAULT_CONCURRENCY = 4
+BATCH_MAX_CONCURRENCY = 16
+UPLOAD_MAX_WORKERS = 8
+CHARTS_PAGE_SIZES = [5, 10, 25, 50]
+CHAT_WINDOW_SIZE = 20
+# Earlier messages sent with a follow-up question, newest first, estimated at 4 characters per token
+CHAT_HISTORY_TOKEN_BUDGET = 4000
+# At most this many of those messages (question and answer each count), whatever their size
+CHAT_HISTORY_MAX_MESSAGES = 20
+# Uploaded charts are referenced until this close to their expiry (Files API files live for 48 hours)
+GEMINI_FILE_REFRESH_SECONDS = 60 * 60
+
+PREPROCESS_MAX_DIMENSION = 1024
+PREPROCESS_IMAGE_FORMAT = "PNG"
+PREPROCESS_CROP_MARGINS = True
+PREPROCESS_WHITESPACE_THRESHOLD = 245
+PREPROCESS_MARGIN_PADDING = 8
+PREPROCESS_WEBP_QUALITY = 90
+
+THUMBNAIL_MAX_DIMENSION = 480
+THUMBNAIL_CACHE_ENTRIES = 512
 
 SESS_API_KEY = "app_api_key"
 SESS_UPLOADED_IMAGES = "app_uploaded_images"
+SESS_PERSISTED_STATE = "app_persisted_state"
+SESS_IMAGE_HASH_INDEX = "app_image_hash_index"
+SESS_OPEN_CHARTS = "app_open_charts"
+SESS_MODEL_NAME = "app_model_name"
+SESS_SESSION_ID = "app_session_id"
 
 SESSION_DATA_DIR = "session_data"
-SESSION_DATA_FILE = "session_data.json"
\ No newline at end of file
+# One SQLite database holds every user's session; a session is found by the id in its URL (?session=...)
+SESSION_DB_FILE = "sessions.sqlite3"
+SESSION_DB_BUSY_TIMEOUT_MS = 5000
+SESSION_ID_QUERY_PARAM = "session"
+# Shared snapshot and journal of the old single-file store; an operator imports them with session_legacy.py
+SESSION_LEGACY_DATA_FILE = "session_data.json"
+SESSION_LEGACY_JOURNAL_FILE = "session_journal.jsonl"
+BLOB_STORE_DIR = "blobs"
+
+RESPONSE_CACHE_FILE = "response_cache.sqlite3"
+RESPONSE_CACHE_MEMORY_ENTRIES = 256
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+METRICS_RECENT_SPANS = 1000
+
+# Local chart extraction answers only above this confidence, otherwise Gemini is asked
+CV_MIN_CONFIDENCE = 0.8
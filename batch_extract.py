@@ -0,0 +1,207 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from PIL import Image
+from app_config import SUPPORTED_IMAGE_TYPES, BATCH_DEFAULT_CONCURRENCY, GEMINI_MODEL_NAME
+from blob_store import compute_content_hash
+from chart_extraction import EXTRACTION_MODES, request_extraction, parse_extraction_response, run_extractions
+from image_preprocessing import preprocess_image
+from local_backend import is_local_model
+
+
+def find_images(inputs: list) -> list:
+    image_paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, _, file_names in os.walk(pattern):
+                image_paths.extend(
+                    os.path.join(root, file_name) for file_name in file_names
+                    if file_name.rsplit(".", 1)[-1].lower() in SUPPORTED_IMAGE_TYPES
+                )
+        else:
+            image_paths.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(os.path.normpath(path) for path in image_paths))
+
+
+def _result_key(record: dict) -> tuple:
+    # Results written before the model was recorded came from the default model
+    return (record["image"], record["content_hash"], record["mode"], record["prompt"], record["num_points"],
+            record.get("model") or GEMINI_MODEL_NAME)
+
+
+def _serialize_series(structured_result):
+    if structured_result is None:
+        return None
+    return {name: {"x": series["x"].tolist(), "y": series["y"].tolist()} for name, series in structured_result.items()}
+
+
+def _read_jsonl_records(path: str) -> list:
+    records = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # The last line may be cut short by a crash; that image is simply processed again
+                    continue
+    return records
+
+
+def _read_parquet_records(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    import pyarrow.parquet as pq
+    records = pq.read_table(path).to_pylist()
+    for record in records:
+        record["series"] = json.loads(record["series"]) if record["series"] else None
+    return records
+
+
+def _write_parquet_records(path: str, records: list):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    rows = [{**record, "series": json.dumps(record["series"]) if record["series"] else None} for record in records]
+    temp_path = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pylist(rows), temp_path)
+    os.replace(temp_path, path)
+
+
+def _open_jsonl_for_append(path: str):
+    needs_newline = os.path.exists(path) and os.path.getsize(path) > 0
+    if needs_newline:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    output = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        output.write("\n")
+    return output
+
+
+def extract_image(image_path: str, mode: str, api_key: str, num_points: int, user_prompt: str,
+                  use_cache: bool, model_name: str = GEMINI_MODEL_NAME) -> dict:
+    with open(image_path, "rb") as f:
+        bytes_data = f.read()
+    record = {
+        "image": image_path,
+        "content_hash": compute_content_hash(bytes_data),
+        "mode": mode,
+        "prompt": user_prompt if mode == "manual" else None,
+        "num_points": num_points if mode in ("line", "scatter") else None,
+        "model": model_name
+    }
+
+    start_time = time.perf_counter()
+    try:
+        with Image.open(image_path) as pil_image:
+            image = preprocess_image(pil_image)
+        response_text = request_extraction(
+            mode, api_key, image, num_points=num_points, user_prompt=user_prompt,
+            use_cache=use_cache, raise_errors=True, model_name=model_name
+        )
+    except Exception as e:
+        return {**record, "status": "error", "response": None, "series": None, "error": str(e),
+                "elapsed": time.perf_counter() - start_time}
+
+    return {
+        **record,
+        "status": "ok",
+        "response": response_text,
+        "series": _serialize_series(parse_extraction_response(mode, response_text)),
+        "error": None,
+        "elapsed": time.perf_counter() - start_time
+    }
+
+
+def run_batch(image_paths: list, mode: str, output_path: str, api_key: str, num_points: int = 10,
+              user_prompt: str = None, max_workers: int = BATCH_DEFAULT_CONCURRENCY, use_cache: bool = True,
+              model_name: str = GEMINI_MODEL_NAME):
+    # Results are appended to a JSONL file as they complete. Parquet cannot be appended to,
+    # so Parquet output is checkpointed to "<output>.partial.jsonl" and written once at the end.
+    is_parquet = output_path.endswith(".parquet")
+    checkpoint_path = f"{output_path}.partial.jsonl" if is_parquet else output_path
+    previous_records = (_read_parquet_records(output_path) if is_parquet else []) + _read_jsonl_records(checkpoint_path)
+    finished_keys = {_result_key(record) for record in previous_records if record["status"] == "ok"}
+
+    def pending_images():
+        for image_path in image_paths:
+            key_fields = {
+                "image": image_path,
+                "mode": mode,
+                "prompt": user_prompt if mode == "manual" else None,
+                "num_points": num_points if mode in ("line", "scatter") else None,
+                "model": model_name
+            }
+            with open(image_path, "rb") as f:
+                key_fields["content_hash"] = compute_content_hash(f.read())
+            if _result_key(key_fields) not in finished_keys:
+                yield image_path
+
+    def extract(image_path: str) -> dict:
+        return extract_image(image_path, mode, api_key, num_points, user_prompt, use_cache, model_name)
+
+    counts = {"ok": 0, "error": 0}
+    with _open_jsonl_for_append(checkpoint_path) as output:
+        for image_path, record, error in run_extractions(pending_images(), extract, max_workers):
+            if error is not None:
+                record = {"image": image_path, "status": "error", "error": str(error)}
+                print(f"error {image_path}: {error}", file=sys.stderr)
+            else:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                if record["status"] == "error":
+                    print(f"error {image_path}: {record['error']}", file=sys.stderr)
+            counts[record["status"]] += 1
+
+    if is_parquet:
+        # Later attempts for the same image replace earlier (failed) ones
+        records = {}
+        for record in previous_records + _read_jsonl_records(checkpoint_path):
+            record["model"] = record.get("model") or GEMINI_MODEL_NAME
+            records[_result_key(record)] = record
+        _write_parquet_records(output_path, list(records.values()))
+        os.remove(checkpoint_path)
+
+    print(f"{counts['ok']} images extracted, {counts['error']} failed, {len(finished_keys)} already done.")
+    return counts
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract data from a folder of chart images with Gemini.")
+    parser.add_argument("inputs", nargs="+", help="Image directories or glob patterns.")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, required=True)
+    parser.add_argument("--output", required=True, help="Results file, .jsonl or .parquet. Existing results are resumed.")
+    parser.add_argument("--prompt", help="Question to ask about every chart (manual mode).")
+    parser.add_argument("--num-points", type=int, default=10, help="Points to detect (line and scatter modes).")
+    parser.add_argument("--concurrency", type=int, default=BATCH_DEFAULT_CONCURRENCY)
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"),
+                        help="Gemini API key, defaults to $GOOGLE_API_KEY.")
+    parser.add_argument("--model", default=GEMINI_MODEL_NAME,
+                        help="Gemini model, or local:<Hugging Face id or folder> to run a model in-process.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse cached answers (manual mode).")
+    args = parser.parse_args(argv)
+
+    if not args.api_key and not is_local_model(args.model):
+        parser.error("a Gemini API key is required (--api-key or $GOOGLE_API_KEY)")
+    if args.mode == "manual" and not args.prompt:
+        parser.error("--prompt is required in manual mode")
+
+    image_paths = find_images(args.inputs)
+    if not image_paths:
+        parser.error("no images found")
+
+    logging.basicConfig(level=logging.WARNING)
+    counts = run_batch(
+        image_paths, args.mode, args.output, args.api_key, num_points=args.num_points,
+        user_prompt=args.prompt, max_workers=args.concurrency, use_cache=not args.no_cache, model_name=args.model
+    )
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
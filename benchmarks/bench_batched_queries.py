@@ -0,0 +1,103 @@
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_config
+
+# Settings are read at import time, so they are patched before the handler is imported
+app_config.SESSION_DATA_DIR = tempfile.mkdtemp(prefix="graphchat_bench_")
+# Pacing would slow the one-value-per-call run down further; only the round trips are compared
+app_config.GEMINI_REQUESTS_PER_MINUTE = 60000
+app_config.GEMINI_REQUEST_BURST = 1000
+
+from mock_gemini_server import DEFAULT_METADATA_DIR, start_mock_server
+
+LATENCY = os.environ.get("BENCH_LATENCY", "lognormal:0.2,0.3")
+CHARTS_PER_TYPE = int(os.environ.get("BENCH_CHARTS_PER_TYPE", 4))
+POINTS_PER_CHART = int(os.environ.get("BENCH_POINTS_PER_CHART", 10))
+
+server = start_mock_server(latency=LATENCY, answer_noise=float(os.environ.get("BENCH_ANSWER_NOISE", 0.5)))
+app_config.GEMINI_API_ENDPOINT = f"http://127.0.0.1:{server.server_port}"
+
+from gemini_handler import GeminiRequestError, generate_chat_response, get_values_at_x
+from instrumentation import get_metrics_snapshot
+
+API_KEY = "bench-batched"
+COST_COUNTERS = ("gemini_prompt_tokens_total", "gemini_output_tokens_total", "gemini_bytes_uploaded_total")
+
+
+def load_charts() -> list:
+    rng = random.Random(0)
+    charts = []
+    for metadata_path in sorted(glob.glob(os.path.join(DEFAULT_METADATA_DIR, "*", "*_metadata.jsonl"))):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        for entry in rng.sample(entries, min(CHARTS_PER_TYPE, len(entries))):
+            with open(os.path.join(os.path.dirname(metadata_path), entry["id"] + ".png"), "rb") as f:
+                image = {"mime_type": "image/png", "data": f.read()}
+            points = rng.sample(entry["points"], min(POINTS_PER_CHART, len(entry["points"])))
+            charts.append((image, points))
+    return charts
+
+
+def one_value_per_call(image, x_values: list) -> list:
+    # Previous behaviour of the benchmark backends: one request, and one image upload, per value
+    predictions = []
+    for x_val in x_values:
+        prompt = f"What is the Y value at X={x_val} in this chart? Only return a single float number."
+        try:
+            answer = generate_chat_response(API_KEY, image, prompt, use_cache=False, raise_errors=True)
+            predictions.append(float(answer.split()[0].replace(",", ".")))
+        except (GeminiRequestError, ValueError, IndexError):
+            predictions.append(None)
+    return predictions
+
+
+def batched(image, x_values: list) -> list:
+    predictions, errors = get_values_at_x(API_KEY, image, x_values, use_cache=False)
+    return [None if error else float(y_pred) for y_pred, error in zip(predictions, errors)]
+
+
+def run(label: str, charts: list, read_values):
+    counters_before = get_metrics_snapshot()["counters"]
+    requests_before = server.stats["requests"]
+    errors, failed = [], 0
+    start_time = time.perf_counter()
+    for image, points in charts:
+        predictions = read_values(image, [point["x"] for point in points])
+        for point, y_pred in zip(points, predictions):
+            if y_pred is None:
+                failed += 1
+            else:
+                errors.append(abs(y_pred - point["y"]))
+    elapsed = time.perf_counter() - start_time
+
+    counters = get_metrics_snapshot()["counters"]
+    values = sum(len(points) for _, points in charts)
+    per_value = {name: (counters.get(name, 0) - counters_before.get(name, 0)) / values for name in COST_COUNTERS}
+    print(f"{label:16} {server.stats['requests'] - requests_before:>8} {elapsed / values:>9.3f} "
+          f"{per_value['gemini_prompt_tokens_total']:>10.1f} {per_value['gemini_output_tokens_total']:>10.1f} "
+          f"{per_value['gemini_bytes_uploaded_total'] / 1024:>9.1f} {sum(errors) / max(len(errors), 1):>6.2f} "
+          f"{failed:>6}")
+    return elapsed / values, per_value
+
+
+if __name__ == "__main__":
+    charts = load_charts()
+    print(f"{len(charts)} charts, {POINTS_PER_CHART} values each, mock latency {LATENCY}\n")
+    print(f"{'':16} {'requests':>8} {'s/value':>9} {'in tok/v':>10} {'out tok/v':>10} {'KB/value':>9} "
+          f"{'MAE':>6} {'failed':>6}")
+    single_latency, single_cost = run("one per call", charts, one_value_per_call)
+    batched_latency, batched_cost = run("batched", charts, batched)
+
+    single_tokens = single_cost["gemini_prompt_tokens_total"] + single_cost["gemini_output_tokens_total"]
+    batched_tokens = batched_cost["gemini_prompt_tokens_total"] + batched_cost["gemini_output_tokens_total"]
+    upload_ratio = single_cost["gemini_bytes_uploaded_total"] / max(batched_cost["gemini_bytes_uploaded_total"], 1e-9)
+    print(f"\nper value: {single_latency / batched_latency:.1f}x less latency, "
+          f"{single_tokens / max(batched_tokens, 1e-9):.1f}x fewer tokens, {upload_ratio:.1f}x less uploaded")
@@ -0,0 +1,106 @@
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_config
+
+# Settings are read at import time, so they are patched before the handler is imported
+app_config.SESSION_DATA_DIR = tempfile.mkdtemp(prefix="graphchat_bench_")
+app_config.GEMINI_REQUESTS_PER_MINUTE = 60000
+app_config.GEMINI_REQUEST_BURST = 1000
+
+import numpy as np
+from mock_gemini_server import DEFAULT_METADATA_DIR, start_mock_server
+
+LATENCY = os.environ.get("BENCH_LATENCY", "lognormal:0.3,0.2")
+# Client uplink in bytes/s, so sending the image costs time as it would against the real service
+UPLOAD_BANDWIDTH = float(os.environ.get("BENCH_UPLOAD_BANDWIDTH", 1_000_000))
+NUM_CHARTS = int(os.environ.get("BENCH_NUM_CHARTS", 6))
+QUESTIONS_PER_CHART = int(os.environ.get("BENCH_QUESTIONS_PER_CHART", 8))
+
+server = start_mock_server(latency=LATENCY, upload_bandwidth=UPLOAD_BANDWIDTH)
+app_config.GEMINI_API_ENDPOINT = f"http://127.0.0.1:{server.server_port}"
+
+import gemini_handler
+from gemini_handler import generate_chat_response
+from instrumentation import get_metrics_snapshot, increment
+
+API_KEY = "bench-conversation"
+COST_COUNTERS = ("gemini_prompt_tokens_total", "gemini_bytes_uploaded_total")
+
+
+def upload_to_mock(api_key: str, image) -> tuple:
+    # The SDK's file service cannot be pointed at another endpoint, so the mock is sent a simple media upload
+    increment("gemini_bytes_uploaded_total", len(image["data"]))
+    request = urllib.request.Request(
+        f"{app_config.GEMINI_API_ENDPOINT}/upload/v1beta/files?uploadType=media", data=image["data"],
+        headers={"Content-Type": image["mime_type"]}
+    )
+    with urllib.request.urlopen(request) as response:
+        uploaded = json.load(response)["file"]
+    return {"file_data": {"mime_type": uploaded["mimeType"], "file_uri": uploaded["uri"]}}, time.time() + 48 * 3600
+
+
+def load_charts() -> list:
+    rng = random.Random(0)
+    entries = []
+    for metadata_path in sorted(glob.glob(os.path.join(DEFAULT_METADATA_DIR, "*", "*_metadata.jsonl"))):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            entries += [(os.path.dirname(metadata_path), json.loads(line)) for line in f]
+    charts = []
+    for chart_dir, entry in rng.sample(entries, NUM_CHARTS):
+        with open(os.path.join(chart_dir, entry["id"] + ".png"), "rb") as f:
+            image = {"mime_type": "image/png", "data": f.read()}
+        charts.append((image, rng.sample(entry["points"], min(QUESTIONS_PER_CHART, len(entry["points"])))))
+    return charts
+
+
+def run(label: str, charts: list, use_history: bool, upload):
+    gemini_handler._upload_chart_file = upload
+    gemini_handler._uploaded_files.clear()
+    latencies, costs, errors = [], [], []
+    for image, points in charts:
+        chat_log = []
+        for point in points:
+            prompt = f"What is the Y value at X={point['x']} in this chart? Only return a single float number."
+            counters_before = get_metrics_snapshot()["counters"]
+            start_time = time.perf_counter()
+            answer = generate_chat_response(
+                API_KEY, image, prompt, use_cache=False, history=list(chat_log) if use_history else None
+            )
+            latencies.append(time.perf_counter() - start_time)
+            counters = get_metrics_snapshot()["counters"]
+            costs.append([counters.get(name, 0) - counters_before.get(name, 0) for name in COST_COUNTERS])
+            chat_log += [{"role": "user", "parts": [prompt]}, {"role": "model", "parts": [answer]}]
+            try:
+                errors.append(abs(float(answer.split()[0]) - point["y"]))
+            except (ValueError, IndexError):
+                pass
+
+    # The first question of every chart uploads it either way; follow-ups are where the approaches differ
+    latencies = np.array(latencies).reshape(len(charts), -1)
+    costs = np.array(costs, dtype=float).reshape(len(charts), -1, len(COST_COUNTERS))
+    print(f"{label:22} {latencies[:, 0].mean():>8.3f} {latencies[:, 1:].mean():>11.3f} "
+          f"{costs[:, 1:, 0].mean():>11.0f} {costs[:, 1:, 1].mean() / 1024:>10.1f} {np.mean(errors):>6.2f}")
+    return latencies[:, 1:].mean(), costs[:, 1:].mean(axis=(0, 1))
+
+
+if __name__ == "__main__":
+    charts = load_charts()
+    print(f"{len(charts)} charts, {QUESTIONS_PER_CHART} questions each, mock latency {LATENCY}, "
+          f"uplink {UPLOAD_BANDWIDTH / 1e6:.1f} MB/s\n")
+    print(f"{'':22} {'first s':>8} {'follow-up s':>11} {'in tok/q':>11} {'KB/q':>10} {'MAE':>6}")
+    inline_upload = lambda api_key, image: None
+    stateless_latency, stateless_cost = run("single questions", charts, False, inline_upload)
+    run("conversation, inline", charts, True, inline_upload)
+    file_latency, file_cost = run("conversation, file", charts, True, upload_to_mock)
+    print(f"\nper follow-up with the uploaded file: {stateless_latency / file_latency:.2f}x less latency, "
+          f"{(stateless_cost[1] - file_cost[1]) / 1024:.1f} KB less uploaded, "
+          f"{file_cost[0] - stateless_cost[0]:+.0f} input tokens for the history")
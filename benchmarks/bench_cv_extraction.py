@@ -0,0 +1,95 @@
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from app_config import CV_MIN_CONFIDENCE
+from cv_extraction import extract_chart
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ModelComparison", "benchmark_images")
+# Also matches the shard-NNNNN folders written by FineTuning/images_generator/generate_charts.py
+DATASETS = {
+    "bar": "bar_metadata.jsonl",
+    "line": "line_poly_metadata.jsonl",
+    "scatter": "scatter_metadata.jsonl"
+}
+DATA_DIR = os.environ.get("BENCH_DATA_DIR", BENCHMARK_DIR)
+IMAGES_PER_TYPE = int(os.environ.get("BENCH_IMAGES_PER_TYPE", 0))
+
+
+def load_samples(chart_type: str) -> list:
+    samples = []
+    pattern = os.path.join(DATA_DIR, "**", DATASETS[chart_type])
+    for metadata_path in sorted(glob.glob(pattern, recursive=True)):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                samples.append((os.path.join(os.path.dirname(metadata_path), entry["id"] + ".png"), entry["points"]))
+    return samples[:IMAGES_PER_TYPE] if IMAGES_PER_TYPE else samples
+
+
+def absolute_error(chart_type: str, payload: dict, points: list):
+    # Bars are matched by label, lines interpolated at the true x and scatter points matched to the nearest x
+    if payload is None:
+        return None
+    series = payload["series"][0]
+    if chart_type == "bar":
+        predicted = {bar["label"]: bar["value"] for bar in series["bars"]}
+        errors = [abs(predicted[str(p["x"])] - p["y"]) for p in points if str(p["x"]) in predicted]
+        return float(np.mean(errors)) if errors else None
+
+    predicted = sorted((p["x"], p["y"]) for p in series["points"])
+    x_pred = np.array([p[0] for p in predicted])
+    y_pred = np.array([p[1] for p in predicted])
+    x_true = np.array([p["x"] for p in points])
+    y_true = np.array([p["y"] for p in points])
+    if chart_type == "line":
+        return float(np.mean(np.abs(np.interp(x_true, x_pred, y_pred) - y_true)))
+    nearest = np.abs(x_pred[None, :] - x_true[:, None]).argmin(axis=1)
+    return float(np.mean(np.abs(y_pred[nearest] - y_true)))
+
+
+def run_benchmark():
+    print(f"Ground truth from {DATA_DIR}, confidence threshold {CV_MIN_CONFIDENCE}\n")
+    print(f"{'type':>8} {'charts':>7} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'MAE':>8} {'median':>7} "
+          f"{'of range':>8} {'confident':>10} {'conf. MAE':>10}")
+    for chart_type in DATASETS:
+        samples = load_samples(chart_type)
+        if not samples:
+            continue
+        latencies, errors, relative_errors, confident_errors = [], [], [], []
+        confident = 0
+        for image_path, points in samples:
+            image = Image.open(image_path)
+            image.load()
+            start_time = time.perf_counter()
+            payload, confidence = extract_chart(image, chart_type, len(points))
+            latencies.append(time.perf_counter() - start_time)
+
+            error = absolute_error(chart_type, payload, points)
+            if error is not None:
+                # Polynomial lines span anything from tens to hundreds of thousands, so the error is also
+                # reported as a fraction of the chart's y range
+                y_range = max(p["y"] for p in points) - min(p["y"] for p in points)
+                errors.append(error)
+                relative_errors.append(error / y_range if y_range else 0.0)
+            if confidence >= CV_MIN_CONFIDENCE:
+                confident += 1
+                if error is not None:
+                    confident_errors.append(error)
+
+        latencies_ms = 1000 * np.array(latencies)
+        mae = (f"{np.mean(errors):8.3f} {np.median(errors):7.3f} {np.mean(relative_errors):8.2%}" if errors
+               else f"{'-':>8} {'-':>7} {'-':>8}")
+        confident_mae = f"{np.mean(confident_errors):10.3f}" if confident_errors else f"{'-':>10}"
+        print(f"{chart_type:>8} {len(samples):7d} {latencies_ms.mean():8.1f} {np.percentile(latencies_ms, 50):7.1f} "
+              f"{np.percentile(latencies_ms, 95):7.1f} {mae} {confident / len(samples):10.0%} {confident_mae}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
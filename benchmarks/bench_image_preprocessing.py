@@ -0,0 +1,80 @@
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from gemini_handler import BASE_PROMPT, get_gemini_model
+from image_preprocessing import preprocess_image
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ModelComparison", "benchmark_images")
+DATASETS = {
+    "bar": ("bar_charts", "bar_metadata.jsonl"),
+    "line": ("line_poly_charts", "line_poly_metadata.jsonl"),
+    "scatter": ("scatter_charts", "scatter_metadata.jsonl")
+}
+# None keeps the original resolution; the original file is sent as the baseline
+RESOLUTIONS = [None, 1024, 768, 512, 384]
+IMAGES_PER_TYPE = int(os.environ.get("BENCH_IMAGES_PER_TYPE", 5))
+API_KEY = os.environ.get("GOOGLE_API_KEY")
+
+
+def load_samples():
+    rng = random.Random(0)
+    samples = []
+    for chart_type, (img_dir, metadata_file) in DATASETS.items():
+        with open(os.path.join(BENCHMARK_DIR, img_dir, metadata_file), "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        for entry in rng.sample(entries, min(IMAGES_PER_TYPE, len(entries))):
+            point = rng.choice(entry["points"])
+            samples.append((chart_type, os.path.join(BENCHMARK_DIR, img_dir, entry["id"] + ".png"), point))
+    return samples
+
+
+def query_value(model, image_part, x_val):
+    prompt = f"What is the Y value at X={x_val} in this chart? Only return a single float number."
+    start_time = time.perf_counter()
+    response = model.generate_content([BASE_PROMPT, prompt, image_part], generation_config={"temperature": 0.0})
+    elapsed = time.perf_counter() - start_time
+    try:
+        return float(response.text.split()[0].replace(",", ".")), elapsed
+    except Exception:
+        return None, elapsed
+
+
+def run_benchmark():
+    samples = load_samples()
+    model = get_gemini_model(API_KEY) if API_KEY else None
+    if model is None:
+        print("GOOGLE_API_KEY not set: reporting payload size and pre-processing time only.\n")
+
+    print(f"{'resolution':>10} {'avg bytes':>10} {'prep ms':>8} {'latency s':>10} {'MAE':>8}")
+    for resolution in RESOLUTIONS:
+        sizes, prep_times, latencies, errors = [], [], [], []
+        for chart_type, image_path, point in samples:
+            start_time = time.perf_counter()
+            if resolution is None:
+                with open(image_path, "rb") as f:
+                    image_part = {"mime_type": "image/png", "data": f.read()}
+            else:
+                image_part = preprocess_image(Image.open(image_path), max_dimension=resolution)
+            prep_times.append(time.perf_counter() - start_time)
+            sizes.append(len(image_part["data"]))
+
+            if model is not None:
+                y_pred, elapsed = query_value(model, image_part, point["x"])
+                latencies.append(elapsed)
+                if y_pred is not None:
+                    errors.append(abs(y_pred - point["y"]))
+
+        label = "original" if resolution is None else str(resolution)
+        latency = f"{sum(latencies) / len(latencies):10.2f}" if latencies else f"{'-':>10}"
+        mae = f"{sum(errors) / len(errors):8.2f}" if errors else f"{'-':>8}"
+        print(f"{label:>10} {sum(sizes) / len(sizes):10.0f} {1000 * sum(prep_times) / len(prep_times):8.1f} {latency} {mae}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,75 @@
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from local_backend import LocalVisionBackend
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ModelComparison", "benchmark_images")
+MODEL_ID = os.environ.get("BENCH_LOCAL_MODEL", "HuggingFaceTB/SmolVLM-256M-Instruct")
+NUM_REQUESTS = int(os.environ.get("BENCH_NUM_REQUESTS", 32))
+CLIENT_THREADS = int(os.environ.get("BENCH_CLIENT_THREADS", 8))
+MAX_NEW_TOKENS = 16
+BATCH_SIZES = [1, 4, 8]
+QUANTIZATION_MODES = ["", "int8"]
+
+
+def build_random_model():
+    # Weights are initialized randomly from the model's config, so only the config and processor files are
+    # fetched from the Hub. The answers are meaningless, but each token costs as much compute as with the real
+    # weights. tests/test_local_backend.py checks the batching itself offline, with a tiny local config.
+    from transformers import AutoConfig, AutoModelForImageTextToText, AutoProcessor
+    model = AutoModelForImageTextToText.from_config(AutoConfig.from_pretrained(MODEL_ID))
+    # A random model may stop at any token; every request generates the same number of tokens instead
+    model.generation_config.min_new_tokens = MAX_NEW_TOKENS
+    return model, AutoProcessor.from_pretrained(MODEL_ID)
+
+
+def load_requests() -> list:
+    image_paths = sorted(glob.glob(os.path.join(BENCHMARK_DIR, "*", "*.png")))
+    images = [Image.open(path).convert("RGB") for path in image_paths[:NUM_REQUESTS]]
+    return [
+        (images[index % len(images)], f"What is the Y value at X={index} in this chart?")
+        for index in range(NUM_REQUESTS)
+    ]
+
+
+def run(model, processor, requests: list, max_batch_size: int, quantization: str):
+    backend = LocalVisionBackend(MODEL_ID, max_batch_size=max_batch_size, quantization=quantization,
+                                 model=model, processor=processor)
+
+    def timed_request(request) -> float:
+        start_time = time.perf_counter()
+        backend.generate(*request, max_new_tokens=MAX_NEW_TOKENS)
+        return time.perf_counter() - start_time
+
+    try:
+        backend.generate(*requests[0], max_new_tokens=MAX_NEW_TOKENS)
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CLIENT_THREADS) as executor:
+            latencies = list(executor.map(timed_request, requests))
+        elapsed = time.perf_counter() - start_time
+        stats = backend.get_stats()
+    finally:
+        backend.close()
+
+    label = f"batch {max_batch_size}" + (f", {quantization}" if quantization else "")
+    print(f"{label:16} {len(requests) / elapsed:>8.2f} {len(requests) * MAX_NEW_TOKENS / elapsed:>9.1f} "
+          f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+          f"{(stats['requests'] - 1) / max(stats['batches'] - 1, 1):>10.1f}")
+
+
+if __name__ == "__main__":
+    model, processor = build_random_model()
+    requests = load_requests()
+    print(f"{MODEL_ID} (random weights), {NUM_REQUESTS} requests from {CLIENT_THREADS} threads, "
+          f"{MAX_NEW_TOKENS} new tokens each\n")
+    print(f"{'':16} {'req/s':>8} {'tokens/s':>9} {'p50 s':>8} {'p95 s':>8} {'avg batch':>10}")
+    for quantization in QUANTIZATION_MODES:
+        for max_batch_size in BATCH_SIZES:
+            run(model, processor, requests, max_batch_size, quantization)
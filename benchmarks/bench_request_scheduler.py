@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_config
+
+# Settings are read at import time, so they are patched before the handler is imported
+app_config.SESSION_DATA_DIR = tempfile.mkdtemp(prefix="graphchat_bench_")
+app_config.GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get("BENCH_REQUESTS_PER_MINUTE", 6000))
+app_config.GEMINI_REQUEST_BURST = 50
+app_config.RETRY_BASE_DELAY_SECONDS = 0.1
+
+from mock_gemini_server import start_mock_server
+
+QUOTA_CONCURRENCY = int(os.environ.get("BENCH_QUOTA_CONCURRENCY", 6))
+CLIENT_THREADS = int(os.environ.get("BENCH_CLIENT_THREADS", 24))
+NUM_REQUESTS = int(os.environ.get("BENCH_NUM_REQUESTS", 300))
+
+server = start_mock_server(latency="lognormal:0.2,0.3", error_rate=0.02, max_concurrent=QUOTA_CONCURRENCY,
+                           metadata_dir=None)
+app_config.GEMINI_API_ENDPOINT = f"http://127.0.0.1:{server.server_port}"
+
+from gemini_handler import GeminiRequestError, BASE_PROMPT, get_gemini_model, generate_chat_response
+from request_scheduler import get_scheduler_stats
+
+IMAGE = {"mime_type": "image/png", "data": b"not a real chart"}
+
+
+def unscheduled_request(index: int) -> bool:
+    # Previous behaviour: straight to the model, and the first failure is the answer
+    try:
+        get_gemini_model("bench-direct").generate_content([BASE_PROMPT, f"Question {index}", IMAGE])
+        return True
+    except Exception:
+        return False
+
+
+def scheduled_request(index: int) -> bool:
+    try:
+        generate_chat_response("bench-scheduled", IMAGE, f"Question {index}", use_cache=False, raise_errors=True)
+        return True
+    except GeminiRequestError:
+        return False
+
+
+def run(label: str, send_request):
+    stats_before = dict(server.stats)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENT_THREADS) as executor:
+        results = list(executor.map(send_request, range(NUM_REQUESTS)))
+    elapsed = time.perf_counter() - start_time
+    throttled = server.stats["rate_limited"] - stats_before["rate_limited"]
+    print(f"{label:12} {sum(results):>9} {results.count(False):>7} {throttled:>10} {sum(results) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    print(f"{NUM_REQUESTS} requests from {CLIENT_THREADS} threads, quota of {QUOTA_CONCURRENCY} concurrent requests\n")
+    print(f"{'':12} {'succeeded':>9} {'failed':>7} {'429s sent':>10} {'ok req/s':>10}")
+    run("unscheduled", unscheduled_request)
+    run("scheduled", scheduled_request)
+    print(f"\nscheduler: {get_scheduler_stats('bench-scheduled')}")
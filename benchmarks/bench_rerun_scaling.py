@@ -0,0 +1,79 @@
+import glob
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import app_config
+
+# Keep the benchmark session away from the real one; absolute paths win in os.path.join
+app_config.SESSION_DATA_DIR = tempfile.mkdtemp(prefix="graphchat_bench_")
+
+from streamlit.testing.v1 import AppTest
+from app_config import SESS_API_KEY, SESS_UPLOADED_IMAGES, SESS_OPEN_CHARTS, SESSION_ID_QUERY_PARAM
+from blob_store import write_blob
+from session_store import write_session
+
+CHART_COUNTS = [int(count) for count in os.environ.get("BENCH_CHART_COUNTS", "10,50,100,200").split(",")]
+MESSAGES_PER_CHART = int(os.environ.get("BENCH_MESSAGES_PER_CHART", 40))
+RERUNS = int(os.environ.get("BENCH_RERUNS", 5))
+SESSION_ID = "bench-rerun-scaling"
+BENCHMARK_IMAGES = os.path.join(REPO_ROOT, "ModelComparison", "benchmark_images")
+
+
+def create_session(num_charts: int):
+    image_paths = sorted(glob.glob(os.path.join(BENCHMARK_IMAGES, "*", "*.png")))
+    chat_log = []
+    for index in range(MESSAGES_PER_CHART // 2):
+        chat_log.append({"role": "user", "parts": [f"Question {index}"]})
+        chat_log.append({"role": "model", "parts": [f"Answer {index}"]})
+
+    uploaded_images = {}
+    for index in range(num_charts):
+        with open(image_paths[index % len(image_paths)], "rb") as f:
+            bytes_data = f.read()
+        img_id = f"chart-{index}"
+        uploaded_images[img_id] = {
+            "id": img_id,
+            "name": f"{index:04d}_{os.path.basename(image_paths[index % len(image_paths)])}",
+            "size": len(bytes_data),
+            "blob_hash": write_blob(bytes_data),
+            "chat_log": chat_log
+        }
+    write_session(SESSION_ID, {SESS_API_KEY: None, SESS_UPLOADED_IMAGES: uploaded_images})
+
+
+def time_reruns(app, reruns: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(reruns):
+        app.run()
+    return (time.perf_counter() - start_time) / reruns
+
+
+def run_benchmark():
+    # Run the app from the repo root so main.py resolves its sibling modules
+    os.chdir(REPO_ROOT)
+    print(f"{MESSAGES_PER_CHART} chat messages per chart, {RERUNS} reruns per measurement\n")
+    print(f"{'charts':>7} {'first run ms':>13} {'rerun ms':>10} {'all open rerun ms':>18}")
+    for num_charts in CHART_COUNTS:
+        create_session(num_charts)
+        app = AppTest.from_file("main.py", default_timeout=600)
+        app.query_params[SESSION_ID_QUERY_PARAM] = SESSION_ID
+
+        start_time = time.perf_counter()
+        app.run()
+        first_run = time.perf_counter() - start_time
+        rerun = time_reruns(app, RERUNS)
+
+        # Worst case for the current page: every chart on it is expanded
+        app.session_state[SESS_OPEN_CHARTS] = set(app.session_state[SESS_UPLOADED_IMAGES])
+        app.run()
+        open_rerun = time_reruns(app, RERUNS)
+        print(f"{num_charts:7d} {first_run * 1000:13.1f} {rerun * 1000:10.1f} {open_rerun * 1000:18.1f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
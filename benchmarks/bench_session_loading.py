@@ -0,0 +1,93 @@
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_config
+
+# Keep the benchmark session away from the real one; absolute paths win in os.path.join
+app_config.SESSION_DATA_DIR = tempfile.mkdtemp(prefix="graphchat_bench_")
+
+from PIL import Image
+from app_config import SESS_API_KEY, SESS_UPLOADED_IMAGES
+from blob_store import write_blob, read_blob
+from image_loader import get_thumbnail, _read_thumbnail
+from session import load_session_data
+from session_store import write_session
+
+NUM_CHARTS = int(os.environ.get("BENCH_NUM_CHARTS", 100))
+SESSION_ID = "bench-session-loading"
+BENCHMARK_IMAGES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ModelComparison", "benchmark_images"
+)
+
+
+def create_session():
+    image_paths = sorted(glob.glob(os.path.join(BENCHMARK_IMAGES, "*", "*.png")))
+    uploaded_images = {}
+    for index in range(NUM_CHARTS):
+        with open(image_paths[index % len(image_paths)], "rb") as f:
+            bytes_data = f.read()
+        img_id = f"chart-{index}"
+        uploaded_images[img_id] = {
+            "id": img_id,
+            "name": os.path.basename(image_paths[index % len(image_paths)]),
+            "size": len(bytes_data),
+            "blob_hash": write_blob(bytes_data),
+            "chat_log": []
+        }
+    write_session(SESSION_ID, {SESS_API_KEY: None, SESS_UPLOADED_IMAGES: uploaded_images})
+
+
+def timed(fn):
+    start_time = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start_time
+
+
+def eager_cold_start():
+    # Previous behaviour: every persisted image is opened and decoded before the first render
+    data = load_session_data(SESSION_ID)
+    for img_info in data[SESS_UPLOADED_IMAGES].values():
+        img_info['pil_image'] = Image.open(read_blob(img_info['blob_hash']))
+        img_info['pil_image'].load()
+    return data
+
+
+def eager_render(data):
+    # st.image re-encodes a full-resolution PIL image on every rerun
+    for img_info in data[SESS_UPLOADED_IMAGES].values():
+        img_info['pil_image'].save(io.BytesIO(), format="PNG")
+
+
+def lazy_render(data):
+    for img_info in data[SESS_UPLOADED_IMAGES].values():
+        get_thumbnail(img_info)
+
+
+if __name__ == "__main__":
+    create_session()
+
+    eager_data, eager_cold = timed(eager_cold_start)
+    _, eager_rerun = timed(lambda: eager_render(eager_data))
+
+    lazy_data, lazy_cold = timed(lambda: load_session_data(SESSION_ID))
+    _, lazy_first_render = timed(lambda: lazy_render(lazy_data))
+    _, lazy_rerun = timed(lambda: lazy_render(lazy_data))
+
+    # Simulate a new process: thumbnails now come from the blob store instead of memory
+    _read_thumbnail.cache_clear()
+    lazy_data, lazy_warm_cold = timed(lambda: load_session_data(SESSION_ID))
+    _, lazy_warm_render = timed(lambda: lazy_render(lazy_data))
+
+    print(f"{NUM_CHARTS} persisted charts")
+    print(f"{'':32} {'eager (before)':>15} {'lazy (after)':>15}")
+    print(f"{'cold start':32} {eager_cold * 1000:13.1f}ms {lazy_cold * 1000:13.1f}ms")
+    print(f"{'first render (builds thumbnails)':32} {eager_rerun * 1000:13.1f}ms {lazy_first_render * 1000:13.1f}ms")
+    print(f"{'per-rerun render':32} {eager_rerun * 1000:13.1f}ms {lazy_rerun * 1000:13.1f}ms")
+    print(f"{'restart with cached thumbnails':32} {(eager_cold + eager_rerun) * 1000:13.1f}ms "
+          f"{(lazy_warm_cold + lazy_warm_render) * 1000:13.1f}ms")
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_config
+
+# Keep the benchmark sessions away from the real ones; absolute paths win in os.path.join
+app_config.SESSION_DATA_DIR = tempfile.mkdtemp(prefix="graphchat_bench_")
+
+import numpy as np
+from app_config import SESS_UPLOADED_IMAGES
+from session_store import apply_session_changes, load_session
+
+CONCURRENT_SESSIONS = [int(count) for count in os.environ.get("BENCH_CONCURRENT_SESSIONS", "1,8,32,64").split(",")]
+SAVES_PER_SESSION = int(os.environ.get("BENCH_SAVES_PER_SESSION", 50))
+IMAGES_PER_SESSION = 10
+
+
+def run_session(session_id: str) -> list:
+    # Like a user on the chart page: each save appends a question and an answer, and every tenth save uploads a chart
+    latencies = []
+    chat_lengths = {}
+    for save in range(SAVES_PER_SESSION):
+        img_id = f"chart-{save // 10 % IMAGES_PER_SESSION}"
+        changes = []
+        if img_id not in chat_lengths:
+            changes.append({"op": "put_image", "id": img_id, "record": {"id": img_id, "name": f"{img_id}.png"}})
+            chat_lengths[img_id] = 0
+        changes.append({
+            "op": "append_chat", "id": img_id, "start": chat_lengths[img_id],
+            "messages": [{"role": "user", "parts": [f"Question {save}"]}, {"role": "model", "parts": [f"Answer {save}"]}]
+        })
+        chat_lengths[img_id] += 2
+
+        start_time = time.perf_counter()
+        apply_session_changes(session_id, changes)
+        latencies.append(time.perf_counter() - start_time)
+    return latencies
+
+
+if __name__ == "__main__":
+    print(f"{SAVES_PER_SESSION} saves per session, sessions run concurrently in threads\n")
+    print(f"{'sessions':>9} {'stored':>8} {'saves/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'load ms':>8}")
+    stored_sessions = 0
+    for round_index, num_sessions in enumerate(CONCURRENT_SESSIONS):
+        session_ids = [f"round{round_index}-session{index}" for index in range(num_sessions)]
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=num_sessions) as executor:
+            latencies = np.concatenate(list(executor.map(run_session, session_ids)))
+        elapsed = time.perf_counter() - start_time
+        stored_sessions += num_sessions
+
+        load_start = time.perf_counter()
+        loaded = load_session(session_ids[0])
+        load_time = time.perf_counter() - load_start
+        assert sum(len(image["chat_log"]) for image in loaded[SESS_UPLOADED_IMAGES].values()) == 2 * SAVES_PER_SESSION
+        print(f"{num_sessions:9d} {stored_sessions:8d} {len(latencies) / elapsed:9.0f} "
+              f"{np.percentile(latencies, 50) * 1000:8.2f} {np.percentile(latencies, 95) * 1000:8.2f} "
+              f"{load_time * 1000:8.2f}")
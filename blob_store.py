@@ -0,0 +1,56 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from app_config import SESSION_DATA_DIR, BLOB_STORE_DIR
+
+
+def _get_blob_dir():
+    project_dir = os.path.dirname(__file__)
+    blob_dir_path = os.path.join(project_dir, SESSION_DATA_DIR, BLOB_STORE_DIR)
+    os.makedirs(blob_dir_path, exist_ok=True)
+    return blob_dir_path
+
+
+def _get_blob_path(blob_hash: str) -> str:
+    # Shard by hash prefix so a single directory never holds every blob
+    return os.path.join(_get_blob_dir(), blob_hash[:2], blob_hash)
+
+
+def compute_content_hash(bytes_data) -> str:
+    return hashlib.sha256(bytes_data).hexdigest()
+
+
+def blob_exists(blob_hash: str) -> bool:
+    return os.path.exists(_get_blob_path(blob_hash))
+
+
+def write_blob(bytes_data) -> str:
+    blob_hash = compute_content_hash(bytes_data)
+    blob_path = _get_blob_path(blob_hash)
+    if os.path.exists(blob_path):
+        return blob_hash
+
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(bytes_data)
+        os.replace(tmp_path, blob_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return blob_hash
+
+
+def read_blob(blob_hash: str):
+    blob_path = _get_blob_path(blob_hash)
+    if not os.path.exists(blob_path):
+        return None
+    if os.path.getsize(blob_path) == 0:
+        return b""
+
+    # The mapping stays valid after the file is closed; pages are loaded lazily by the OS
+    with open(blob_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,110 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from app_config import GEMINI_MODEL_NAME
+from cv_extraction import extract_chart
+from gemini_handler import (
+    generate_chat_response,
+    get_response_for_line_chart,
+    get_response_for_bar_chart,
+    get_response_for_scatter_plot
+)
+from structured_results import parse_structured_response
+
+EXTRACTION_MODES = ("manual", "line", "bar", "scatter")
+STRUCTURED_MODES = ("line", "bar", "scatter")
+
+
+def describe_extraction_request(mode: str, num_points: int = None, user_prompt: str = None) -> str:
+    if mode == "manual":
+        return user_prompt
+    elif mode == "line":
+        return f"Request for detection of {num_points} points on a line chart."
+    elif mode == "bar":
+        return "Request for bar chart value extraction."
+    elif mode == "scatter":
+        return f"Request for detection of {num_points} points on a scatter plot."
+    raise ValueError(f"Unknown extraction mode '{mode}'.")
+
+
+def parse_x_values(text: str) -> list:
+    return [part.strip() for part in re.split(r"[;,]", text or "") if part.strip()]
+
+
+def describe_value_request(x_values: list) -> str:
+    return f"Request for the Y values at X = {', '.join(str(x) for x in x_values)}."
+
+
+def format_value_predictions(x_values: list, predictions, errors: list, request_error: str = None) -> str:
+    # request_error is set when the request itself failed; errors explain single values
+    if request_error is not None:
+        return f"No values could be read: {request_error}"
+    return "\n".join(
+        f"- **X = {x}**: {y:g}" if error is None else f"- **X = {x}**: {error}"
+        for x, y, error in zip(x_values, predictions, errors)
+    )
+
+
+def request_extraction(mode: str, api_key: str, image, num_points: int = None, user_prompt: str = None,
+                       image_hash: str = None, use_cache: bool = True, stream: bool = False,
+                       raise_errors: bool = False, model_name: str = GEMINI_MODEL_NAME, history: list = None):
+    if mode == "manual":
+        return generate_chat_response(
+            api_key=api_key, image=image, user_prompt=user_prompt, image_hash=image_hash,
+            use_cache=use_cache, stream=stream, raise_errors=raise_errors, model_name=model_name, history=history
+        )
+    elif mode == "line":
+        return get_response_for_line_chart(
+            api_key=api_key, image=image, num_points=num_points, image_hash=image_hash,
+            stream=stream, raise_errors=raise_errors, model_name=model_name
+        )
+    elif mode == "bar":
+        return get_response_for_bar_chart(
+            api_key=api_key, image=image, image_hash=image_hash, stream=stream, raise_errors=raise_errors,
+            model_name=model_name
+        )
+    elif mode == "scatter":
+        return get_response_for_scatter_plot(
+            api_key=api_key, image=image, num_points=num_points, image_hash=image_hash,
+            stream=stream, raise_errors=raise_errors, model_name=model_name
+        )
+    raise ValueError(f"Unknown extraction mode '{mode}'.")
+
+
+def request_local_extraction(mode: str, pil_image, num_points: int = None):
+    # Returns (response text, confidence); the text has the same JSON shape as Gemini's structured answers
+    if mode not in STRUCTURED_MODES:
+        raise ValueError(f"Local extraction does not support mode '{mode}'.")
+    payload, confidence = extract_chart(pil_image, mode, num_points)
+    return (json.dumps(payload) if payload else None), confidence
+
+
+def parse_extraction_response(mode: str, response_text: str):
+    if mode not in STRUCTURED_MODES:
+        return None
+    return parse_structured_response(response_text)
+
+
+def run_extractions(tasks, extract, max_workers: int):
+    # Yields (task, result, error) in completion order. Tasks are pulled lazily, so at most
+    # 2 * max_workers are in flight and large folders are never queued (or decoded) all at once.
+    tasks = iter(tasks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        def submit_next() -> bool:
+            task = next(tasks, None)
+            if task is None:
+                return False
+            pending[executor.submit(extract, task)] = task
+            return True
+
+        while len(pending) < 2 * max_workers and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = pending.pop(future)
+                error = future.exception()
+                yield task, None if error else future.result(), error
+                submit_next()
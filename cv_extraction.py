@@ -0,0 +1,534 @@
+import functools
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from instrumentation import span
+from image_loader import flatten_to_rgb
+
+# Pixel classes: spines, ticks and labels are dark and grey; data marks are coloured
+DARK_MAX_LEVEL = 100
+NEUTRAL_MAX_SPREAD = 40
+MARK_MIN_SATURATION = 50
+MAX_SERIES = 5
+SERIES_MAX_COSINE = 0.97
+
+GLYPH_SIZE = (10, 14)
+# Glyphs are segmented on their dark core (darkness out of 255) and matched on all of their anti-aliased ink
+GLYPH_MIN_INK = 95
+GLYPH_MAX_DISTANCE = 0.1
+TICK_FIT_TOLERANCE_PIXELS = 1.5
+# Agg draws snapped strokes and markers half a pixel right of and below their true position
+SNAP_OFFSET_PIXELS = 0.5
+# Matplotlib's default font; its bundled copy is used when the system has none
+TICK_LABEL_FONT = "DejaVuSans.ttf"
+
+
+def _to_rgb_array(pil_image) -> np.ndarray:
+    return np.asarray(flatten_to_rgb(pil_image), dtype=np.int16)
+
+
+def _runs(mask: np.ndarray) -> list:
+    # (start, end) index pairs, end exclusive, of consecutive True values
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def _weighted_center(weights: np.ndarray, start: int) -> float:
+    # Continuous coordinate of the centre of mass, where pixel i spans [i, i + 1)
+    positions = np.arange(start, start + len(weights)) + 0.5
+    return float((positions * weights).sum() / weights.sum())
+
+
+def find_plot_area(dark: np.ndarray):
+    # The bottom and left spines are the longest dark lines; their extents bound the plot
+    height, width = dark.shape
+    row_runs = _runs(dark.sum(axis=1) >= 0.3 * width)
+    col_runs = _runs(dark.sum(axis=0) >= 0.3 * height)
+    if not row_runs or not col_runs:
+        return None
+    bottom_spine = row_runs[-1]
+    left_spine = col_runs[0]
+    spine_cols = np.flatnonzero(dark[bottom_spine[0]:bottom_spine[1]].any(axis=0))
+    spine_rows = np.flatnonzero(dark[:, left_spine[0]:left_spine[1]].any(axis=1))
+    area = {
+        "top": int(spine_rows[0]),
+        "bottom": int(bottom_spine[0]),
+        "left": int(left_spine[1]),
+        "right": int(spine_cols[-1]),
+        "bottom_outer": int(bottom_spine[1]),
+        "left_outer": int(left_spine[0])
+    }
+    if area["bottom"] - area["top"] < 0.2 * height or area["right"] - area["left"] < 0.2 * width:
+        return None
+    return area
+
+
+def find_ticks(darkness: np.ndarray, dark: np.ndarray, area: dict, axis: str):
+    # Ticks point out of the axes (matplotlib's default), so they are probed just outside the spine
+    if axis == "x":
+        probe = area["bottom_outer"] + 1
+        if probe >= dark.shape[0]:
+            return [], 0
+        line, weights = dark[probe, area["left_outer"]:area["right"] + 1], darkness[probe]
+        offset = area["left_outer"]
+        outward = lambda position: dark[area["bottom_outer"]:, position]
+    else:
+        probe = area["left_outer"] - 2
+        if probe < 0:
+            return [], 0
+        line, weights = dark[area["top"]:area["bottom_outer"], probe], darkness[:, probe]
+        offset = area["top"]
+        outward = lambda position: dark[position, :area["left_outer"]][::-1]
+
+    ticks = [
+        _weighted_center(weights[offset + start:offset + end], offset + start) - SNAP_OFFSET_PIXELS
+        for start, end in _runs(line)
+    ]
+    if not ticks:
+        return [], 0
+    outward_runs = _runs(outward(int(ticks[0] + SNAP_OFFSET_PIXELS)))
+    tick_length = int(outward_runs[0][1]) if outward_runs and outward_runs[0][0] == 0 else 0
+    return ticks, tick_length
+
+
+@functools.lru_cache(maxsize=1)
+def _glyph_templates() -> dict:
+    try:
+        font = ImageFont.truetype(TICK_LABEL_FONT, 48)
+    except OSError:
+        try:
+            from matplotlib import font_manager
+            font = ImageFont.truetype(font_manager.findfont("DejaVu Sans"), 48)
+        except Exception:
+            font = ImageFont.load_default(48)
+
+    templates = {}
+    for char in "0123456789":
+        canvas = Image.new("L", (64, 64), 255)
+        ImageDraw.Draw(canvas).text((8, 0), char, font=font, fill=0)
+        crop = _trim(255 - np.asarray(canvas, dtype=np.float32))
+        templates[char] = (_normalize_glyph(crop), crop.shape[1] / crop.shape[0])
+    return templates
+
+
+def _normalize_glyph(crop: np.ndarray) -> np.ndarray:
+    image = Image.fromarray(np.clip(crop, 0, 255).astype(np.uint8))
+    glyph = np.asarray(image.resize(GLYPH_SIZE, Image.Resampling.BILINEAR), dtype=np.float32)
+    return glyph / max(glyph.max(), 1)
+
+
+def _classify_glyph(crop: np.ndarray, top: int, digit_top: int, digit_height: int):
+    height, width = crop.shape
+    if height <= 0.35 * digit_height:
+        middle = top + height / 2 - digit_top
+        if width >= 1.5 * height and 0.25 * digit_height < middle < 0.75 * digit_height:
+            return "-"
+        if middle >= 0.7 * digit_height and width <= 0.5 * digit_height:
+            return "."
+        return None
+
+    text, _ = _match_digits(crop)
+    return text
+
+
+def _match_digits(crop: np.ndarray, depth: int = 0):
+    # Returns (digits, distance). Digits that touch are split at the cut where both halves read best.
+    crop = _trim(crop)
+    height, width = crop.shape
+    if crop.size == 0:
+        return None, float("inf")
+    glyph = _normalize_glyph(crop)
+    aspect = width / height
+    best_text, best_distance = None, GLYPH_MAX_DISTANCE
+    for char, (template, template_aspect) in _glyph_templates().items():
+        distance = float(((glyph - template) ** 2).mean()) + 0.1 * (aspect - template_aspect) ** 2
+        if distance < best_distance:
+            best_text, best_distance = char, distance
+    if best_text is not None or width < 0.9 * height or depth == 2:
+        return best_text, best_distance
+
+    for cut in range(int(0.3 * height), width - int(0.3 * height) + 1):
+        left_text, left_distance = _match_digits(crop[:, :cut], depth + 1)
+        right_text, right_distance = _match_digits(crop[:, cut:], depth + 1)
+        if left_text and right_text and max(left_distance, right_distance) < best_distance:
+            best_text, best_distance = left_text + right_text, max(left_distance, right_distance)
+    return best_text, best_distance
+
+
+def _trim(crop: np.ndarray) -> np.ndarray:
+    if crop.size == 0:
+        return crop
+    rows, cols = np.flatnonzero(crop.max(axis=1) > GLYPH_MIN_INK), np.flatnonzero(crop.max(axis=0) > GLYPH_MIN_INK)
+    if len(rows) == 0:
+        return crop[:0, :0]
+    return crop[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def read_label(ink: np.ndarray):
+    # ink is a darkness band holding one tick label; glyphs are separated by blank columns
+    glyph_runs = _runs(ink.max(axis=0) > GLYPH_MIN_INK)
+    boxes = []
+    for start, end in glyph_runs:
+        rows = np.flatnonzero(ink[:, start:end].max(axis=1) > GLYPH_MIN_INK)
+        boxes.append((int(rows[0]), int(rows[-1]) + 1, start, end))
+    if not boxes:
+        return None
+    digit_top = min(box[0] for box in boxes)
+    digit_height = max(box[1] for box in boxes) - digit_top
+
+    text = ""
+    for top, bottom, start, end in boxes:
+        char = _classify_glyph(ink[top:bottom, start:end], top, digit_top, digit_height)
+        if char is None:
+            return None
+        text += char
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _group_glyph_runs(column_ink: np.ndarray, max_gap: int) -> list:
+    groups = []
+    for start, end in _runs(column_ink):
+        if groups and start - groups[-1][1] <= max_gap:
+            groups[-1][1] = end
+        else:
+            groups.append([start, end])
+    return groups
+
+
+def read_tick_labels(text_ink: np.ndarray, area: dict, ticks: list, tick_length: int, axis: str) -> list:
+    values = [None] * len(ticks)
+    if len(ticks) < 2:
+        return values
+    spacing = float(np.min(np.diff(ticks)))
+
+    if axis == "x":
+        # Tick labels are the first band of text below the tick marks
+        first_row = area["bottom_outer"] + tick_length + 1
+        # Stops short of the y tick labels, which end a tick length and a label pad left of the spine
+        col_start = max(0, area["left_outer"] - 8)
+        col_end = area["right"] + int(spacing)
+        region = text_ink[first_row:, col_start:col_end]
+        bands = _runs(region.max(axis=1) > GLYPH_MIN_INK)
+        if not bands:
+            return values
+        band = region[bands[0][0]:bands[0][1]]
+        for start, end in _group_glyph_runs(band.max(axis=0) > GLYPH_MIN_INK, max_gap=max(3, band.shape[0] // 2)):
+            center = col_start + (start + end) / 2
+            index = int(np.argmin([abs(center - tick) for tick in ticks]))
+            if abs(center - ticks[index]) < spacing / 2:
+                values[index] = read_label(band[:, start:end])
+        return values
+
+    # Y labels are right-aligned next to their tick, so the rightmost text group beside each tick is its label
+    col_end = max(0, area["left_outer"] - tick_length - 1)
+    half_band = max(1, int(spacing / 2) - 1)
+    for index, tick in enumerate(ticks):
+        row_start = max(0, int(tick) - half_band)
+        band = text_ink[row_start:int(tick) + half_band + 1, :col_end]
+        label = _rightmost_label(band)
+        # Matplotlib pads labels from the tick by about a tick length
+        if label is not None and col_end - label[1] <= tick_length + 4:
+            values[index] = read_label(_trim(band[:, label[0]:label[1]]))
+    return values
+
+
+def _rightmost_label(band: np.ndarray):
+    # Grows the label leftwards from the ink nearest the axis; the rotated axis title further
+    # left is a larger gap away, measured against the height of the label found so far
+    runs = _runs(band.max(axis=0) > GLYPH_MIN_INK)
+    if not runs:
+        return None
+    start, end = runs[-1]
+    for run_start, run_end in reversed(runs[:-1]):
+        rows = np.flatnonzero(band[:, start:end].max(axis=1) > GLYPH_MIN_INK)
+        if start - run_end > max(3, (rows[-1] - rows[0] + 1) // 2):
+            break
+        start = run_start
+    return int(start), int(end)
+
+
+def fit_axis(ticks: list, values: list):
+    # Picks the pixel -> value line that most read labels agree with, so one misread label does not
+    # skew the calibration. Returns (slope, intercept, confidence).
+    known = [(position, value) for position, value in zip(ticks, values) if value is not None]
+    best_inliers = []
+    for i in range(len(known)):
+        for j in range(i + 1, len(known)):
+            (p_i, v_i), (p_j, v_j) = known[i], known[j]
+            if v_i == v_j:
+                continue
+            slope = (v_j - v_i) / (p_j - p_i)
+            inliers = [
+                (p, v) for p, v in known
+                if abs((v - v_i) / slope + p_i - p) <= TICK_FIT_TOLERANCE_PIXELS
+            ]
+            if len(inliers) > len(best_inliers):
+                best_inliers = inliers
+    if len(best_inliers) < 2:
+        return None, None, 0.0
+
+    positions, inlier_values = zip(*best_inliers)
+    slope, intercept = np.polyfit(positions, inlier_values, 1)
+    confidence = len(best_inliers) / len(ticks)
+    if len(best_inliers) == 2:
+        confidence *= 0.75
+    return float(slope), float(intercept), confidence
+
+
+def calibrate_axis(darkness: np.ndarray, dark: np.ndarray, text_ink: np.ndarray, area: dict, axis: str):
+    ticks, tick_length = find_ticks(darkness, dark, area, axis)
+    values = read_tick_labels(text_ink, area, ticks, tick_length, axis)
+    return fit_axis(ticks, values)
+
+
+def split_series(rgb: np.ndarray, marks: np.ndarray) -> list:
+    # Groups coloured pixels by hue. Anti-aliased and transparent pixels are the series colour blended
+    # with white, which scales 255 - rgb without turning it, so the direction of that vector is compared.
+    ink = 255.0 - rgb[marks]
+    if len(ink) == 0:
+        return []
+    directions = ink / np.linalg.norm(ink, axis=1, keepdims=True)
+    quantized = np.round(directions * 8).astype(np.int32)
+    bins = quantized[:, 0] * 289 + quantized[:, 1] * 17 + quantized[:, 2]
+    keys, counts = np.unique(bins, return_counts=True)
+    series_directions = []
+    for key, count in sorted(zip(keys, counts), key=lambda item: -item[1]):
+        # Minor colours are usually legend swatches or blends between series, not data
+        if count < max(30, 0.05 * len(ink)) or len(series_directions) == MAX_SERIES:
+            break
+        center = directions[bins == key].mean(axis=0)
+        center /= np.linalg.norm(center)
+        if all(center @ other < SERIES_MAX_COSINE for other in series_directions):
+            series_directions.append(center)
+
+    nearest = (directions @ np.array(series_directions).T).argmax(axis=1)
+    series_masks = []
+    for index in range(len(series_directions)):
+        mask = np.zeros_like(marks)
+        mask[marks] = nearest == index
+        series_masks.append(mask)
+    return series_masks
+
+
+def _bar_edges(column_mask: np.ndarray, column_coverage: np.ndarray):
+    # Edges are snapped to pixel centres, so the edge pixels are partly covered; their coverage
+    # (and that of the faint pixel beyond, when it fell under the mask threshold) places the edge
+    rows = np.flatnonzero(column_mask)
+    first, last = rows[0], rows[-1]
+    top = first + 1 - column_coverage[first] - (column_coverage[first - 1] if first > 0 else 0)
+    bottom = last + column_coverage[last] + (column_coverage[last + 1] if last + 1 < len(column_mask) else 0)
+    return top, bottom
+
+
+def _extract_bars(mask: np.ndarray, coverage: np.ndarray, to_x, to_y, zero_row: float):
+    bars = []
+    column_counts = mask.sum(axis=0)
+    for start, end in _runs(column_counts >= 2):
+        if end - start < 3:
+            continue
+        # The outermost columns are anti-aliased, every other column of a bar has the same edges
+        edges = [
+            _bar_edges(mask[:, column], coverage[:, column])
+            for column in range(start + 1, end - 1)
+            if mask[:, column].any()
+        ]
+        top, bottom = np.median(edges, axis=0)
+        # A bar runs from the zero line to its value, so the end away from zero is the value
+        value_row = top if abs(top - zero_row) >= abs(bottom - zero_row) else bottom
+        base_row = bottom if value_row == top else top
+        # When zero is outside the view, bars are cut off at the edge of the plot instead
+        anchor_row = min(max(zero_row, 0), mask.shape[0])
+        bars.append({
+            "x": to_x((start + end) / 2),
+            "value": to_y(value_row),
+            "width": end - start,
+            "regular": np.ptp(np.array(edges), axis=0).max() <= 1.5 and abs(base_row - anchor_row) <= 2
+        })
+    if not bars:
+        return None, 0.0
+
+    # Real bars are flat, start at zero and are equally wide; markers and lines read as bars are not
+    widths = np.array([bar["width"] for bar in bars], dtype=float)
+    confidence = sum(bar["regular"] for bar in bars) / len(bars)
+    if widths.std() > 0.2 * widths.mean():
+        confidence *= 0.6
+    integer_labels = all(abs(bar["x"] - round(bar["x"])) < 0.15 for bar in bars)
+    return [
+        {
+            "label": str(int(round(bar["x"]))) if integer_labels else f"{bar['x']:.2f}",
+            "value": round(float(bar["value"]), 4)
+        }
+        for bar in bars
+    ], confidence
+
+
+def _extract_line(mask: np.ndarray, coverage: np.ndarray, to_x, to_y, num_points: int):
+    # Legend swatches share the line's colour; only the line and pieces of similar size are kept.
+    # Components are found on a slightly grown mask, so crossing lines do not cut the line apart.
+    components = label_components(_grow(mask, 2))
+    if not components:
+        return None, 0.0
+    largest = max(len(component) for component in components)
+    kept = np.zeros_like(mask)
+    for component in components:
+        if len(component) >= 0.2 * largest:
+            kept[component[:, 0].astype(int), component[:, 1].astype(int)] = True
+    mask = mask & kept
+
+    columns = np.flatnonzero(mask.any(axis=0))
+    if len(columns) < 2:
+        return None, 0.0
+    # Coverage-weighted centres, including the faint anti-aliased pixel on either side of the stroke
+    near_line = mask.copy()
+    near_line[1:] |= mask[:-1]
+    near_line[:-1] |= mask[1:]
+    weights = np.where(near_line, coverage, 0)
+    centers = np.array([_weighted_center(weights[:, column], 0) for column in columns])
+    thickness = np.percentile(weights[:, columns].sum(axis=0), 10)
+
+    # Line caps extend past the end points by half the line width
+    first, last = columns[0] + thickness / 2, columns[-1] + 1 - thickness / 2
+    sample_columns = np.linspace(first, last, num_points or 10)
+    sample_rows = np.interp(sample_columns, columns + 0.5, centers)
+    # A line is thin and unbroken; bars or markers read as a line are not
+    continuity = len(columns) / (columns[-1] - columns[0] + 1)
+    confidence = min(1.0, continuity / 0.9)
+    if thickness > max(6, 0.04 * mask.shape[0]):
+        confidence *= 0.3
+    return [
+        {"x": round(float(to_x(column)), 4), "y": round(float(to_y(row)), 4)}
+        for column, row in zip(sample_columns, sample_rows)
+    ], confidence
+
+
+def _grow(mask: np.ndarray, pixels: int) -> np.ndarray:
+    grown = mask.copy()
+    for _ in range(pixels):
+        previous = grown.copy()
+        grown[1:] |= previous[:-1]
+        grown[:-1] |= previous[1:]
+        grown[:, 1:] |= previous[:, :-1]
+        grown[:, :-1] |= previous[:, 1:]
+    return grown
+
+
+def label_components(mask: np.ndarray) -> list:
+    # 8-connected components as arrays of (row, col) pixels
+    remaining = {(int(r), int(c)) for r, c in zip(*np.nonzero(mask))}
+    components = []
+    while remaining:
+        stack = [remaining.pop()]
+        pixels = []
+        while stack:
+            r, c = stack.pop()
+            pixels.append((r, c))
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    neighbour = (r + dr, c + dc)
+                    if neighbour in remaining:
+                        remaining.remove(neighbour)
+                        stack.append(neighbour)
+        components.append(np.array(pixels, dtype=float))
+    return components
+
+
+def _split_component(pixels: np.ndarray, count: int) -> list:
+    # Overlapping markers: k-means on pixel positions, seeded along the blob's main axis
+    centered = pixels - pixels.mean(axis=0)
+    axis = np.linalg.svd(centered, full_matrices=False)[2][0]
+    order = np.argsort(centered @ axis)
+    centers = np.array([pixels[order[int((i + 0.5) * len(order) / count)]] for i in range(count)])
+    for _ in range(10):
+        nearest = np.argmin(((pixels[:, None, :] - centers[None]) ** 2).sum(axis=2), axis=1)
+        centers = np.array([
+            pixels[nearest == i].mean(axis=0) if (nearest == i).any() else centers[i] for i in range(count)
+        ])
+    return list(centers)
+
+
+def _extract_scatter(mask: np.ndarray, to_x, to_y):
+    # Grid lines are drawn over the markers, so 1 px gaps are closed before labelling
+    closed = mask.copy()
+    closed[1:-1] |= mask[:-2] & mask[2:]
+    closed[:, 1:-1] |= mask[:, :-2] & mask[:, 2:]
+    components = [component for component in label_components(closed) if len(component) >= 4]
+    if not components:
+        return None, 0.0
+
+    marker_area = float(np.median([len(component) for component in components]))
+    centers, round_markers = [], 0
+    for component in components:
+        count = int(round(len(component) / marker_area))
+        if count <= 1:
+            centers.append(component.mean(axis=0))
+            height, width = np.ptp(component, axis=0) + 1
+            # Markers are compact blobs; bars and line pieces read as markers are long and thin
+            round_markers += (0.5 <= height / width <= 2 and len(component) >= 0.5 * height * width
+                              and len(component) >= 0.5 * marker_area)
+        else:
+            centers.extend(_split_component(component, count))
+    centers.sort(key=lambda center: center[1])
+    return [
+        {
+            "x": round(float(to_x(col + 0.5 - SNAP_OFFSET_PIXELS)), 4),
+            "y": round(float(to_y(row + 0.5 - SNAP_OFFSET_PIXELS)), 4)
+        }
+        for row, col in centers
+    ], min(1.0, round_markers / len(components) / 0.6)
+
+
+def extract_chart(pil_image, mode: str, num_points: int = None):
+    # Returns (payload, confidence). The payload has the same shape as Gemini's structured answers,
+    # so it goes through the same parsing and storage; confidence is 0 when nothing could be read.
+    with span("cv_extraction") as attributes:
+        attributes["mode"] = mode
+        rgb = _to_rgb_array(pil_image)
+        level, spread = rgb.max(axis=2), rgb.max(axis=2) - rgb.min(axis=2)
+        darkness = (255 - rgb.mean(axis=2)) / 255
+        dark = (level < DARK_MAX_LEVEL) & (spread < NEUTRAL_MAX_SPREAD)
+        text_ink = np.where(spread < NEUTRAL_MAX_SPREAD, darkness * 255, 0)
+
+        area = find_plot_area(dark)
+        if area is None:
+            attributes["confidence"] = 0.0
+            return None, 0.0
+        x_slope, x_intercept, x_confidence = calibrate_axis(darkness, dark, text_ink, area, "x")
+        y_slope, y_intercept, y_confidence = calibrate_axis(darkness, dark, text_ink, area, "y")
+        if not x_confidence or not y_confidence:
+            attributes["confidence"] = 0.0
+            return None, 0.0
+
+        # Marks are searched inside the spines; coordinates are shifted back to the full image
+        top, left = area["top"] + 1, area["left"] + 1
+        inner = (slice(top, area["bottom"]), slice(left, area["right"]))
+        marks = spread[inner] > MARK_MIN_SATURATION
+        to_x = lambda column: x_slope * (column + left) + x_intercept
+        to_y = lambda row: y_slope * (row + top) + y_intercept
+
+        series = []
+        confidences = []
+        for index, mask in enumerate(split_series(rgb[inner], marks)):
+            name = f"Series {index + 1}"
+            # Fraction of each pixel the mark covers, from how much of the series' colour it shows
+            coverage = np.clip(spread[inner] / np.percentile(spread[inner][mask], 90), 0, 1)
+            if mode == "bar":
+                zero_row = -y_intercept / y_slope - top
+                bars, confidence = _extract_bars(mask, coverage, to_x, to_y, zero_row)
+                if bars:
+                    series.append({"name": name, "bars": bars})
+            elif mode == "line":
+                points, confidence = _extract_line(mask, coverage, to_x, to_y, num_points)
+                if points:
+                    series.append({"name": name, "points": points})
+            else:
+                points, confidence = _extract_scatter(mask, to_x, to_y)
+                if points:
+                    series.append({"name": name, "points": points})
+            confidences.append(confidence)
+
+        confidence = min([x_confidence, y_confidence] + confidences) if series else 0.0
+        attributes["confidence"] = round(confidence, 3)
+        return ({"series": series} if series else None), confidence
@@ -1,89 +1,553 @@
-import streamlit as st
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
 import google.generativeai as genai
-from app_config import GEMINI_MODEL_NAME
+from google.generativeai import client as genai_client
+from google.generativeai.types import BlockedPromptException
+from PIL import Image
+from app_config import (
+    GEMINI_MODEL_NAME,
+    GEMINI_API_ENDPOINT,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    CHAT_HISTORY_MAX_MESSAGES,
+    GEMINI_FILE_REFRESH_SECONDS
+)
+from response_cache import make_cache_key, get_cached_response, store_response
+from request_scheduler import schedule_request
+from instrumentation import span, increment
+from local_backend import is_local_model, get_local_backend
+from image_loader import flatten_to_rgb
+from structured_results import (
+    POINT_SERIES_SCHEMA,
+    BAR_SERIES_SCHEMA,
+    VALUE_LIST_SCHEMA,
+    parse_value_list_response
+)
+
+# The expert persona prompt is always included
+BASE_PROMPT = (
+    "You are an expert in reading charts and graphs. "
+    "Look at the given graph and answer the following question accurately. "
+    "Provide the numeric value or observation directly based on the graph content. "
+    "Do not include any additional explanatory text in your response, only the extracted data."
+)
+
+# Answers that are error or block messages rather than replies from the model
+_FAILED_ANSWER_PREFIXES = (
+    "An error occurred while trying to get a response from",
+    "Response blocked by Gemini",
+    "Gemini did not return any content",
+    "Gemini model not available"
+)
+
+logger = logging.getLogger(__name__)
+
+# Process-wide, so models (and their connections) survive reruns and are shared between sessions
+_model_registry = {}
+_model_registry_lock = threading.Lock()
+
+# Time-to-first-token of recent streamed responses, in seconds
+_first_token_latencies = deque(maxlen=100)
+
+# Charts uploaded to the Files API per (API key, image hash), so a conversation sends a reference instead of the image.
+# Each entry is a Future, so questions arriving while the chart is being uploaded wait for that upload.
+_file_clients = {}
+_uploaded_files = {}
+_uploaded_files_lock = threading.Lock()
+
+
+class GeminiRequestError(Exception):
+    pass
 
 
 def configure_gemini_api(api_key: str) -> bool:
     if api_key:
         try:
-            genai.configure(api_key=api_key)
+            if GEMINI_API_ENDPOINT:
+                genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+            else:
+                genai.configure(api_key=api_key)
             return True
         except Exception as e:
-            st.error(f"Failed to configure Gemini: {e}")
+            logger.error("Failed to configure Gemini: %s", e)
             return False
     return False
 
 
-def get_gemini_model(api_key: str):
+def _create_gemini_model(api_key: str, model_name: str):
     if configure_gemini_api(api_key):
         try:
-            model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+            model = genai.GenerativeModel(model_name)
+            # Bind the client now, so configuring another key later does not redirect this model.
+            # The SDK has no public way to pass a client; _client is what generate_content reads in the
+            # version pinned in requirements.txt, and tests/test_gemini_models.py fails if that changes.
+            model._client = genai_client.get_default_generative_client()
             return model
         except Exception as e:
-            st.error(f"Error creating Gemini model '{GEMINI_MODEL_NAME}': {e}")
+            logger.error("Error creating Gemini model '%s': %s", model_name, e)
     return None
 
 
-def _call_gemini_api(api_key: str, pil_image, detailed_prompt: str) -> str:
-    model = get_gemini_model(api_key)
-    if not model:
-        return "Gemini model not available. Please check your API key and configuration in the sidebar."
+def get_gemini_model(api_key: str, model_name: str = GEMINI_MODEL_NAME):
+    if not api_key:
+        return None
 
-    try:
-        # The expert persona prompt is always included
-        base_prompt = (
-            "You are an expert in reading charts and graphs. "
-            "Look at the given graph and answer the following question accurately. "
-            "Provide the numeric value or observation directly based on the graph content. "
-            "Do not include any additional explanatory text in your response, only the extracted data."
+    registry_key = (api_key, model_name)
+    with _model_registry_lock:
+        model = _model_registry.get(registry_key)
+        if model is None:
+            model = _create_gemini_model(api_key, model_name)
+            if model is not None:
+                _model_registry[registry_key] = model
+    return model
+
+
+def invalidate_gemini_models(api_key: str):
+    if not api_key:
+        return
+    # The file client and the uploaded files belong to the key too, so a removed key leaves nothing behind
+    with _model_registry_lock:
+        for registry_key in [key for key in _model_registry if key[0] == api_key]:
+            del _model_registry[registry_key]
+        _file_clients.pop(api_key, None)
+    with _uploaded_files_lock:
+        for registry_key in [key for key in _uploaded_files if key[0] == api_key]:
+            del _uploaded_files[registry_key]
+
+
+def _get_file_client(api_key: str):
+    with _model_registry_lock:
+        file_client = _file_clients.get(api_key)
+        if file_client is None and configure_gemini_api(api_key):
+            # Bound to this key like the models, so other sessions configuring their own key do not redirect it
+            file_client = genai_client.get_default_file_client()
+            _file_clients[api_key] = file_client
+    return file_client
+
+
+def _upload_chart_file(api_key: str, image) -> tuple:
+    # Returns (file_data part, expiry timestamp), or None when the image has to be sent inline.
+    # The SDK's file service always talks to Google, so nothing is uploaded when another endpoint is configured.
+    file_client = None if GEMINI_API_ENDPOINT else _get_file_client(api_key)
+    if file_client is None:
+        return None
+    if isinstance(image, dict):
+        data, mime_type = image["data"], image["mime_type"]
+    else:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        data, mime_type = buffer.getvalue(), "image/png"
+
+    with span("gemini_upload") as attributes:
+        attributes["bytes_uploaded"] = len(data)
+        increment("gemini_bytes_uploaded_total", len(data))
+        increment("gemini_file_uploads_total")
+        uploaded = schedule_request(
+            api_key, lambda: file_client.create_file(path=io.BytesIO(data), mime_type=mime_type, resumable=False)
         )
-        content_parts = [base_prompt, detailed_prompt, pil_image]
-        response = model.generate_content(content_parts)
-
-        if response.parts:
-            return response.text
-        elif response.prompt_feedback and response.prompt_feedback.block_reason:
-            return (
-                f"Response blocked by Gemini due to: "
-                f"{response.prompt_feedback.block_reason.name}. "
-            )
+    return {"file_data": {"mime_type": uploaded.mime_type, "file_uri": uploaded.uri}}, uploaded.expiration_time.timestamp()
+
+
+def _get_chart_file_part(api_key: str, image, image_hash: str):
+    registry_key = (api_key, image_hash)
+    with _uploaded_files_lock:
+        upload = _uploaded_files.get(registry_key)
+        # Files expire after two days; one that is about to expire is uploaded again
+        is_uploader = upload is None or (
+            upload.done() and upload.result()[1] - time.time() < GEMINI_FILE_REFRESH_SECONDS
+        )
+        if is_uploader:
+            upload = Future()
+            _uploaded_files[registry_key] = upload
+    if is_uploader:
+        try:
+            entry = _upload_chart_file(api_key, image)
+        except Exception as e:
+            logger.warning("Uploading the chart to the Files API failed, sending it inline: %s", e)
+            entry = None
+        if entry is None:
+            # Nothing is remembered, so the next question tries the upload again
+            _forget_chart_file(api_key, image_hash, upload)
+        upload.set_result(entry)
+    entry = upload.result()
+    return image if entry is None else entry[0]
+
+
+def _forget_chart_file(api_key: str, image_hash: str, upload: Future = None):
+    # A file that was deleted or has expired early fails the request; the next question uploads it again.
+    # With an upload given, the entry is only removed if no newer upload has replaced it.
+    registry_key = (api_key, image_hash)
+    with _uploaded_files_lock:
+        if upload is None or _uploaded_files.get(registry_key) is upload:
+            _uploaded_files.pop(registry_key, None)
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _is_failed_answer(message: dict) -> bool:
+    return any(str(part).startswith(_FAILED_ANSWER_PREFIXES) for part in message["parts"])
+
+
+def select_conversation_history(chat_log: list, max_messages: int = CHAT_HISTORY_MAX_MESSAGES) -> list:
+    # Only questions asked in the chat (marked "conversation") and their answers are context. Extraction requests,
+    # structured summaries and failed answers are left out, together with the question they belong to.
+    history = []
+    for question, answer in zip(chat_log, chat_log[1:]):
+        if (question["role"] == "user" and question.get("conversation") and answer["role"] == "model"
+                and answer.get("conversation") and not _is_failed_answer(answer)):
+            history += [{"role": "user", "parts": question["parts"]}, {"role": "model", "parts": answer["parts"]}]
+    return history[-max_messages:] if max_messages else []
+
+
+def _trim_history(history: list, user_prompt: str, token_budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> list:
+    # Keeps the newest messages that fit the budget next to the new question, starting at a user turn
+    budget = token_budget - _estimate_tokens(user_prompt)
+    kept = []
+    for message in reversed(history or []):
+        cost = sum(_estimate_tokens(str(part)) for part in message["parts"])
+        if cost > budget:
+            break
+        budget -= cost
+        kept.append(message)
+    kept.reverse()
+    while kept and kept[0]["role"] != "user":
+        kept.pop(0)
+    return kept
+
+
+def _build_conversation_contents(api_key: str, image, image_hash: str, history: list, user_prompt: str) -> list:
+    # The chat log is already in Gemini's role/parts shape. The persona prompt and the chart open the first turn,
+    # and consecutive messages of one role are merged so the turns alternate.
+    contents = []
+    for message in history + [{"role": "user", "parts": [user_prompt]}]:
+        parts = [str(part) for part in message["parts"]]
+        if contents and contents[-1]["role"] == message["role"]:
+            contents[-1]["parts"].extend(parts)
         else:
-            return "Gemini did not return any content for this query. "
+            contents.append({"role": message["role"], "parts": parts})
+    contents[0]["parts"][:0] = [BASE_PROMPT, _get_chart_file_part(api_key, image, image_hash)]
+    return contents
+
+
+def _format_history_prompt(history: list, user_prompt: str) -> str:
+    # Local models get the earlier turns as text in front of the question
+    lines = [f"{'User' if message['role'] == 'user' else 'Assistant'}: {' '.join(map(str, message['parts']))}"
+             for message in history]
+    return "Earlier conversation about this chart:\n" + "\n".join(lines) + f"\n\nQuestion: {user_prompt}"
+
+
+def _build_contents(api_key: str, image, detailed_prompt: str, image_hash: str = None, history: list = None) -> list:
+    if history is None:
+        return [BASE_PROMPT, detailed_prompt, image]
+    return _build_conversation_contents(api_key, image, image_hash or _hash_image(image), history, detailed_prompt)
+
+
+def _count_uploaded_bytes(contents: list) -> int:
+    parts = []
+    for item in contents:
+        parts.extend(item["parts"] if isinstance(item, dict) and "parts" in item else [item])
+    return sum(len(part["data"]) for part in parts if isinstance(part, dict) and "data" in part)
+
+
+def _hash_image(image) -> str:
+    # Images are either PIL images or pre-processed {"mime_type", "data"} blobs
+    if isinstance(image, dict):
+        return hashlib.sha256(image["data"]).hexdigest()
+    image_hash = hashlib.sha256(f"{image.mode}:{image.size}".encode("utf-8"))
+    image_hash.update(image.tobytes())
+    return image_hash.hexdigest()
+
+
+def _get_response_cache_key(image, detailed_prompt: str, image_hash: str = None, response_schema: dict = None,
+                            model_name: str = GEMINI_MODEL_NAME) -> str:
+    prompt = f"{BASE_PROMPT}\n{detailed_prompt}"
+    if response_schema:
+        prompt += f"\n{json.dumps(response_schema, sort_keys=True)}"
+    # Answers from another endpoint (such as the mock server) must not be served for the real one
+    if GEMINI_API_ENDPOINT:
+        model_name = f"{model_name}@{GEMINI_API_ENDPOINT}"
+    return make_cache_key(image_hash or _hash_image(image), prompt, model_name)
+
+
+def _get_generation_config(response_schema: dict = None):
+    if not response_schema:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": response_schema}
+
+
+def _describe_empty_response(response) -> str:
+    if response.prompt_feedback and response.prompt_feedback.block_reason:
+        return (
+            f"Response blocked by Gemini due to: "
+            f"{response.prompt_feedback.block_reason.name}. "
+        )
+    return "Gemini did not return any content for this query. "
+
+
+def _record_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        increment("gemini_prompt_tokens_total", usage.prompt_token_count)
+        increment("gemini_output_tokens_total", usage.candidates_token_count)
+
+
+def _generate_content(api_key: str, model, content_parts: list, response_schema: dict = None, stream: bool = False):
+    # Retries are left to the scheduler, which also paces requests per API key. A stream holds
+    # its slot until the first chunk arrives, which is when throttling errors surface.
+    with span("gemini_request") as attributes:
+        attributes["bytes_uploaded"] = _count_uploaded_bytes(content_parts)
+        increment("gemini_bytes_uploaded_total", attributes["bytes_uploaded"])
+        response = schedule_request(api_key, lambda: model.generate_content(
+            content_parts, generation_config=_get_generation_config(response_schema), stream=stream,
+            request_options={"retry": None}
+        ))
+    if not stream:
+        _record_usage(response)
+    return response
+
+
+def _stream_gemini_api(api_key: str, model, image, detailed_prompt: str, cache_key: str = None,
+                       response_schema: dict = None, image_hash: str = None, history: list = None):
+    try:
+        with span("gemini_stream") as attributes:
+            if cache_key:
+                cached_text = get_cached_response(cache_key)
+                if cached_text is not None:
+                    attributes["cache_hit"] = True
+                    increment("gemini_cache_hits_total")
+                    yield cached_text
+                    return
+
+            content_parts = _build_contents(api_key, image, detailed_prompt, image_hash, history)
+            start_time = time.perf_counter()
+            response = _generate_content(api_key, model, content_parts, response_schema, stream=True)
+
+            chunks = []
+            for chunk in response:
+                # A blocked prompt has no candidates, and .parts raises instead of returning [] then
+                if not chunk.candidates or not chunk.parts:
+                    continue
+                if not chunks:
+                    attributes["time_to_first_token"] = time.perf_counter() - start_time
+                    _first_token_latencies.append(attributes["time_to_first_token"])
+                chunks.append(chunk.text)
+                yield chunk.text
+            _record_usage(response)
+
+            if chunks:
+                if cache_key:
+                    store_response(cache_key, "".join(chunks))
+            else:
+                increment("gemini_blocked_total")
+                yield _describe_empty_response(response)
+    except BlockedPromptException as e:
+        # Streaming raises on a blocked prompt; the exception carries the response with its feedback
+        increment("gemini_blocked_total")
+        yield _describe_empty_response(e.args[0])
+    except Exception as e:
+        increment("gemini_errors_total")
+        logger.error("An unexpected error occurred while communicating with Gemini: %s", e)
+        if history is not None:
+            _forget_chart_file(api_key, image_hash or _hash_image(image))
+        yield f"An error occurred while trying to get a response from Gemini: {str(e)}. "
+
+
+def _to_pil_image(image):
+    if isinstance(image, dict):
+        return flatten_to_rgb(Image.open(io.BytesIO(image["data"])))
+    return flatten_to_rgb(image)
+
+
+def _extract_json_text(text: str) -> str:
+    # Local models have no JSON mode and tend to wrap their answer in code fences or prose
+    start, end = text.find("{"), text.rfind("}")
+    return text[start:end + 1] if 0 <= start < end else text
+
+
+def _call_local_model(image, detailed_prompt: str, image_hash: str = None, use_cache: bool = True,
+                      stream: bool = False, response_schema: dict = None, raise_errors: bool = False,
+                      model_name: str = None):
+    try:
+        with span("local_call") as attributes:
+            cache_key = None
+            if use_cache:
+                cache_key = _get_response_cache_key(image, detailed_prompt, image_hash, response_schema, model_name)
+                cached_text = get_cached_response(cache_key)
+                if cached_text is not None:
+                    attributes["cache_hit"] = True
+                    increment("gemini_cache_hits_total")
+                    return iter([cached_text]) if stream else cached_text
+
+            prompt = f"{BASE_PROMPT}\n{detailed_prompt}"
+            if response_schema:
+                prompt += f"\nAnswer only with JSON that follows this schema: {json.dumps(response_schema)}"
+            response_text = get_local_backend(model_name).generate(_to_pil_image(image), prompt)
+            if response_schema:
+                response_text = _extract_json_text(response_text)
+            if cache_key and response_text:
+                store_response(cache_key, response_text)
     except Exception as e:
-        st.error(f"An unexpected error occurred while communicating with Gemini: {str(e)}")
+        increment("local_errors_total")
+        logger.error("An unexpected error occurred while running the local model: %s", e)
+        if raise_errors:
+            raise GeminiRequestError(str(e)) from e
+        response_text = f"An error occurred while trying to get a response from the local model: {str(e)}. "
+    # Generation is batched rather than streamed, so a stream is the whole answer in one piece
+    return iter([response_text]) if stream else response_text
+
+
+def _call_gemini_api(api_key: str, image, detailed_prompt: str, image_hash: str = None, use_cache: bool = True,
+                     stream: bool = False, response_schema: dict = None, raise_errors: bool = False,
+                     model_name: str = GEMINI_MODEL_NAME, history: list = None):
+    # With raise_errors, failed and blocked requests raise GeminiRequestError instead of returning a message.
+    # With a history (possibly empty), the question is asked as the next turn of that conversation.
+    if history is not None:
+        history = _trim_history(history, detailed_prompt)
+    if is_local_model(model_name):
+        if history is not None:
+            detailed_prompt = _format_history_prompt(history, detailed_prompt)
+        return _call_local_model(image, detailed_prompt, image_hash, use_cache, stream, response_schema,
+                                 raise_errors, model_name)
+    model = get_gemini_model(api_key, model_name)
+    if not model:
+        unavailable_message = "Gemini model not available. Please check your API key and configuration in the sidebar."
+        if raise_errors:
+            raise GeminiRequestError(unavailable_message)
+        return iter([unavailable_message]) if stream else unavailable_message
+
+    try:
+        cache_key = None
+        if use_cache:
+            # The answer depends on the earlier turns as well as on the question
+            cache_prompt = detailed_prompt if history is None else json.dumps([history, detailed_prompt])
+            cache_key = _get_response_cache_key(image, cache_prompt, image_hash, response_schema, model_name)
+        if stream:
+            return _stream_gemini_api(api_key, model, image, detailed_prompt, cache_key, response_schema,
+                                      image_hash, history)
+
+        with span("gemini_call") as attributes:
+            if cache_key:
+                cached_text = get_cached_response(cache_key)
+                if cached_text is not None:
+                    attributes["cache_hit"] = True
+                    increment("gemini_cache_hits_total")
+                    return cached_text
+
+            content_parts = _build_contents(api_key, image, detailed_prompt, image_hash, history)
+            response = _generate_content(api_key, model, content_parts, response_schema)
+
+            if response.candidates and response.parts:
+                if cache_key:
+                    store_response(cache_key, response.text)
+                return response.text
+            increment("gemini_blocked_total")
+            if raise_errors:
+                raise GeminiRequestError(_describe_empty_response(response).strip())
+            return _describe_empty_response(response)
+    except GeminiRequestError:
+        raise
+    except Exception as e:
+        increment("gemini_errors_total")
+        logger.error("An unexpected error occurred while communicating with Gemini: %s", e)
+        if history is not None:
+            _forget_chart_file(api_key, image_hash or _hash_image(image))
+        if raise_errors:
+            raise GeminiRequestError(str(e)) from e
         return f"An error occurred while trying to get a response from Gemini: {str(e)}. "
 
 
-def generate_chat_response(api_key: str, pil_image, user_prompt: str) -> str:
-    return _call_gemini_api(api_key, pil_image, user_prompt)
+def get_streaming_stats() -> dict:
+    latencies = list(_first_token_latencies)
+    return {
+        "last_time_to_first_token": latencies[-1] if latencies else None,
+        "avg_time_to_first_token": sum(latencies) / len(latencies) if latencies else None
+    }
+
+
+def generate_chat_response(api_key: str, image, user_prompt: str, image_hash: str = None,
+                           use_cache: bool = True, stream: bool = False, raise_errors: bool = False,
+                           model_name: str = GEMINI_MODEL_NAME, history: list = None):
+    # history is the image's chat log before this question; None asks the question on its own
+    return _call_gemini_api(
+        api_key, image, user_prompt, image_hash=image_hash, use_cache=use_cache, stream=stream,
+        raise_errors=raise_errors, model_name=model_name, history=history
+    )
 
 
-def get_response_for_line_chart(api_key: str, pil_image, num_points: int) -> str:
+def get_response_for_line_chart(api_key: str, image, num_points: int, image_hash: str = None,
+                                stream: bool = False, raise_errors: bool = False,
+                                model_name: str = GEMINI_MODEL_NAME):
     prompt = (
         f"This is a line chart. Read the (x, y) coordinates for {num_points} points from it. "
         f"The points should be evenly distributed along the X-axis, from minimum to maximum. "
         f"If there is more than one line, extract points for all lines. "
-        f"Return the results in the format: '[line name or color]: list of (x, y) pairs'."
+        f"Return one series per line, named after its legend entry or color."
+    )
+    return _call_gemini_api(
+        api_key, image, prompt, image_hash=image_hash, stream=stream, response_schema=POINT_SERIES_SCHEMA,
+        raise_errors=raise_errors, model_name=model_name
     )
-    return _call_gemini_api(api_key, pil_image, prompt)
 
 
-def get_response_for_bar_chart(api_key: str, pil_image) -> str:
+def get_response_for_bar_chart(api_key: str, image, image_hash: str = None,
+                               stream: bool = False, raise_errors: bool = False,
+                               model_name: str = GEMINI_MODEL_NAME):
     prompt = (
         "This is a bar chart. For each bar, identify its label on the category axis (X-axis) and "
         "read its corresponding numerical value from the value axis (Y-axis). "
-        "Return the results as a clean list of 'Bar Label: Value' pairs. "
-        "If it is a grouped or stacked bar chart, identify the series for each bar (by color or legend)."
+        "Return every bar with its label and value. "
+        "If it is a grouped or stacked bar chart, identify the series for each bar (by color or legend); "
+        "otherwise return a single series."
+    )
+    return _call_gemini_api(
+        api_key, image, prompt, image_hash=image_hash, stream=stream, response_schema=BAR_SERIES_SCHEMA,
+        raise_errors=raise_errors, model_name=model_name
     )
-    return _call_gemini_api(api_key, pil_image, prompt)
 
 
-def get_response_for_scatter_plot(api_key: str, pil_image, num_points: int) -> str:
+def get_response_for_scatter_plot(api_key: str, image, num_points: int, image_hash: str = None,
+                                  stream: bool = False, raise_errors: bool = False,
+                                  model_name: str = GEMINI_MODEL_NAME):
     prompt = (
         f"This is a scatter plot. Extract the (x, y) coordinates for {num_points} points for it."
         f"The points should be evenly distributed along the X-axis, from minimum to maximum."
         "If there are multiple groups of points (differentiated by color or shape), "
         "identify which group each point belongs to. "
-        "Return the results as a list of (x, y) coordinates, grouped by series name if applicable."
+        "Return the (x, y) coordinates grouped into one series per group, or a single series otherwise."
+    )
+    return _call_gemini_api(
+        api_key, image, prompt, image_hash=image_hash, stream=stream, response_schema=POINT_SERIES_SCHEMA,
+        raise_errors=raise_errors, model_name=model_name
     )
-    return _call_gemini_api(api_key, pil_image, prompt)
\ No newline at end of file
+
+
+def get_values_at_x(api_key: str, image, x_values: list, image_hash: str = None, use_cache: bool = True,
+                    raise_errors: bool = False, model_name: str = GEMINI_MODEL_NAME) -> tuple:
+    # One request for all X values, so the image is uploaded once instead of once per value.
+    # Returns (float64 array aligned with x_values, NaN where no value was read, per-value error or None).
+    if not x_values:
+        return np.empty(0), []
+    prompt = (
+        f"Read the Y value of the chart at each of these X values: {json.dumps([str(x) for x in x_values])}. "
+        "Return one entry per X value, in the same order, with x exactly as given. "
+        "Use null for y if the chart has no value at that X."
+    )
+    try:
+        response_text = _call_gemini_api(
+            api_key, image, prompt, image_hash=image_hash, use_cache=use_cache,
+            response_schema=VALUE_LIST_SCHEMA, raise_errors=True, model_name=model_name
+        )
+    except GeminiRequestError as e:
+        if raise_errors:
+            raise
+        return np.full(len(x_values), np.nan), [str(e)] * len(x_values)
+    increment("gemini_batched_values_total", len(x_values))
+    return parse_value_list_response(response_text, x_values)
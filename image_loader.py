@@ -0,0 +1,94 @@
+import functools
+import io
+import threading
+from PIL import Image
+from app_config import THUMBNAIL_MAX_DIMENSION, THUMBNAIL_CACHE_ENTRIES
+from blob_store import read_blob, write_blob, blob_exists
+
+# Thumbnails are shared by every record (and session) that holds the same content hash
+_thumbnail_hashes = {}
+_thumbnail_hashes_lock = threading.Lock()
+
+
+def flatten_to_rgb(pil_image):
+    # Transparent backgrounds are composited on white, like the charts are viewed; a plain
+    # convert("RGB") would turn them black
+    if pil_image.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in pil_image.info:
+        rgba = pil_image.convert("RGBA")
+        background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, rgba).convert("RGB")
+    return pil_image.convert("RGB")
+
+
+def has_image_data(img_info: dict) -> bool:
+    if img_info.get('pil_image') is not None or img_info.get('bytes_data'):
+        return True
+    return bool(img_info.get('blob_hash')) and blob_exists(img_info['blob_hash'])
+
+
+def _read_image_blob(blob_hash: str):
+    # Copied out and unmapped right away: a mapping holds a duplicated file descriptor for as long as it
+    # lives, and records stay in session state for the whole session
+    mapped = read_blob(blob_hash)
+    if not mapped:
+        return None
+    try:
+        return bytes(mapped)
+    finally:
+        mapped.close()
+
+
+def get_image_bytes(img_info: dict):
+    bytes_data = img_info.get('bytes_data')
+    if bytes_data is None and img_info.get('blob_hash'):
+        return _read_image_blob(img_info['blob_hash'])
+    if isinstance(bytes_data, list):
+        bytes_data = bytes(bytes_data)
+    return bytes_data or None
+
+
+def get_pil_image(img_info: dict):
+    # Full-resolution images are only decoded on first use, i.e. when they are sent to a model
+    if img_info.get('pil_image') is None:
+        bytes_data = get_image_bytes(img_info)
+        if bytes_data is None:
+            return None
+        img_info['pil_image'] = Image.open(io.BytesIO(bytes_data))
+    return img_info['pil_image']
+
+
+@functools.lru_cache(maxsize=THUMBNAIL_CACHE_ENTRIES)
+def _read_thumbnail(thumbnail_blob_hash: str):
+    return _read_image_blob(thumbnail_blob_hash)
+
+
+def _render_thumbnail(pil_image) -> bytes:
+    thumbnail = flatten_to_rgb(pil_image)
+    thumbnail.thumbnail((THUMBNAIL_MAX_DIMENSION, THUMBNAIL_MAX_DIMENSION), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    thumbnail.save(output, format="PNG")
+    return output.getvalue()
+
+
+def get_thumbnail(img_info: dict):
+    thumbnail_hash = img_info.get('thumbnail_blob_hash')
+    if not thumbnail_hash and img_info.get('blob_hash'):
+        with _thumbnail_hashes_lock:
+            thumbnail_hash = _thumbnail_hashes.get(img_info['blob_hash'])
+
+    if thumbnail_hash:
+        thumbnail = _read_thumbnail(thumbnail_hash)
+        if thumbnail is not None:
+            img_info['thumbnail_blob_hash'] = thumbnail_hash
+            return thumbnail
+
+    pil_image = get_pil_image(img_info)
+    if pil_image is None:
+        return None
+    thumbnail = _render_thumbnail(pil_image)
+    thumbnail_hash = write_blob(thumbnail)
+    img_info['thumbnail_blob_hash'] = thumbnail_hash
+    if img_info.get('blob_hash'):
+        with _thumbnail_hashes_lock:
+            _thumbnail_hashes[img_info['blob_hash']] = thumbnail_hash
+    return thumbnail
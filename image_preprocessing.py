@@ -0,0 +1,84 @@
+import io
+from PIL import Image
+from app_config import (
+    PREPROCESS_MAX_DIMENSION,
+    PREPROCESS_IMAGE_FORMAT,
+    PREPROCESS_CROP_MARGINS,
+    PREPROCESS_WHITESPACE_THRESHOLD,
+    PREPROCESS_MARGIN_PADDING,
+    PREPROCESS_WEBP_QUALITY
+)
+from blob_store import write_blob, read_blob
+from image_loader import get_pil_image, flatten_to_rgb
+
+IMAGE_MIME_TYPES = {"PNG": "image/png", "WEBP": "image/webp"}
+
+
+def crop_whitespace_margins(pil_image, threshold: int = PREPROCESS_WHITESPACE_THRESHOLD,
+                            padding: int = PREPROCESS_MARGIN_PADDING):
+    # Everything darker than the threshold counts as chart content
+    content_mask = flatten_to_rgb(pil_image).convert("L").point(lambda value: 255 if value < threshold else 0)
+    bbox = content_mask.getbbox()
+    if bbox is None:
+        return pil_image
+
+    left, top, right, bottom = bbox
+    return pil_image.crop((
+        max(left - padding, 0),
+        max(top - padding, 0),
+        min(right + padding, pil_image.width),
+        min(bottom + padding, pil_image.height)
+    ))
+
+
+def downscale_image(pil_image, max_dimension: int):
+    if not max_dimension or max(pil_image.size) <= max_dimension:
+        return pil_image
+    downscaled = pil_image.copy()
+    downscaled.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    return downscaled
+
+
+def encode_image(pil_image, image_format: str) -> bytes:
+    output = io.BytesIO()
+    if image_format == "PNG":
+        # Charts use few colors, so a 256-color palette is visually lossless and much smaller
+        palette_image = flatten_to_rgb(pil_image).quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        palette_image.save(output, format="PNG", optimize=True)
+    elif image_format == "WEBP":
+        flatten_to_rgb(pil_image).save(output, format="WEBP", quality=PREPROCESS_WEBP_QUALITY, method=4)
+    else:
+        raise ValueError(f"Unsupported pre-processing format '{image_format}'.")
+    return output.getvalue()
+
+
+def preprocess_image(pil_image, max_dimension: int = PREPROCESS_MAX_DIMENSION,
+                     image_format: str = PREPROCESS_IMAGE_FORMAT,
+                     crop_margins: bool = PREPROCESS_CROP_MARGINS) -> dict:
+    prepared_image = flatten_to_rgb(pil_image)
+    if crop_margins:
+        prepared_image = crop_whitespace_margins(prepared_image)
+    prepared_image = downscale_image(prepared_image, max_dimension)
+    return {"mime_type": IMAGE_MIME_TYPES[image_format], "data": encode_image(prepared_image, image_format)}
+
+
+def _current_settings() -> list:
+    return [PREPROCESS_MAX_DIMENSION, PREPROCESS_IMAGE_FORMAT, PREPROCESS_CROP_MARGINS]
+
+
+def get_prepared_image(img_info: dict) -> dict:
+    # Computed once per upload; the result is stored as a blob and referenced from the record
+    if img_info.get('prepared_settings') == _current_settings():
+        if img_info.get('prepared_image') is not None:
+            return img_info['prepared_image']
+        prepared_data = read_blob(img_info['prepared_blob_hash'])
+        if prepared_data:
+            img_info['prepared_image'] = {"mime_type": img_info['prepared_mime_type'], "data": bytes(prepared_data)}
+            return img_info['prepared_image']
+
+    prepared_image = preprocess_image(get_pil_image(img_info))
+    img_info['prepared_blob_hash'] = write_blob(prepared_image["data"])
+    img_info['prepared_mime_type'] = prepared_image["mime_type"]
+    img_info['prepared_settings'] = _current_settings()
+    img_info['prepared_image'] = prepared_image
+    return prepared_image
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from app_config import METRICS_RECENT_SPANS
+
+# Prometheus-style cumulative buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "graphchat"
+
+# Process-wide, like the model registry: every session and batch thread reports here
+_metrics_lock = threading.Lock()
+_span_histograms = {}
+_counters = {}
+_recent_spans = deque(maxlen=METRICS_RECENT_SPANS)
+
+
+def _new_histogram() -> dict:
+    return {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0, "errors": 0}
+
+
+def _record_span(name: str, started_at: float, duration: float, error: str = None, attributes: dict = None):
+    with _metrics_lock:
+        histogram = _span_histograms.setdefault(name, _new_histogram())
+        for index, upper_bound in enumerate(LATENCY_BUCKETS):
+            if duration <= upper_bound:
+                histogram["buckets"][index] += 1
+        histogram["count"] += 1
+        histogram["sum"] += duration
+        histogram["errors"] += error is not None
+        _recent_spans.append({
+            "span": name,
+            "start": started_at,
+            "duration_seconds": duration,
+            "error": error,
+            **(attributes or {})
+        })
+
+
+@contextmanager
+def span(name: str):
+    # Yields a dict; anything put into it is attached to the span's JSONL event
+    attributes = {}
+    started_at = time.time()
+    start_time = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _record_span(name, started_at, time.perf_counter() - start_time, error, attributes)
+
+
+def increment(name: str, value: float = 1):
+    with _metrics_lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def _bucket_quantile(histogram: dict, q: float):
+    # Upper bound of the bucket holding the q-quantile, as Prometheus' histogram_quantile would report
+    target = q * histogram["count"]
+    for upper_bound, cumulative in zip(LATENCY_BUCKETS, histogram["buckets"]):
+        if cumulative >= target:
+            return upper_bound
+    return float("inf")
+
+
+def get_metrics_snapshot() -> dict:
+    with _metrics_lock:
+        spans = {
+            name: {
+                "count": histogram["count"],
+                "errors": histogram["errors"],
+                "avg_seconds": histogram["sum"] / histogram["count"] if histogram["count"] else None,
+                "p50_seconds": _bucket_quantile(histogram, 0.5),
+                "p95_seconds": _bucket_quantile(histogram, 0.95)
+            }
+            for name, histogram in sorted(_span_histograms.items())
+        }
+        return {"spans": spans, "counters": dict(sorted(_counters.items()))}
+
+
+def export_prometheus() -> str:
+    lines = [
+        f"# HELP {METRIC_PREFIX}_span_duration_seconds Duration of instrumented operations.",
+        f"# TYPE {METRIC_PREFIX}_span_duration_seconds histogram"
+    ]
+    with _metrics_lock:
+        for name, histogram in sorted(_span_histograms.items()):
+            for upper_bound, cumulative in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="{upper_bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{{span="{name}"}} {histogram["sum"]}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{{span="{name}"}} {histogram["count"]}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+        for name, histogram in sorted(_span_histograms.items()):
+            lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{name}"}} {histogram["errors"]}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            lines.append(f"{METRIC_PREFIX}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def export_jsonl() -> str:
+    with _metrics_lock:
+        return "".join(json.dumps(event) + "\n" for event in _recent_spans)
@@ -0,0 +1,186 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app_config import LOCAL_MAX_BATCH_SIZE, LOCAL_BATCH_WAIT_SECONDS, LOCAL_MAX_NEW_TOKENS, LOCAL_QUANTIZATION
+from instrumentation import span, increment
+
+# Model names starting with this are served in-process by transformers instead of the Gemini API
+LOCAL_MODEL_PREFIX = "local:"
+
+logger = logging.getLogger(__name__)
+
+# Queued by close(); the batcher thread exits when it takes it
+_STOP = object()
+
+# Process-wide like the Gemini model registry: every session queues into the same batcher.
+# Holds a Future per model name, resolved once the model has loaded.
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def is_local_model(model_name: str) -> bool:
+    return bool(model_name) and model_name.startswith(LOCAL_MODEL_PREFIX)
+
+
+class LocalVisionBackend:
+    # A transformers image-text-to-text model behind a request queue. One thread takes whatever is waiting
+    # (up to max_batch_size, waiting at most batch_wait_seconds for more) and generates it as one padded batch.
+    def __init__(self, model_id: str, max_batch_size: int = LOCAL_MAX_BATCH_SIZE,
+                 batch_wait_seconds: float = LOCAL_BATCH_WAIT_SECONDS, quantization: str = LOCAL_QUANTIZATION,
+                 model=None, processor=None):
+        import torch
+        from transformers import AutoModelForImageTextToText, AutoProcessor
+
+        self.torch = torch
+        self.model_id = model_id
+        self.max_batch_size = max_batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.processor = processor or AutoProcessor.from_pretrained(model_id)
+        # Prompts are left-padded, so every row of the batch ends where generation starts
+        self.processor.tokenizer.padding_side = "left"
+
+        model = (model or AutoModelForImageTextToText.from_pretrained(model_id, torch_dtype=torch.float32)).eval()
+        if quantization == "int8":
+            # Dynamic quantization: int8 weights for every Linear layer, activations quantized on the fly (CPU only)
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+        self._requests = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+        # Guards _closed, so no request can be queued behind _STOP
+        self._closed_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"local-batcher-{model_id}")
+        self._thread.start()
+
+    def generate(self, image, prompt: str, max_new_tokens: int = LOCAL_MAX_NEW_TOKENS) -> str:
+        # Blocks the calling thread until the batch holding this request has been generated
+        future = Future()
+        with self._closed_lock:
+            if self._closed:
+                raise RuntimeError(f"The local backend for '{self.model_id}' has been closed.")
+            self._requests.put((image, prompt, max_new_tokens, future))
+        return future.result()
+
+    def close(self):
+        # Requests queued before close are still answered; the thread stops after them
+        with self._closed_lock:
+            if not self._closed:
+                self._closed = True
+                self._requests.put(_STOP)
+        self._thread.join()
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else None
+        stats["waiting"] = self._requests.qsize()
+        return stats
+
+    def _next_batch(self) -> list:
+        item = self._requests.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Generate what was collected first; the next call sees the stop
+                self._requests.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._fail_pending()
+                return
+            try:
+                texts = self._generate_batch(batch)
+            except Exception as e:
+                logger.error("Local generation with '%s' failed: %s", self.model_id, e)
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            for (*_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+    def _fail_pending(self):
+        # Nothing is answered after the stop, so whoever is still waiting gets an error instead of blocking
+        while True:
+            try:
+                item = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                item[3].set_exception(RuntimeError(f"The local backend for '{self.model_id}' has been closed."))
+
+    def _generate_batch(self, batch: list) -> list:
+        conversations = [
+            [{"role": "user", "content": [{"type": "image", "image": image}, {"type": "text", "text": prompt}]}]
+            for image, prompt, _, _ in batch
+        ]
+        with span("local_generate") as attributes:
+            attributes["batch_size"] = len(batch)
+            inputs = self.processor.apply_chat_template(
+                conversations, add_generation_prompt=True, tokenize=True, return_dict=True,
+                return_tensors="pt", padding=True
+            )
+            with self.torch.inference_mode():
+                output = self.model.generate(
+                    **inputs, max_new_tokens=max(item[2] for item in batch), do_sample=False
+                )
+            # Decoder-only models echo the prompt; only the new tokens are the answer
+            new_tokens = output[:, inputs["input_ids"].shape[-1]:]
+            texts = [
+                self.processor.decode(tokens[:max_new_tokens], skip_special_tokens=True).strip()
+                for tokens, (_, _, max_new_tokens, _) in zip(new_tokens, batch)
+            ]
+
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        increment("local_requests_total", len(batch))
+        increment("local_batches_total")
+        return texts
+
+
+def get_local_backend(model_name: str) -> LocalVisionBackend:
+    # The registry lock only hands out one future per model; the first caller loads the model outside it,
+    # so other models, other sessions and the stats stay responsive while weights download
+    with _backends_lock:
+        future = _backends.get(model_name)
+        is_loader = future is None
+        if is_loader:
+            future = Future()
+            _backends[model_name] = future
+    if is_loader:
+        try:
+            future.set_result(LocalVisionBackend(model_name[len(LOCAL_MODEL_PREFIX):]))
+        except Exception as e:
+            # A failed load is not cached, so the next request tries again
+            with _backends_lock:
+                _backends.pop(model_name, None)
+            future.set_exception(e)
+    return future.result()
+
+
+def get_local_backend_stats() -> dict:
+    with _backends_lock:
+        futures = dict(_backends)
+    # Models still loading are left out instead of waited for
+    return {
+        model_name: future.result().get_stats()
+        for model_name, future in futures.items() if future.done() and future.exception() is None
+    }
@@ -1,7 +1,8 @@
 import streamlit as st
 from app_config import APP_TITLE, APP_ICON, SESS_API_KEY, SESS_UPLOADED_IMAGES
 from session import initialize_session_state, save_session_data
-from ui import render_sidebar, render_image_uploader, render_analysis_sections
+from ui import render_sidebar, render_image_uploader, render_batch_analysis, render_analysis_sections
+from instrumentation import span
 
 def run_application():
     initialize_session_state()
@@ -22,6 +23,7 @@ def run_application():
     st.markdown("---")
     render_image_uploader()
     st.markdown("---")
+    render_batch_analysis()
     render_analysis_sections()
 
     data_to_save = {
@@ -32,4 +34,6 @@ def run_application():
 
 
 if __name__ == "__main__":
-    run_application()
\ No newline at end of file
+    # Every rerun is timed, including those cut short by st.rerun()
+    with span("script_run"):
+        run_application()
\ No newline at end of file
@@ -0,0 +1,369 @@
+import argparse
+import base64
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from PIL import Image
+from image_loader import flatten_to_rgb
+from image_preprocessing import crop_whitespace_margins
+
+DEFAULT_METADATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ModelComparison", "benchmark_images")
+FINGERPRINT_SIZE = 32
+# Mean absolute grayscale difference (0-255) above which an image is treated as unknown
+FINGERPRINT_MAX_DISTANCE = 12.0
+STREAM_CHUNK_CHARS = 24
+
+
+def parse_latency_spec(spec: str):
+    # "fixed:0.2", "uniform:0.1,0.5", "normal:0.5,0.1" or "lognormal:<median>,<sigma>", in seconds
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: values[0] * np.exp(rng.gauss(0.0, values[1]))
+    raise ValueError(f"Invalid latency spec '{spec}'.")
+
+
+def image_fingerprint(pil_image) -> np.ndarray:
+    # Robust to the app's pre-processing: margins are cropped the same way before comparing
+    image = crop_whitespace_margins(flatten_to_rgb(pil_image)).convert("L")
+    image = image.resize((FINGERPRINT_SIZE, FINGERPRINT_SIZE), Image.Resampling.BILINEAR)
+    return np.asarray(image, dtype=np.float32).ravel()
+
+
+def load_ground_truth(metadata_dir: str) -> tuple:
+    entries, fingerprints = [], []
+    for metadata_file in sorted(glob.glob(os.path.join(metadata_dir, "*", "*_metadata.jsonl"))):
+        chart_type = os.path.basename(metadata_file).split("_")[0]
+        with open(metadata_file, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                image_path = os.path.join(os.path.dirname(metadata_file), entry["id"] + ".png")
+                if not os.path.exists(image_path):
+                    continue
+                with Image.open(image_path) as pil_image:
+                    fingerprints.append(image_fingerprint(pil_image))
+                entries.append({**entry, "chart_type": chart_type})
+    return entries, np.stack(fingerprints) if fingerprints else np.empty((0, FINGERPRINT_SIZE ** 2))
+
+
+def _format_value(value: float) -> str:
+    return f"{value:.2f}"
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: str = "fixed:0", error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 block_rate: float = 0.0, answer_noise: float = 0.0, chunk_interval: float = 0.02, seed: int = 0,
+                 max_concurrent: int = 0, metadata_dir: str = DEFAULT_METADATA_DIR, upload_bandwidth: float = 0.0):
+        super().__init__(address, MockGeminiRequestHandler)
+        self.sample_latency = parse_latency_spec(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.block_rate = block_rate
+        self.answer_noise = answer_noise
+        self.chunk_interval = chunk_interval
+        self.seed = seed
+        self.max_concurrent = max_concurrent
+        self.upload_bandwidth = upload_bandwidth
+        self.in_flight = 0
+        self.entries, self.fingerprints = load_ground_truth(metadata_dir) if metadata_dir else ([], None)
+        self.lock = threading.Lock()
+        self.seen_requests = {}
+        # Files API uploads by name ("files/<id>"), referenced from fileData parts
+        self.files = {}
+        self.stats = {
+            "requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "blocked": 0, "matched_images": 0, "uploads": 0
+        }
+
+    def request_rng(self, body: bytes):
+        # Seeded by the request content and how often it was seen, so outcomes do not depend on
+        # the order concurrent requests arrive in, while a retried request gets a fresh draw
+        body_hash = hashlib.sha256(body).hexdigest()
+        with self.lock:
+            attempt = self.seen_requests.get(body_hash, 0)
+            self.seen_requests[body_hash] = attempt + 1
+        return random.Random(f"{self.seed}:{body_hash}:{attempt}")
+
+    def count(self, outcome: str):
+        with self.lock:
+            self.stats["requests"] += outcome != "matched_images"
+            self.stats[outcome] += 1
+
+    def match_image(self, image_bytes: bytes):
+        if not self.entries:
+            return None
+        with Image.open(io.BytesIO(image_bytes)) as pil_image:
+            distances = np.abs(self.fingerprints - image_fingerprint(pil_image)).mean(axis=1)
+        best = int(np.argmin(distances))
+        return self.entries[best] if distances[best] <= FINGERPRINT_MAX_DISTANCE else None
+
+
+class MockGeminiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_error(404, "NOT_FOUND", f"Unknown path {self.path}.")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.upload_bandwidth:
+            # A client uplink of that many bytes per second, so large inline images cost time as they would remotely
+            time.sleep(len(body) / self.server.upload_bandwidth)
+        if self.path.split("?")[0].rstrip("/") == "/upload/v1beta/files":
+            self._handle_upload(body)
+            return
+        match = re.match(r"^/v1beta/models/([^:]+):(generateContent|streamGenerateContent)", self.path)
+        if match is None:
+            self._send_error(404, "NOT_FOUND", f"Unknown path {self.path}.")
+            return
+
+        server = self.server
+        # Like a per-project quota: requests beyond max_concurrent in flight are throttled at once
+        with server.lock:
+            over_quota = bool(server.max_concurrent) and server.in_flight >= server.max_concurrent
+            server.in_flight += not over_quota
+        if over_quota:
+            server.count("rate_limited")
+            self._send_error(429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota).")
+            return
+        try:
+            self._handle_generate(body, match.group(2) == "streamGenerateContent")
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _handle_upload(self, body: bytes):
+        # Simple media upload (uploadType=media): the body is the file itself
+        server = self.server
+        time.sleep(server.sample_latency(server.request_rng(body)))
+        name = f"files/{hashlib.sha256(body).hexdigest()[:16]}"
+        with server.lock:
+            server.files[name] = body
+            server.stats["uploads"] += 1
+        host, port = self.server.server_address[:2]
+        self._send_json(200, {"file": {
+            "name": name,
+            "uri": f"http://{host}:{port}/v1beta/{name}",
+            "mimeType": self.headers.get("Content-Type", "application/octet-stream"),
+            "sizeBytes": str(len(body)),
+            "state": "ACTIVE",
+            "expirationTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 48 * 60 * 60))
+        }})
+
+    def _handle_generate(self, body: bytes, is_stream: bool):
+        server = self.server
+        rng = server.request_rng(body)
+        time.sleep(server.sample_latency(rng))
+
+        draw = rng.random()
+        if draw < server.error_rate:
+            server.count("errors")
+            self._send_error(503, "UNAVAILABLE", "The service is currently unavailable.")
+            return
+        if draw < server.error_rate + server.rate_limit_rate:
+            server.count("rate_limited")
+            self._send_error(429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota).")
+            return
+
+        request = json.loads(body or b"{}")
+        if draw < server.error_rate + server.rate_limit_rate + server.block_rate:
+            server.count("blocked")
+            response = {"promptFeedback": {"blockReason": "SAFETY"}, "usageMetadata": self._usage(request, "")}
+            self._send_stream([response]) if is_stream else self._send_json(200, response)
+            return
+
+        text = self._answer(request, rng)
+        server.count("ok")
+        if is_stream:
+            chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+            self._send_stream([
+                self._candidate_response(chunk, request, text if index == len(chunks) - 1 else "")
+                for index, chunk in enumerate(chunks)
+            ])
+        else:
+            self._send_json(200, self._candidate_response(text, request, text))
+
+    def _answer(self, request: dict, rng) -> str:
+        texts, images = [], []
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                if "text" in part:
+                    texts.append(part["text"])
+                elif "inlineData" in part:
+                    images.append(base64.b64decode(part["inlineData"]["data"]))
+                elif "fileData" in part:
+                    name = "files/" + part["fileData"]["fileUri"].rstrip("/").rsplit("/", 1)[-1]
+                    with self.server.lock:
+                        file_bytes = self.server.files.get(name)
+                    if file_bytes is not None:
+                        images.append(file_bytes)
+        prompt = "\n".join(texts)
+
+        entry = None
+        for image_bytes in images:
+            try:
+                entry = self.server.match_image(image_bytes)
+            except Exception:
+                entry = None
+            if entry is not None:
+                self.server.count("matched_images")
+                break
+
+        noise = lambda: rng.gauss(0.0, self.server.answer_noise) if self.server.answer_noise else 0.0
+        generation_config = request.get("generationConfig", {})
+        if generation_config.get("responseMimeType") == "application/json":
+            return json.dumps(self._structured_answer(entry, prompt, generation_config, noise))
+
+        # In a conversation the latest question comes last
+        x_matches = list(re.finditer(r"X\s*=\s*(-?\d+(?:\.\d+)?)", prompt))
+        x_match = x_matches[-1] if x_matches else None
+        if x_match and entry is not None:
+            x_val = float(x_match.group(1))
+            point = min(entry["points"], key=lambda point: abs(point["x"] - x_val))
+            return _format_value(point["y"] + noise())
+        if x_match:
+            return _format_value(rng.uniform(0, 100))
+        if entry is not None:
+            return f"This is a {entry['chart_type']} chart with {len(entry['points'])} data points."
+        return "This is a mock answer from the local Gemini stand-in."
+
+    def _structured_answer(self, entry, prompt: str, generation_config: dict, noise) -> dict:
+        points = entry["points"] if entry is not None else []
+        values_match = re.search(r"X values: (\[.*?\])", prompt)
+        if values_match:
+            values = []
+            for x_val in json.loads(values_match.group(1)):
+                try:
+                    point = min(points, key=lambda point: abs(point["x"] - float(x_val))) if points else None
+                except ValueError:
+                    point = None
+                values.append({"x": x_val, "y": round(point["y"] + noise(), 2) if point else None})
+            return {"values": values}
+
+        count_match = re.search(r"for (\d+) points", prompt)
+        if count_match and len(points) > int(count_match.group(1)):
+            step = (len(points) - 1) / max(int(count_match.group(1)) - 1, 1)
+            points = [points[round(index * step)] for index in range(int(count_match.group(1)))]
+
+        if "bars" in json.dumps(generation_config.get("responseSchema", {})):
+            bars = [{"label": str(point["x"]), "value": round(point["y"] + noise(), 2)} for point in points]
+            return {"series": [{"name": "Series 1", "bars": bars}]}
+        return {"series": [{
+            "name": "Series 1",
+            "points": [{"x": point["x"], "y": round(point["y"] + noise(), 2)} for point in points]
+        }]}
+
+    def _usage(self, request: dict, text: str) -> dict:
+        # Rough token counts: about 4 characters per text token and 258 tokens per image
+        prompt_tokens = 0
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                prompt_tokens += len(part["text"]) // 4 + 1 if "text" in part else 258
+        candidate_tokens = len(text) // 4 + 1 if text else 0
+        return {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": candidate_tokens,
+            "totalTokenCount": prompt_tokens + candidate_tokens
+        }
+
+    def _candidate_response(self, text: str, request: dict, usage_text: str) -> dict:
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": self._usage(request, usage_text)
+        }
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, error_status: str, message: str):
+        self._send_json(status, {"error": {"code": status, "message": message, "status": error_status}})
+
+    def _send_stream(self, responses: list):
+        # The REST transport reads streamed responses as one JSON array delivered in chunks
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, response in enumerate(responses):
+            if index:
+                time.sleep(self.server.chunk_interval)
+            self._write_chunk(("[" if index == 0 else ",") + json.dumps(response))
+        self._write_chunk("]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **options) -> MockGeminiServer:
+    # Serves from a daemon thread; the endpoint is f"http://{host}:{server.server_port}"
+    server = MockGeminiServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent REST API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4",
+                        help="fixed:<s>, uniform:<min>,<max>, normal:<mean>,<std> or lognormal:<median>,<sigma>.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests failing with 429.")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Share of prompts blocked for safety.")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Throttle requests beyond this many in flight.")
+    parser.add_argument("--answer-noise", type=float, default=0.0, help="Std of noise added to ground-truth values.")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="Seconds between streamed chunks.")
+    parser.add_argument("--upload-bandwidth", type=float, default=0.0,
+                        help="Simulated client uplink in bytes/s for request bodies (0 = unlimited).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metadata-dir", default=DEFAULT_METADATA_DIR,
+                        help="Folder of <chart type>/*_metadata.jsonl files used for canned answers.")
+    args = parser.parse_args(argv)
+
+    server = MockGeminiServer(
+        (args.host, args.port), latency=args.latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, block_rate=args.block_rate, answer_noise=args.answer_noise,
+        chunk_interval=args.chunk_interval, seed=args.seed, max_concurrent=args.max_concurrent,
+        metadata_dir=args.metadata_dir, upload_bandwidth=args.upload_bandwidth
+    )
+    print(f"Mock Gemini listening on http://{args.host}:{server.server_port} "
+          f"({len(server.entries)} charts with ground truth). Set GEMINI_API_ENDPOINT to this URL.")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
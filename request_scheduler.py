@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from google.api_core import exceptions as api_exceptions
+from app_config import (
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_REQUEST_BURST,
+    GEMINI_INITIAL_CONCURRENCY,
+    GEMINI_MAX_CONCURRENCY,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    AIMD_DECREASE_FACTOR
+)
+
+THROTTLING_ERRORS = (api_exceptions.TooManyRequests,)
+RETRYABLE_ERRORS = THROTTLING_ERRORS + (
+    api_exceptions.InternalServerError,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError
+)
+
+# One limiter per API key, shared by every session and batch in the process
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def _new_scheduler() -> dict:
+    return {
+        "condition": threading.Condition(),
+        "tokens": float(GEMINI_REQUEST_BURST),
+        "refilled_at": time.monotonic(),
+        # AIMD: +1 slot per window of successful requests, halved when the API throttles us
+        "concurrency_limit": float(GEMINI_INITIAL_CONCURRENCY),
+        "decreased_at": 0.0,
+        "in_flight": 0,
+        "waiting": 0,
+        "stats": {"requests": 0, "succeeded": 0, "retries": 0, "throttled": 0, "server_errors": 0, "failed": 0}
+    }
+
+
+def _get_scheduler(api_key: str) -> dict:
+    with _schedulers_lock:
+        if api_key not in _schedulers:
+            _schedulers[api_key] = _new_scheduler()
+        return _schedulers[api_key]
+
+
+def _refill_tokens(scheduler: dict, now: float):
+    rate = GEMINI_REQUESTS_PER_MINUTE / 60
+    scheduler["tokens"] = min(GEMINI_REQUEST_BURST, scheduler["tokens"] + (now - scheduler["refilled_at"]) * rate)
+    scheduler["refilled_at"] = now
+
+
+def _acquire_slot(scheduler: dict) -> float:
+    condition = scheduler["condition"]
+    with condition:
+        scheduler["waiting"] += 1
+        while True:
+            now = time.monotonic()
+            _refill_tokens(scheduler, now)
+            if scheduler["in_flight"] < int(scheduler["concurrency_limit"]) and scheduler["tokens"] >= 1:
+                scheduler["tokens"] -= 1
+                scheduler["in_flight"] += 1
+                scheduler["waiting"] -= 1
+                return now
+            # Without a free slot, wait to be notified; without a token, wait until one is due
+            timeout = None
+            if scheduler["tokens"] < 1:
+                timeout = (1 - scheduler["tokens"]) * 60 / GEMINI_REQUESTS_PER_MINUTE
+            condition.wait(timeout)
+
+
+def _release_slot(scheduler: dict, started_at: float, outcome: str):
+    condition = scheduler["condition"]
+    with condition:
+        scheduler["in_flight"] -= 1
+        if outcome == "succeeded":
+            scheduler["concurrency_limit"] = min(
+                GEMINI_MAX_CONCURRENCY, scheduler["concurrency_limit"] + 1 / scheduler["concurrency_limit"]
+            )
+        elif outcome == "throttled" and started_at > scheduler["decreased_at"]:
+            # Requests that were already in flight when we backed off do not shrink the limit again
+            scheduler["concurrency_limit"] = max(1.0, scheduler["concurrency_limit"] * AIMD_DECREASE_FACTOR)
+            scheduler["decreased_at"] = time.monotonic()
+        condition.notify_all()
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter, so throttled clients do not retry in lockstep
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+
+def schedule_request(api_key: str, send_request):
+    # Runs send_request() once a rate-limit token and a concurrency slot are free, retrying
+    # throttled and transient server errors. Other errors, and the last failure, are raised.
+    scheduler = _get_scheduler(api_key)
+    stats = scheduler["stats"]
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        started_at = _acquire_slot(scheduler)
+        try:
+            result = send_request()
+        except RETRYABLE_ERRORS as e:
+            is_throttled = isinstance(e, THROTTLING_ERRORS)
+            _release_slot(scheduler, started_at, "throttled" if is_throttled else "error")
+            with scheduler["condition"]:
+                stats["requests"] += 1
+                stats["throttled" if is_throttled else "server_errors"] += 1
+                if attempt == RETRY_MAX_ATTEMPTS - 1:
+                    stats["failed"] += 1
+                    raise
+                stats["retries"] += 1
+            time.sleep(_backoff_delay(attempt))
+            continue
+        except Exception:
+            _release_slot(scheduler, started_at, "error")
+            with scheduler["condition"]:
+                stats["requests"] += 1
+                stats["failed"] += 1
+            raise
+        _release_slot(scheduler, started_at, "succeeded")
+        with scheduler["condition"]:
+            stats["requests"] += 1
+            stats["succeeded"] += 1
+        return result
+
+
+def get_scheduler_stats(api_key: str) -> dict:
+    scheduler = _get_scheduler(api_key)
+    with scheduler["condition"]:
+        return {
+            **scheduler["stats"],
+            "concurrency_limit": int(scheduler["concurrency_limit"]),
+            "in_flight": scheduler["in_flight"],
+            "waiting": scheduler["waiting"]
+        }
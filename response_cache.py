@@ -0,0 +1,106 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app_config import (
+    SESSION_DATA_DIR,
+    RESPONSE_CACHE_FILE,
+    RESPONSE_CACHE_MEMORY_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL_SECONDS
+)
+
+# In-memory LRU tier in front of an SQLite tier; both share one lock
+_memory_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+_connection = None
+
+
+def _get_connection():
+    global _connection
+    if _connection is None:
+        project_dir = os.path.dirname(__file__)
+        data_dir_path = os.path.join(project_dir, SESSION_DATA_DIR)
+        os.makedirs(data_dir_path, exist_ok=True)
+        _connection = sqlite3.connect(
+            os.path.join(data_dir_path, RESPONSE_CACHE_FILE), check_same_thread=False
+        )
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, created_at REAL, accessed_at REAL, size INTEGER, response TEXT)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        _connection.commit()
+    return _connection
+
+
+def make_cache_key(image_hash: str, prompt: str, model_name: str) -> str:
+    return hashlib.sha256("\0".join((image_hash, prompt, model_name)).encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, created_at: float, response_text: str):
+    _memory_cache[key] = (created_at, response_text)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > RESPONSE_CACHE_MEMORY_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+
+def _evict_from_disk(connection, now: float):
+    connection.execute("DELETE FROM responses WHERE created_at < ?", (now - RESPONSE_CACHE_TTL_SECONDS,))
+    total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total_size <= RESPONSE_CACHE_MAX_BYTES:
+        return
+
+    evicted_keys = []
+    for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+        if total_size <= RESPONSE_CACHE_MAX_BYTES:
+            break
+        evicted_keys.append((key,))
+        total_size -= size
+    connection.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+
+def get_cached_response(key: str):
+    now = time.time()
+    with _cache_lock:
+        entry = _memory_cache.get(key)
+        if entry is not None and now - entry[0] <= RESPONSE_CACHE_TTL_SECONDS:
+            _memory_cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return entry[1]
+        _memory_cache.pop(key, None)
+
+        connection = _get_connection()
+        row = connection.execute(
+            "SELECT created_at, response FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and now - row[0] <= RESPONSE_CACHE_TTL_SECONDS:
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+            _remember(key, row[0], row[1])
+            _cache_stats["hits"] += 1
+            return row[1]
+
+        _cache_stats["misses"] += 1
+        return None
+
+
+def store_response(key: str, response_text: str):
+    now = time.time()
+    with _cache_lock:
+        _remember(key, now, response_text)
+        connection = _get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, created_at, accessed_at, size, response) VALUES (?, ?, ?, ?, ?)",
+            (key, now, now, len(response_text.encode("utf-8")), response_text)
+        )
+        _evict_from_disk(connection, now)
+        connection.commit()
+
+
+def get_cache_stats() -> dict:
+    with _cache_lock:
+        return dict(_cache_stats)
@@ -1,70 +1,172 @@
-import streamlit as st
+import hashlib
 import json
-import os
-from PIL import Image
-import io
-from app_config import SESS_API_KEY, SESS_UPLOADED_IMAGES, SESSION_DATA_DIR, SESSION_DATA_FILE
-
-def _get_session_data_path():
-    project_dir = os.path.dirname(__file__)
-    data_dir_path = os.path.join(project_dir, SESSION_DATA_DIR)
-    os.makedirs(data_dir_path, exist_ok=True)
-    return os.path.join(data_dir_path, SESSION_DATA_FILE)
-
-def load_session_data():
-    data_path = _get_session_data_path()
-    if os.path.exists(data_path):
-        with open(data_path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-                if SESS_UPLOADED_IMAGES in data:
-                    for img_id, img_info in data[SESS_UPLOADED_IMAGES].items():
-                        if 'bytes_data' in img_info and img_info['bytes_data']:
-                            if isinstance(img_info['bytes_data'], list):
-                                img_info['bytes_data'] = bytes(img_info['bytes_data'])
-
-                            img_info['pil_image'] = Image.open(io.BytesIO(img_info['bytes_data']))
-                        else:
-                            if 'pil_image' in img_info:
-                                del img_info['pil_image']
-                return data
-            except json.JSONDecodeError as e:
-                st.warning(f"Error reading session data from JSON file: {e}. A new session will be created.")
-                return {}
-            except Exception as e:
-                st.error(f"An unexpected error occurred while loading session data: {e}")
-                return {}
-    return {}
+import logging
+import re
+import secrets
+import sqlite3
+import streamlit as st
+from app_config import (
+    SESS_API_KEY,
+    SESS_UPLOADED_IMAGES,
+    SESS_PERSISTED_STATE,
+    SESS_IMAGE_HASH_INDEX,
+    SESS_OPEN_CHARTS,
+    SESS_SESSION_ID,
+    SESSION_ID_QUERY_PARAM
+)
+from blob_store import write_blob
+from instrumentation import span
+from session_store import load_session, apply_session_changes
+from session_legacy import has_legacy_session_data
 
-def save_session_data(data_to_save):
-    data_path = _get_session_data_path()
-    serializable_data = data_to_save.copy()
+# Keys that only live in memory; image payloads are persisted in the blob store
+IN_MEMORY_IMAGE_KEYS = ("bytes_data", "pil_image", "prepared_image", "structured_results")
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
+logger = logging.getLogger(__name__)
+_legacy_data_checked = False
+
+def get_session_id():
+    # The id lives in the URL, so a reload or a bookmark reopens the same session
+    session_id = st.query_params.get(SESSION_ID_QUERY_PARAM)
+    if not session_id or not SESSION_ID_PATTERN.fullmatch(session_id):
+        session_id = secrets.token_urlsafe(16)
+        st.query_params[SESSION_ID_QUERY_PARAM] = session_id
+    return session_id
+
+def _detach_image_data(img_info):
+    # Payloads are read from the blob store lazily, on first use
+    for key in IN_MEMORY_IMAGE_KEYS:
+        img_info.pop(key, None)
+
+def serialize_image_record(img_info):
+    if not img_info.get('blob_hash') and img_info.get('bytes_data'):
+        img_info['blob_hash'] = write_blob(img_info['bytes_data'])
+    return {key: value for key, value in img_info.items() if key not in IN_MEMORY_IMAGE_KEYS}
+
+def _hash_chat(chat_log):
+    chat_hash = hashlib.sha1()
+    for message in chat_log:
+        chat_hash.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+    return chat_hash.hexdigest()
+
+def _build_persisted_state(data, previous_state=None):
+    # A chat is only hashed again when its length or its last message changed, so a rerun without
+    # new messages does not serialize every message of the session
+    previous_images = previous_state["images"] if previous_state else {}
+    persisted_images = {}
+    for img_id, img_info in (data.get(SESS_UPLOADED_IMAGES) or {}).items():
+        record = serialize_image_record(img_info)
+        chat_log = record.pop('chat_log', [])
+        chat_tail = json.dumps(chat_log[-1], sort_keys=True) if chat_log else None
+        previous = previous_images.get(img_id)
+        if previous and previous["chat_len"] == len(chat_log) and previous["chat_tail"] == chat_tail:
+            chat_hash = previous["chat_hash"]
+        else:
+            chat_hash = _hash_chat(chat_log)
+        persisted_images[img_id] = {
+            "record": record, "chat_len": len(chat_log), "chat_tail": chat_tail, "chat_hash": chat_hash
+        }
+    return {"api_key": data.get(SESS_API_KEY), "images": persisted_images}
+
+def _collect_changes(persisted_state, current_state, data_to_save):
+    changes = []
+    if current_state["api_key"] != persisted_state["api_key"]:
+        changes.append({"op": "set_api_key", "value": current_state["api_key"]})
 
-    if SESS_UPLOADED_IMAGES in serializable_data:
-        for img_id, img_info in serializable_data[SESS_UPLOADED_IMAGES].items():
-            if 'bytes_data' in img_info:
-                if isinstance(img_info['bytes_data'], bytes):
-                    img_info['bytes_data'] = list(img_info['bytes_data'])
-            if 'pil_image' in img_info:
-                del img_info['pil_image']
+    persisted_images = persisted_state["images"]
+    for img_id in persisted_images:
+        if img_id not in current_state["images"]:
+            changes.append({"op": "delete_image", "id": img_id})
 
+    for img_id, image_state in current_state["images"].items():
+        persisted = persisted_images.get(img_id)
+        if persisted is None or persisted["record"] != image_state["record"]:
+            changes.append({"op": "put_image", "id": img_id, "record": image_state["record"]})
+
+        persisted_chat_len = persisted["chat_len"] if persisted else 0
+        persisted_chat_hash = persisted["chat_hash"] if persisted else _hash_chat([])
+        if image_state["chat_hash"] == persisted_chat_hash:
+            continue
+        # New messages after an unchanged prefix are appended; any other edit rewrites the image's chat
+        chat_log = data_to_save[SESS_UPLOADED_IMAGES][img_id].get('chat_log', [])
+        if (image_state["chat_len"] > persisted_chat_len
+                and _hash_chat(chat_log[:persisted_chat_len]) == persisted_chat_hash):
+            changes.append({
+                "op": "append_chat", "id": img_id, "start": persisted_chat_len,
+                "messages": chat_log[persisted_chat_len:]
+            })
+        else:
+            changes.append({"op": "set_chat", "id": img_id, "chat_log": chat_log})
+    return changes
+
+def _check_legacy_session_data():
+    # The old store was shared by everyone, so it is never handed to a visitor; the operator imports it
+    global _legacy_data_checked
+    if not _legacy_data_checked:
+        _legacy_data_checked = True
+        if has_legacy_session_data():
+            logger.warning("Session data of the previous version was found and is not shown to anyone. "
+                           "Run `python session_legacy.py` to import it into a new session.")
+
+def load_session_data(session_id):
     try:
-        with open(data_path, "w", encoding="utf-8") as f:
-            json.dump(serializable_data, f, indent=4)
+        with span("session_load") as attributes:
+            _check_legacy_session_data()
+            data = load_session(session_id)
+            for img_info in data.get(SESS_UPLOADED_IMAGES, {}).values():
+                _detach_image_data(img_info)
+            attributes["images"] = len(data.get(SESS_UPLOADED_IMAGES, {}))
+            return data
+    except sqlite3.Error as e:
+        st.warning(f"Error reading the saved session: {e}. A new session will be created.")
+        return {}
     except Exception as e:
-        st.error(f"Error saving session data to file: {e}")
+        st.error(f"An unexpected error occurred while loading session data: {e}")
+        return {}
+
+def save_session_data(data_to_save):
+    # Only images and chat messages that changed since the last save are written, as rows of this session
+    persisted_state = st.session_state.get(SESS_PERSISTED_STATE) or _build_persisted_state({})
+
+    try:
+        with span("session_save") as attributes:
+            current_state = _build_persisted_state(data_to_save, persisted_state)
+            changes = _collect_changes(persisted_state, current_state, data_to_save)
+            attributes["changes"] = len(changes)
+            if changes:
+                apply_session_changes(st.session_state[SESS_SESSION_ID], changes)
+                st.session_state[SESS_PERSISTED_STATE] = current_state
+    except Exception as e:
+        st.error(f"Error saving session data: {e}")
+
+def build_image_hash_index(uploaded_images):
+    return {
+        img_info['blob_hash']: img_id
+        for img_id, img_info in uploaded_images.items() if img_info.get('blob_hash')
+    }
 
 def initialize_session_state():
     if "session_initialized" not in st.session_state:
-        persisted_data = load_session_data()
+        st.session_state[SESS_SESSION_ID] = get_session_id()
+        persisted_data = load_session_data(st.session_state[SESS_SESSION_ID])
         st.session_state[SESS_API_KEY] = persisted_data.get(SESS_API_KEY)
         st.session_state[SESS_UPLOADED_IMAGES] = persisted_data.get(SESS_UPLOADED_IMAGES, {})
+        st.session_state[SESS_PERSISTED_STATE] = _build_persisted_state(persisted_data)
+        st.session_state[SESS_IMAGE_HASH_INDEX] = build_image_hash_index(st.session_state[SESS_UPLOADED_IMAGES])
+        st.session_state[SESS_OPEN_CHARTS] = set()
         st.session_state['file_uploader_key'] = 0
         st.session_state["session_initialized"] = True
     else:
+        if SESS_SESSION_ID not in st.session_state:
+            st.session_state[SESS_SESSION_ID] = get_session_id()
         if SESS_API_KEY not in st.session_state:
             st.session_state[SESS_API_KEY] = None
         if SESS_UPLOADED_IMAGES not in st.session_state:
             st.session_state[SESS_UPLOADED_IMAGES] = {}
+        if SESS_IMAGE_HASH_INDEX not in st.session_state:
+            st.session_state[SESS_IMAGE_HASH_INDEX] = build_image_hash_index(st.session_state[SESS_UPLOADED_IMAGES])
+        if SESS_OPEN_CHARTS not in st.session_state:
+            st.session_state[SESS_OPEN_CHARTS] = set()
         if 'file_uploader_key' not in st.session_state:
-            st.session_state['file_uploader_key'] = 0
\ No newline at end of file
+            st.session_state['file_uploader_key'] = 0
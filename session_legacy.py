@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import secrets
+import sys
+from app_config import (
+    SESS_API_KEY,
+    SESS_UPLOADED_IMAGES,
+    SESSION_LEGACY_DATA_FILE,
+    SESSION_LEGACY_JOURNAL_FILE
+)
+from blob_store import write_blob
+from session_store import get_db_path, apply_session_changes
+
+# Before the per-user store, every browser shared one JSON snapshot plus an append-only journal.
+# An operator imports them into a new session with this script; the files are then renamed, not deleted.
+IMPORTED_SUFFIX = ".imported"
+IMPORT_MARKER_FILE = "legacy_import.lock"
+
+
+def _get_legacy_paths():
+    data_dir = os.path.dirname(get_db_path())
+    journal_path = os.path.join(data_dir, SESSION_LEGACY_JOURNAL_FILE)
+    # A compaction interrupted by a restart left its rotated journal behind; it holds the older entries
+    return (
+        os.path.join(data_dir, SESSION_LEGACY_DATA_FILE),
+        [f"{journal_path}.compacting", journal_path]
+    )
+
+
+def has_legacy_session_data():
+    snapshot_path, journal_paths = _get_legacy_paths()
+    return any(os.path.exists(path) for path in [snapshot_path] + journal_paths)
+
+
+def _read_journal_entries(journal_path):
+    entries = []
+    if not os.path.exists(journal_path):
+        return entries
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn write from a crash can only affect the last line
+                break
+    return entries
+
+
+def _apply_journal_entry(data, entry):
+    images = data.setdefault(SESS_UPLOADED_IMAGES, {})
+    op = entry.get("op")
+    img_id = entry.get("id")
+
+    if op == "set_api_key":
+        data[SESS_API_KEY] = entry["value"]
+    elif op == "put_image":
+        chat_log = images.get(img_id, {}).get("chat_log", [])
+        images[img_id] = {**entry["record"], "chat_log": chat_log}
+    elif op == "append_chat" and img_id in images:
+        images[img_id].setdefault("chat_log", []).extend(entry["messages"])
+    elif op == "set_chat" and img_id in images:
+        images[img_id]["chat_log"] = entry["chat_log"]
+    elif op == "delete_image":
+        images.pop(img_id, None)
+
+
+def read_legacy_session_data():
+    snapshot_path, journal_paths = _get_legacy_paths()
+    data = {}
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    for journal_path in journal_paths:
+        for entry in _read_journal_entries(journal_path):
+            _apply_journal_entry(data, entry)
+    return data
+
+
+def _to_changes(data):
+    # The stored API key belonged to whoever used the shared store last, so it is not carried over
+    changes = []
+    for img_id, img_info in (data.get(SESS_UPLOADED_IMAGES) or {}).items():
+        record = dict(img_info)
+        chat_log = record.pop("chat_log", [])
+        # The oldest session files kept each image inline as a JSON list of ints
+        bytes_data = record.pop("bytes_data", None)
+        if bytes_data and not record.get("blob_hash"):
+            record["blob_hash"] = write_blob(bytes(bytes_data) if isinstance(bytes_data, list) else bytes_data)
+        changes.append({"op": "put_image", "id": img_id, "record": record})
+        changes.append({"op": "set_chat", "id": img_id, "chat_log": chat_log})
+    return changes
+
+
+def import_legacy_session(session_id):
+    # Returns the number of imported charts, or None when there was nothing to import
+    # (or another session is importing it right now)
+    if not has_legacy_session_data():
+        return None
+    marker_path = os.path.join(os.path.dirname(get_db_path()), IMPORT_MARKER_FILE)
+    try:
+        os.close(os.open(marker_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return None
+
+    try:
+        data = read_legacy_session_data()
+        apply_session_changes(session_id, _to_changes(data))
+        snapshot_path, journal_paths = _get_legacy_paths()
+        for path in [snapshot_path] + journal_paths:
+            if os.path.exists(path):
+                os.replace(path, path + IMPORTED_SUFFIX)
+    finally:
+        os.remove(marker_path)
+    return len(data.get(SESS_UPLOADED_IMAGES) or {})
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Import the session file of the previous version into a new session. "
+                    "The stored API key is not imported."
+    )
+    parser.parse_args(argv)
+    session_id = secrets.token_urlsafe(16)
+    imported_charts = import_legacy_session(session_id)
+    if imported_charts is None:
+        print("There is no session file of the previous version to import, or another import is running.",
+              file=sys.stderr)
+        return 1
+    print(f"Imported {imported_charts} charts into session {session_id}. "
+          f"Open the app with ?session={session_id} in the URL to see them.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from app_config import (
+    SESS_API_KEY,
+    SESS_UPLOADED_IMAGES,
+    SESSION_DATA_DIR,
+    SESSION_DB_FILE,
+    SESSION_DB_BUSY_TIMEOUT_MS
+)
+
+# Streamlit starts a new thread for every script run, so connections are pooled instead of kept per thread.
+# In WAL mode readers never wait for the writer, and writers queue on the database lock for up to the busy timeout.
+_pool = queue.SimpleQueue()
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, api_key TEXT, updated_at REAL)",
+    # Images keep their rowid across updates, so ordering by it gives the upload order
+    "CREATE TABLE IF NOT EXISTS images ("
+    "session_id TEXT NOT NULL, img_id TEXT NOT NULL, record TEXT NOT NULL, PRIMARY KEY (session_id, img_id))",
+    "CREATE TABLE IF NOT EXISTS chat_messages ("
+    "session_id TEXT NOT NULL, img_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL, "
+    "PRIMARY KEY (session_id, img_id, seq)) WITHOUT ROWID"
+)
+
+
+def get_db_path():
+    project_dir = os.path.dirname(__file__)
+    data_dir_path = os.path.join(project_dir, SESSION_DATA_DIR)
+    os.makedirs(data_dir_path, exist_ok=True)
+    return os.path.join(data_dir_path, SESSION_DB_FILE)
+
+
+def _open_connection(db_path):
+    # Transactions are opened explicitly, so a save is a single BEGIN IMMEDIATE ... COMMIT
+    connection = sqlite3.connect(
+        db_path, timeout=SESSION_DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with _schema_lock:
+        if db_path not in _initialized_paths:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            _initialized_paths.add(db_path)
+    return connection
+
+
+@contextmanager
+def _connection():
+    db_path = get_db_path()
+    try:
+        pooled_path, connection = _pool.get_nowait()
+    except queue.Empty:
+        pooled_path, connection = db_path, None
+    if connection is None or pooled_path != db_path:
+        connection = _open_connection(db_path)
+    try:
+        yield connection
+    finally:
+        _pool.put((db_path, connection))
+
+
+def load_session(session_id):
+    with _connection() as connection:
+        return _read_session(connection, session_id)
+
+
+def _read_session(connection, session_id):
+    row = connection.execute("SELECT api_key FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+    if row is None:
+        return {}
+
+    images = {}
+    for img_id, record in connection.execute(
+        "SELECT img_id, record FROM images WHERE session_id = ? ORDER BY rowid", (session_id,)
+    ):
+        images[img_id] = {**json.loads(record), "chat_log": []}
+    for img_id, message in connection.execute(
+        "SELECT img_id, message FROM chat_messages WHERE session_id = ? ORDER BY img_id, seq", (session_id,)
+    ):
+        if img_id in images:
+            images[img_id]["chat_log"].append(json.loads(message))
+    return {SESS_API_KEY: row[0], SESS_UPLOADED_IMAGES: images}
+
+
+def _insert_messages(connection, session_id, img_id, start, messages):
+    connection.executemany(
+        "INSERT OR REPLACE INTO chat_messages (session_id, img_id, seq, message) VALUES (?, ?, ?, ?)",
+        [(session_id, img_id, start + offset, json.dumps(message)) for offset, message in enumerate(messages)]
+    )
+
+
+def _apply_change(connection, session_id, change):
+    op = change["op"]
+    img_id = change.get("id")
+    if op == "set_api_key":
+        connection.execute("UPDATE sessions SET api_key = ? WHERE session_id = ?", (change["value"], session_id))
+    elif op == "put_image":
+        connection.execute(
+            "INSERT INTO images (session_id, img_id, record) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id, img_id) DO UPDATE SET record = excluded.record",
+            (session_id, img_id, json.dumps(change["record"]))
+        )
+    elif op == "append_chat":
+        _insert_messages(connection, session_id, img_id, change["start"], change["messages"])
+    elif op == "set_chat":
+        connection.execute("DELETE FROM chat_messages WHERE session_id = ? AND img_id = ?", (session_id, img_id))
+        _insert_messages(connection, session_id, img_id, 0, change["chat_log"])
+    elif op == "delete_image":
+        connection.execute("DELETE FROM images WHERE session_id = ? AND img_id = ?", (session_id, img_id))
+        connection.execute("DELETE FROM chat_messages WHERE session_id = ? AND img_id = ?", (session_id, img_id))
+
+
+def apply_session_changes(session_id, changes):
+    # All changes of one save are committed together; other sessions' rows are never touched
+    with _connection() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, time.time())
+            )
+            for change in changes:
+                _apply_change(connection, session_id, change)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+
+def write_session(session_id, data):
+    # Replaces everything stored for the session, e.g. to seed the benchmarks
+    changes = [{"op": "set_api_key", "value": data.get(SESS_API_KEY)}]
+    for img_id in load_session(session_id).get(SESS_UPLOADED_IMAGES, {}):
+        changes.append({"op": "delete_image", "id": img_id})
+    for img_id, img_info in (data.get(SESS_UPLOADED_IMAGES) or {}).items():
+        record = {key: value for key, value in img_info.items() if key != "chat_log"}
+        changes.append({"op": "put_image", "id": img_id, "record": record})
+        changes.append({"op": "set_chat", "id": img_id, "chat_log": img_info.get("chat_log", [])})
+    apply_session_changes(session_id, changes)
@@ -0,0 +1,248 @@
+import csv
+import io
+import json
+import math
+import re
+import numpy as np
+from blob_store import write_blob, read_blob
+
+POINT_SERIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "series": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "points": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {"x": {"type": "number"}, "y": {"type": "number"}},
+                            "required": ["x", "y"]
+                        }
+                    }
+                },
+                "required": ["name", "points"]
+            }
+        }
+    },
+    "required": ["series"]
+}
+
+BAR_SERIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "series": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "bars": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {"label": {"type": "string"}, "value": {"type": "number"}},
+                            "required": ["label", "value"]
+                        }
+                    }
+                },
+                "required": ["name", "bars"]
+            }
+        }
+    },
+    "required": ["series"]
+}
+
+# The first group has no leading zero, so "0,500" is a decimal comma
+THOUSANDS_PATTERN = re.compile(r"^[+-]?[1-9]\d{0,2}(,\d{3})+(\.\d*)?$")
+
+# Answer to a batched "Y at these X values" query; x echoes the request, y is null where nothing was read
+VALUE_LIST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "values": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"x": {"type": "string"}, "y": {"type": "number", "nullable": True}},
+                "required": ["x", "y"]
+            }
+        }
+    },
+    "required": ["values"]
+}
+
+
+def parse_structured_response(response_text: str):
+    # Returns {series name: {"x": array, "y": float32 array}}, or None if the text is not valid JSON output
+    try:
+        payload = json.loads(response_text)
+        series_list = payload["series"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+    if not isinstance(series_list, list) or not all(isinstance(series, dict) for series in series_list):
+        return None
+
+    result = {}
+    try:
+        for index, series in enumerate(series_list):
+            name = str(series.get("name") or f"Series {index + 1}")
+            # Two series with the same name must not overwrite each other
+            base_name, copy_number = name, 1
+            while name in result:
+                copy_number += 1
+                name = f"{base_name} ({copy_number})"
+            if "bars" in series:
+                x_values = np.array([str(bar["label"]) for bar in series["bars"]], dtype=np.str_)
+                y_values = np.array([bar["value"] for bar in series["bars"]], dtype=np.float32)
+            else:
+                points = np.array([(point["x"], point["y"]) for point in series["points"]], dtype=np.float32)
+                points = points.reshape(-1, 2)
+                x_values, y_values = points[:, 0], points[:, 1]
+            result[name] = {"x": x_values, "y": y_values}
+    except (KeyError, TypeError, ValueError):
+        return None
+    return result
+
+
+def _x_key(value) -> str:
+    # "2", "2.0" and 2 name the same x value
+    try:
+        return repr(float(str(value).strip()))
+    except ValueError:
+        return str(value).strip().lower()
+
+
+def _read_number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    text = str(value).strip()
+    if "," in text:
+        if THOUSANDS_PATTERN.match(text):
+            # "1,234" and "1,234.5" group thousands
+            text = text.replace(",", "")
+        elif text.count(",") == 1 and "." not in text:
+            # "0,5" uses a decimal comma
+            text = text.replace(",", ".")
+        else:
+            return None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _load_value_items(response_text: str):
+    # Also accepts JSON wrapped in code fences or prose, and a bare list of numbers
+    candidates = [response_text]
+    start, end = response_text.find("{"), response_text.rfind("}")
+    if 0 <= start < end:
+        candidates.append(response_text[start:end + 1])
+    for candidate in candidates:
+        try:
+            payload = json.loads(candidate)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        items = payload.get("values") if isinstance(payload, dict) else payload
+        if isinstance(items, list):
+            return [item if isinstance(item, dict) else {"y": item} for item in items]
+    return None
+
+
+def parse_value_list_response(response_text: str, x_values: list) -> tuple:
+    # Returns (float64 array aligned with x_values, NaN where nothing was read, and a per-value error or None).
+    # Answers are matched by their x; only an answer with exactly one entry per x may be matched by position.
+    predictions = np.full(len(x_values), np.nan)
+    items = _load_value_items(response_text)
+    if items is None:
+        return predictions, ["The response is not a list of values."] * len(x_values)
+
+    items_by_x = {}
+    for item in items:
+        if "x" in item:
+            items_by_x.setdefault(_x_key(item["x"]), item)
+    by_position = len(items) == len(x_values)
+
+    errors = []
+    for index, x_value in enumerate(x_values):
+        item = items_by_x.get(_x_key(x_value))
+        if item is None and by_position:
+            item = items[index]
+        if item is None:
+            errors.append("No value was returned.")
+            continue
+        y_value = _read_number(item.get("y"))
+        if item.get("y") is None:
+            errors.append("No value was found in the chart.")
+            continue
+        if y_value is None:
+            errors.append(f"The value could not be read ({item['y']!r}).")
+            continue
+        predictions[index] = y_value
+        errors.append(None)
+    return predictions, errors
+
+
+def format_structured_result(result: dict) -> str:
+    lines = []
+    for name, series in result.items():
+        if series["x"].dtype.kind == "U":
+            pairs = ", ".join(f"{label}: {value:g}" for label, value in zip(series["x"], series["y"]))
+        else:
+            pairs = ", ".join(f"({x:g}, {y:g})" for x, y in zip(series["x"], series["y"]))
+        lines.append(f"**{name}**: {pairs}")
+    return "\n\n".join(lines) if lines else "No data series were found in the chart."
+
+
+def _encode_structured_result(result: dict) -> bytes:
+    arrays = {"names": np.array(list(result), dtype=np.str_)}
+    for index, series in enumerate(result.values()):
+        arrays[f"x_{index}"] = series["x"]
+        arrays[f"y_{index}"] = series["y"]
+    output = io.BytesIO()
+    np.savez_compressed(output, **arrays)
+    return output.getvalue()
+
+
+def _decode_structured_result(bytes_data) -> dict:
+    with np.load(io.BytesIO(bytes_data), allow_pickle=False) as arrays:
+        return {
+            str(name): {"x": arrays[f"x_{index}"], "y": arrays[f"y_{index}"]}
+            for index, name in enumerate(arrays["names"])
+        }
+
+
+def store_structured_result(img_info: dict, mode: str, result: dict):
+    # Arrays live in the blob store; the record only keeps a hash per extraction mode
+    img_info.setdefault('structured_results', {})[mode] = result
+    img_info['structured_result_blobs'] = {
+        **img_info.get('structured_result_blobs', {}),
+        mode: write_blob(_encode_structured_result(result))
+    }
+
+
+def get_structured_results(img_info: dict) -> dict:
+    results = img_info.setdefault('structured_results', {})
+    for mode, blob_hash in img_info.get('structured_result_blobs', {}).items():
+        if mode not in results:
+            bytes_data = read_blob(blob_hash)
+            if bytes_data:
+                results[mode] = _decode_structured_result(bytes_data)
+    return results
+
+
+def structured_results_to_csv(results: dict) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["mode", "series", "x", "y"])
+    for mode, result in results.items():
+        for name, series in result.items():
+            is_categorical = series["x"].dtype.kind == "U"
+            for x_value, y_value in zip(series["x"], series["y"]):
+                writer.writerow([mode, name, x_value if is_categorical else f"{x_value:g}", f"{y_value:g}"])
+    return output.getvalue()
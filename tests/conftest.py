@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# The app modules live at the repository root, like for the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blob_store
+import session_store
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # Absolute paths win in os.path.join, so the store and the blobs move to the test folder
+    monkeypatch.setattr(session_store, "SESSION_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(blob_store, "SESSION_DATA_DIR", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,22 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ModelComparison"))
+
+from benchmark_metrics import compute_metrics, _new_accumulator, _update_accumulator, _finalize_accumulator
+
+
+def test_streaming_metrics_match_exact_metrics_for_zero_errors():
+    y_true = np.array([10.0, 20.0, 30.0, 40.0, 50.0])
+    abs_error = np.array([0.0, 0.0, 0.0, 2.0, np.nan])
+    inference_time = np.array([0.5, 0.5, 1.0, 1.0, 2.0])
+
+    exact = compute_metrics(y_true, abs_error, inference_time, 100, np.random.default_rng(0))
+    accumulator = _new_accumulator()
+    _update_accumulator(accumulator, y_true, abs_error, inference_time)
+    streaming = _finalize_accumulator(accumulator, 100, np.random.default_rng(0))
+
+    assert exact["abs_error_median"] == streaming["abs_error_median"] == 0.0
+    assert exact["qps_per_worker"] == streaming["qps_per_worker"] == 1 / 1.0
+    assert np.isclose(streaming["latency_p50"], exact["latency_p50"], rtol=0.01)
@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+
+import gemini_handler
+from gemini_handler import select_conversation_history
+
+API_KEY = "test-files-key"
+IMAGE = {"mime_type": "image/png", "data": b"chart bytes"}
+
+
+class FakeFileServiceClient:
+    # Answers create_file like the Files API, slowly enough that concurrent questions overlap the upload
+    def __init__(self, lifetime=timedelta(hours=48), fail=False):
+        self.lifetime = lifetime
+        self.fail = fail
+        self.uploads = []
+
+    def create_file(self, path, mime_type, resumable):
+        self.uploads.append(path.read())
+        time.sleep(0.2)
+        if self.fail:
+            raise ValueError("upload rejected")
+        return SimpleNamespace(
+            uri=f"https://files.example/{len(self.uploads)}", mime_type=mime_type,
+            expiration_time=datetime.now(timezone.utc) + self.lifetime
+        )
+
+
+@pytest.fixture
+def file_client(monkeypatch):
+    client = FakeFileServiceClient()
+    monkeypatch.setattr(gemini_handler, "GEMINI_API_ENDPOINT", None)
+    monkeypatch.setattr(gemini_handler.genai_client, "get_default_file_client", lambda: client)
+    gemini_handler._file_clients.pop(API_KEY, None)
+    gemini_handler._uploaded_files.clear()
+    yield client
+    gemini_handler._file_clients.pop(API_KEY, None)
+    gemini_handler._uploaded_files.clear()
+
+
+def ask_concurrently(count):
+    parts = [None] * count
+
+    def ask(index):
+        parts[index] = gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+
+    threads = [threading.Thread(target=ask, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return parts
+
+
+def test_concurrent_first_questions_upload_once(file_client):
+    parts = ask_concurrently(4)
+    assert file_client.uploads == [IMAGE["data"]]
+    assert all(part == {"file_data": {"mime_type": "image/png", "file_uri": "https://files.example/1"}}
+               for part in parts)
+
+    # Later questions reuse the file
+    gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+    assert len(file_client.uploads) == 1
+
+
+def test_a_file_about_to_expire_is_uploaded_again(file_client):
+    file_client.lifetime = timedelta(minutes=5)
+    gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+    part = gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+    assert len(file_client.uploads) == 2
+    assert part["file_data"]["file_uri"] == "https://files.example/2"
+
+
+def test_a_failed_upload_sends_the_chart_inline_and_is_retried(file_client):
+    file_client.fail = True
+    assert ask_concurrently(3) == [IMAGE] * 3
+    assert len(file_client.uploads) == 1
+
+    file_client.fail = False
+    part = gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+    assert part["file_data"]["file_uri"] == "https://files.example/2"
+
+
+def test_invalidating_a_key_forgets_its_file_client_and_files(file_client):
+    gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+    gemini_handler._uploaded_files[("other-key", "chart-hash")] = gemini_handler._uploaded_files[(API_KEY, "chart-hash")]
+
+    gemini_handler.invalidate_gemini_models(API_KEY)
+    assert API_KEY not in gemini_handler._file_clients
+    assert list(gemini_handler._uploaded_files) == [("other-key", "chart-hash")]
+
+    gemini_handler._get_chart_file_part(API_KEY, IMAGE, "chart-hash")
+    assert len(file_client.uploads) == 2
+
+
+def test_history_keeps_only_answered_chat_questions():
+    chat_log = [
+        {"role": "user", "parts": ["Extract all bar values."]},
+        {"role": "model", "parts": ['{"series": []}']},
+        {"role": "user", "parts": ["What is the title?"], "conversation": True},
+        {"role": "model", "parts": ["Sales"], "conversation": True},
+        {"role": "user", "parts": ["And the unit?"], "conversation": True},
+        {"role": "model", "parts": ["An error occurred while trying to get a response from Gemini: 503. "],
+         "conversation": True},
+        {"role": "user", "parts": ["Which bar is highest?"], "conversation": True},
+        {"role": "model", "parts": ["Q3"], "conversation": True}
+    ]
+    assert select_conversation_history(chat_log) == [
+        {"role": "user", "parts": ["What is the title?"]},
+        {"role": "model", "parts": ["Sales"]},
+        {"role": "user", "parts": ["Which bar is highest?"]},
+        {"role": "model", "parts": ["Q3"]}
+    ]
+    assert select_conversation_history(chat_log, max_messages=2) == [
+        {"role": "user", "parts": ["Which bar is highest?"]},
+        {"role": "model", "parts": ["Q3"]}
+    ]
@@ -0,0 +1,31 @@
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+import gemini_handler
+
+
+class FakeGenerativeClient:
+    def __init__(self):
+        self.requests = []
+
+    def generate_content(self, request, **request_options):
+        self.requests.append(request)
+        return genai.protos.GenerateContentResponse(
+            candidates=[{"content": {"role": "model", "parts": [{"text": "42"}]}}]
+        )
+
+
+def test_models_keep_the_client_of_their_api_key(monkeypatch):
+    # The SDK offers no public way to give a model its own client, so gemini_handler sets the private
+    # GenerativeModel._client; this fails if an SDK upgrade stops honouring it
+    monkeypatch.setattr(gemini_handler, "GEMINI_API_ENDPOINT", None)
+    model_a = gemini_handler._create_gemini_model("key-a", "gemini-test")
+    client_a = model_a._client
+    gemini_handler._create_gemini_model("key-b", "gemini-test")
+    assert model_a._client is client_a
+    assert genai_client.get_default_generative_client() is not client_a
+
+    fake_client = FakeGenerativeClient()
+    model_a._client = fake_client
+    assert model_a.generate_content("What is the value?").text == "42"
+    assert len(fake_client.requests) == 1
@@ -0,0 +1,40 @@
+import io
+import mmap
+import os
+import numpy as np
+from PIL import Image
+
+import image_loader
+from blob_store import write_blob
+from image_loader import get_pil_image, get_thumbnail
+
+
+def chart_png(index, background=(255, 255, 255, 255)):
+    image = Image.new("RGBA", (200, 120), background)
+    image.paste((31, 119, 180, 255), (20 + index % 50, 30, 60 + index % 50, 110))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_loaded_charts_hold_no_file_descriptors(data_dir):
+    image_loader._read_thumbnail.cache_clear()
+    records = [{"id": str(index), "blob_hash": write_blob(chart_png(index))} for index in range(50)]
+    fds_before = open_fds()
+    for record in records:
+        assert get_thumbnail(record)
+        get_pil_image(record).load()
+    assert open_fds() <= fds_before
+    assert not any(isinstance(value, mmap.mmap) for record in records for value in record.values())
+    assert not any(isinstance(getattr(record["pil_image"], "fp", None), mmap.mmap) for record in records)
+
+
+def test_transparent_chart_gets_a_white_thumbnail(data_dir):
+    record = {"id": "transparent", "blob_hash": write_blob(chart_png(0, background=(0, 0, 0, 0)))}
+    thumbnail = np.asarray(Image.open(io.BytesIO(get_thumbnail(record))))
+    assert thumbnail[0, 0].tolist() == [255, 255, 255]
+    assert thumbnail[60, 40].tolist() == [31, 119, 180]
@@ -0,0 +1,43 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from cv_extraction import _to_rgb_array
+from image_preprocessing import crop_whitespace_margins, preprocess_image
+
+
+@pytest.fixture(scope="module")
+def transparent_chart():
+    figure, axes = plt.subplots(figsize=(4, 3), dpi=100)
+    axes.bar(["a", "b", "c"], [3, 5, 2], color="tab:blue")
+    output = io.BytesIO()
+    figure.savefig(output, format="png", transparent=True)
+    plt.close(figure)
+    pixels = np.array(Image.open(io.BytesIO(output.getvalue())))
+    assert pixels.shape[2] == 4 and pixels[..., 3].min() == 0
+    # Matplotlib leaves white under transparent pixels; other writers leave black, which only the alpha hides
+    pixels[pixels[..., 3] == 0] = 0
+    return Image.fromarray(pixels)
+
+
+@pytest.mark.parametrize("image_format", ["PNG", "WEBP"])
+def test_transparent_background_becomes_white(transparent_chart, image_format):
+    prepared = preprocess_image(transparent_chart, image_format=image_format, crop_margins=False)
+    pixels = np.asarray(Image.open(io.BytesIO(prepared["data"])).convert("RGB"))
+    assert pixels[0, 0].min() > 250
+    # Most of a bar chart is background, so most pixels are close to white rather than black
+    assert np.median(pixels) > 240
+
+
+def test_transparent_margins_are_cropped(transparent_chart):
+    cropped = crop_whitespace_margins(transparent_chart)
+    assert cropped.width < transparent_chart.width and cropped.height < transparent_chart.height
+
+
+def test_local_extractor_sees_the_same_pixels(transparent_chart):
+    assert _to_rgb_array(transparent_chart)[0, 0].tolist() == [255, 255, 255]
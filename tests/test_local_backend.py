@@ -0,0 +1,176 @@
+import threading
+import time
+import pytest
+from concurrent.futures import Future
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import local_backend
+from local_backend import LocalVisionBackend
+
+VOCAB_SIZE = 64
+PAD_TOKEN_ID = 0
+
+
+class TinyTokenizer:
+    padding_side = "right"
+
+
+class TinyProcessor:
+    # Stands in for a multimodal processor: one token per prompt character, the image is ignored.
+    # Prompts are padded on the side the backend asks for, like a real tokenizer.
+    def __init__(self):
+        self.tokenizer = TinyTokenizer()
+
+    def apply_chat_template(self, conversations, add_generation_prompt, tokenize, return_dict, return_tensors, padding):
+        token_lists = [
+            [ord(char) % (VOCAB_SIZE - 1) + 1 for char in conversation[0]["content"][1]["text"]]
+            for conversation in conversations
+        ]
+        length = max(len(tokens) for tokens in token_lists)
+        input_ids, attention_mask = [], []
+        for tokens in token_lists:
+            padding_tokens = [PAD_TOKEN_ID] * (length - len(tokens))
+            assert self.tokenizer.padding_side == "left"
+            input_ids.append(padding_tokens + tokens)
+            attention_mask.append([0] * len(padding_tokens) + [1] * len(tokens))
+        return {"input_ids": torch.tensor(input_ids), "attention_mask": torch.tensor(attention_mask)}
+
+    def decode(self, tokens, skip_special_tokens):
+        return " ".join(str(int(token)) for token in tokens)
+
+
+def build_tiny_model():
+    # Randomly initialized from a local config, so nothing is downloaded
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=VOCAB_SIZE, hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=4,
+        num_key_value_heads=4, max_position_embeddings=128, pad_token_id=PAD_TOKEN_ID
+    )
+    model = transformers.LlamaForCausalLM(config)
+    # Without an end-of-sequence token every request generates exactly its max_new_tokens
+    model.generation_config.eos_token_id = None
+    model.generation_config.pad_token_id = PAD_TOKEN_ID
+    return model
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    return build_tiny_model()
+
+
+def make_backend(model, **options):
+    return LocalVisionBackend("tiny", quantization="", model=model, processor=TinyProcessor(), **options)
+
+
+def generate_concurrently(backend, requests: list) -> list:
+    results = [None] * len(requests)
+    barrier = threading.Barrier(len(requests))
+
+    def submit(index):
+        prompt, max_new_tokens = requests[index]
+        barrier.wait()
+        results[index] = backend.generate(None, prompt, max_new_tokens=max_new_tokens)
+
+    threads = [threading.Thread(target=submit, args=(index,)) for index in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_one_batch_and_get_their_own_answers(tiny_model):
+    requests = [(f"What is the value at X={index}?" + "!" * index, 2 + index % 3) for index in range(6)]
+
+    solo_backend = make_backend(tiny_model, max_batch_size=1, batch_wait_seconds=0.0)
+    try:
+        expected = [solo_backend.generate(None, prompt, max_new_tokens=tokens) for prompt, tokens in requests]
+    finally:
+        solo_backend.close()
+
+    backend = make_backend(tiny_model, max_batch_size=8, batch_wait_seconds=1.0)
+    try:
+        results = generate_concurrently(backend, requests)
+        stats = backend.get_stats()
+    finally:
+        backend.close()
+
+    assert stats["batches"] == 1
+    assert stats["largest_batch"] == len(requests)
+    assert [len(result.split()) for result in results] == [tokens for _, tokens in requests]
+    assert results == expected
+
+
+def test_batches_are_split_at_max_batch_size(tiny_model):
+    backend = make_backend(tiny_model, max_batch_size=2, batch_wait_seconds=1.0)
+    try:
+        results = generate_concurrently(backend, [(f"question {index}", 2) for index in range(4)])
+        stats = backend.get_stats()
+    finally:
+        backend.close()
+
+    assert all(results)
+    assert stats["requests"] == 4
+    assert stats["largest_batch"] == 2
+
+
+def test_close_stops_the_batcher(tiny_model):
+    backend = make_backend(tiny_model, batch_wait_seconds=0.0)
+    assert backend.generate(None, "hello", max_new_tokens=2)
+    backend.close()
+
+    assert not backend._thread.is_alive()
+    with pytest.raises(RuntimeError):
+        backend.generate(None, "hello", max_new_tokens=2)
+    backend.close()
+
+
+def test_requests_left_behind_the_stop_fail_instead_of_blocking(tiny_model):
+    backend = make_backend(tiny_model, batch_wait_seconds=0.0)
+    backend.close()
+    # A request that reached the queue after the stop, run through the batcher loop again
+    late_request = Future()
+    backend._requests.put(local_backend._STOP)
+    backend._requests.put((None, "hello", 2, late_request))
+    backend._run()
+
+    with pytest.raises(RuntimeError):
+        late_request.result(timeout=5)
+
+
+def test_loading_a_model_does_not_block_the_registry(monkeypatch):
+    loading, release = threading.Event(), threading.Event()
+    constructed = []
+
+    class SlowBackend:
+        def __init__(self, model_id):
+            constructed.append(model_id)
+            loading.set()
+            release.wait(timeout=5)
+
+        def get_stats(self):
+            return {"requests": 0}
+
+    monkeypatch.setattr(local_backend, "LocalVisionBackend", SlowBackend)
+    monkeypatch.setattr(local_backend, "_backends", {})
+    backends = []
+    threads = [
+        threading.Thread(target=lambda: backends.append(local_backend.get_local_backend("local:slow")))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    assert loading.wait(timeout=5)
+
+    start_time = time.perf_counter()
+    assert local_backend.get_local_backend_stats() == {}
+    assert time.perf_counter() - start_time < 0.5
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert constructed == ["slow"]
+    assert backends[0] is backends[1]
+    assert local_backend.get_local_backend_stats() == {"local:slow": {"requests": 0}}
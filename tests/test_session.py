@@ -0,0 +1,119 @@
+import json
+import os
+import pytest
+
+import blob_store
+import session
+from app_config import SESS_API_KEY, SESS_UPLOADED_IMAGES, SESSION_LEGACY_DATA_FILE, SESSION_LEGACY_JOURNAL_FILE
+from session import _build_persisted_state, _collect_changes
+from session_legacy import import_legacy_session, has_legacy_session_data, main as import_legacy_main
+from session_store import apply_session_changes, load_session
+
+
+def make_session(chat_log):
+    return {
+        SESS_API_KEY: "key",
+        SESS_UPLOADED_IMAGES: {"chart": {"id": "chart", "name": "chart.png", "blob_hash": "abc", "chat_log": chat_log}}
+    }
+
+
+def save(session_id, persisted_state, data):
+    # Like save_session_data: the persisted state is only replaced after a write
+    current_state = _build_persisted_state(data, persisted_state)
+    changes = _collect_changes(persisted_state, current_state, data)
+    if not changes:
+        return persisted_state, changes
+    apply_session_changes(session_id, changes)
+    return current_state, changes
+
+
+def test_appended_and_edited_messages_are_saved(data_dir):
+    chat_log = [{"role": "user", "parts": ["question"]}, {"role": "model", "parts": ["12"]}]
+    data = make_session(chat_log)
+    state, _ = save("session-1", _build_persisted_state({}), data)
+
+    chat_log.append({"role": "user", "parts": ["next"]})
+    state, changes = save("session-1", state, data)
+    assert [change["op"] for change in changes] == ["append_chat"]
+
+    # Same length, different text: only a content comparison notices it
+    chat_log[-1] = {"role": "user", "parts": ["next, rephrased"]}
+    state, changes = save("session-1", state, data)
+    assert [change["op"] for change in changes] == ["set_chat"]
+
+    _, changes = save("session-1", state, data)
+    assert changes == []
+    assert load_session("session-1")[SESS_UPLOADED_IMAGES]["chart"]["chat_log"] == chat_log
+
+
+def test_unchanged_chats_are_not_hashed_again(data_dir, monkeypatch):
+    data = {
+        SESS_API_KEY: "key",
+        SESS_UPLOADED_IMAGES: {
+            f"chart{index}": {"id": f"chart{index}", "chat_log": [{"role": "user", "parts": [str(turn)]}
+                                                                for turn in range(20)]}
+            for index in range(10)
+        }
+    }
+    state, _ = save("session-1", _build_persisted_state({}), data)
+    hashed = []
+    monkeypatch.setattr(session, "_hash_chat", lambda chat_log: hashed.append(len(chat_log)) or "")
+    assert save("session-1", state, data)[1] == []
+    assert hashed == []
+
+
+def test_sessions_do_not_see_each_other(data_dir):
+    save("session-a", _build_persisted_state({}), make_session([{"role": "user", "parts": ["a"]}]))
+    save("session-b", _build_persisted_state({}), make_session([{"role": "user", "parts": ["b"]}]))
+
+    assert load_session("session-a")[SESS_UPLOADED_IMAGES]["chart"]["chat_log"] == [{"role": "user", "parts": ["a"]}]
+    assert load_session("session-b")[SESS_UPLOADED_IMAGES]["chart"]["chat_log"] == [{"role": "user", "parts": ["b"]}]
+    assert load_session("session-c") == {}
+
+
+def test_legacy_snapshot_and_journal_are_imported_once(data_dir):
+    snapshot = {
+        SESS_API_KEY: "old-key",
+        SESS_UPLOADED_IMAGES: {
+            "inline": {"id": "inline", "name": "inline.png", "bytes_data": list(b"png"), "chat_log": []},
+            "deleted": {"id": "deleted", "name": "deleted.png", "blob_hash": "def", "chat_log": []}
+        }
+    }
+    (data_dir / SESSION_LEGACY_DATA_FILE).write_text(json.dumps(snapshot), encoding="utf-8")
+    journal = [
+        {"op": "append_chat", "id": "inline", "messages": [{"role": "user", "parts": ["hello"]}]},
+        {"op": "delete_image", "id": "deleted"}
+    ]
+    (data_dir / SESSION_LEGACY_JOURNAL_FILE).write_text(
+        "".join(json.dumps(entry) + "\n" for entry in journal) + '{"op": "torn', encoding="utf-8"
+    )
+
+    # Visitors never get the shared data; only the operator's import does
+    assert session.load_session_data("visitor0000000001") == {}
+    assert has_legacy_session_data()
+
+    assert import_legacy_session("first") == 1
+    imported = load_session("first")
+    # The key of whoever used the shared store last is not handed on
+    assert imported[SESS_API_KEY] is None
+    record = imported[SESS_UPLOADED_IMAGES]["inline"]
+    assert "bytes_data" not in record
+    assert bytes(blob_store.read_blob(record["blob_hash"])) == b"png"
+    assert record["chat_log"] == [{"role": "user", "parts": ["hello"]}]
+
+    # The files are kept for reference, but no other session imports them again
+    assert not has_legacy_session_data()
+    assert os.path.exists(data_dir / (SESSION_LEGACY_DATA_FILE + ".imported"))
+    assert import_legacy_session("second") is None
+
+
+def test_import_command_creates_a_new_session(data_dir, capsys):
+    assert import_legacy_main([]) == 1
+    (data_dir / SESSION_LEGACY_DATA_FILE).write_text(json.dumps({
+        SESS_API_KEY: "old-key",
+        SESS_UPLOADED_IMAGES: {"chart": {"id": "chart", "name": "chart.png", "blob_hash": "abc", "chat_log": []}}
+    }), encoding="utf-8")
+
+    assert import_legacy_main([]) == 0
+    session_id = capsys.readouterr().out.split("into session ")[1].split(".")[0]
+    assert list(load_session(session_id)[SESS_UPLOADED_IMAGES]) == ["chart"]
@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("matplotlib")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FineTuning"))
+
+from streaming_dataset import StreamingChartDataset
+
+
+def test_samples_come_from_in_memory_charts():
+    dataset = StreamingChartDataset(num_charts=2, chart_types=["bar"], questions_per_chart=3, render_workers=1)
+    samples = list(dataset)
+    assert len(samples) == 6
+    assert all(sample["prompt"].endswith("in the bar chart?") for sample in samples)
+    assert samples[0]["image"].size[0] > 0
+
+
+def test_a_crashed_renderer_stops_the_stream_instead_of_hanging():
+    # An unknown chart type makes the render process fail on its first chart
+    dataset = StreamingChartDataset(num_charts=1, chart_types=["pie"], render_workers=1)
+    with pytest.raises(RuntimeError, match="render workers exited"):
+        next(iter(dataset))
@@ -0,0 +1,42 @@
+import pytest
+
+from chart_extraction import format_value_predictions
+from structured_results import _read_number, parse_structured_response
+
+
+@pytest.mark.parametrize("response_text", [
+    "not json", "[]", '{"values": []}', '{"series": ["a"]}', '{"series": "ab"}', '{"series": [{"name": "A"}]}'
+])
+def test_malformed_responses_are_rejected(response_text):
+    assert parse_structured_response(response_text) is None
+
+
+def test_series_with_the_same_name_are_kept_apart():
+    result = parse_structured_response(
+        '{"series": [{"name": "A", "points": [{"x": 1, "y": 2}]}, {"name": "A", "points": [{"x": 1, "y": 3}]},'
+        ' {"name": "", "bars": [{"label": "Q1", "value": 4}]}]}'
+    )
+    assert list(result) == ["A", "A (2)", "Series 3"]
+    assert result["A (2)"]["y"].tolist() == [3.0]
+    assert result["Series 3"]["x"].tolist() == ["Q1"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (12.5, 12.5), ("-3", -3.0), ("1,234", 1234.0), ("-12,345,678.5", -12345678.5), ("0,5", 0.5), ("1,5", 1.5),
+    ("0,500", 0.5), ("-0,250", -0.25),
+    ("1,2,3", None), ("1,234,5", None), ("1.234,5", None), ("abc", None), ("nan", None), (None, None), (True, None)
+])
+def test_read_number(value, expected):
+    assert _read_number(value) == expected
+
+
+def test_a_value_that_was_not_found_is_not_a_failed_request():
+    assert format_value_predictions([3], [None], ["No value was found in the chart."]) == (
+        "- **X = 3**: No value was found in the chart."
+    )
+    assert format_value_predictions([1, 2], [4.0, None], [None, "Out of range."]) == (
+        "- **X = 1**: 4\n- **X = 2**: Out of range."
+    )
+    assert format_value_predictions([1, 2], None, None, request_error="Quota exceeded") == (
+        "No values could be read: Quota exceeded"
+    )
@@ -0,0 +1,59 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+# The fine-tuning scripts import each other by module name from their own folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FineTuning"))
+
+from tensor_cache import TensorCacheDataset, build_tensor_cache, has_tensor_cache
+
+SOURCE = {"data_root": "/charts", "model_id": "tiny", "num_samples": 3}
+
+
+class FakeTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, texts, padding, return_tensors):
+        length = max(len(text) for text in texts)
+        ids = np.array([[ord(char) for char in text] + [0] * (length - len(text)) for text in texts])
+        return {"input_ids": ids, "attention_mask": (ids != 0).astype(np.int64)}
+
+
+class FakeProcessor:
+    tokenizer = FakeTokenizer()
+
+    def __call__(self, images, text, padding, return_tensors):
+        return {"pixel_values": np.stack(images), **self.tokenizer(text, padding, return_tensors)}
+
+
+@pytest.fixture
+def dataset():
+    return [{"image": np.full((3, 4, 4), index, dtype=np.float32), "prompt": f"q{index}", "answer": str(index)}
+            for index in range(3)]
+
+
+def test_cache_is_reused_only_with_the_same_settings(tmp_path, dataset):
+    cache_dir = str(tmp_path / "cache")
+    assert not has_tensor_cache(cache_dir, SOURCE)
+    build_tensor_cache(dataset, FakeProcessor(), cache_dir, SOURCE, shard_size=2)
+
+    assert has_tensor_cache(cache_dir, SOURCE)
+    assert not has_tensor_cache(cache_dir, {**SOURCE, "model_id": "other"})
+    assert not has_tensor_cache(cache_dir, {**SOURCE, "num_samples": 4})
+    assert not has_tensor_cache(cache_dir, SOURCE, max_label_length=32)
+
+    cached = TensorCacheDataset(cache_dir)
+    assert len(cached) == 3
+    assert cached[2]["pixel_values"][0, 0, 0] == 2
+    assert cached[1]["input_ids"][:cached[1]["input_lengths"]].tolist() == [ord("q"), ord("1")]
+
+
+def test_rebuild_replaces_the_index(tmp_path, dataset):
+    cache_dir = str(tmp_path / "cache")
+    build_tensor_cache(dataset, FakeProcessor(), cache_dir, SOURCE)
+    build_tensor_cache(dataset[:2], FakeProcessor(), cache_dir, {**SOURCE, "num_samples": 2})
+    assert has_tensor_cache(cache_dir, {**SOURCE, "num_samples": 2})
+    assert not has_tensor_cache(cache_dir, SOURCE)
+    assert len(TensorCacheDataset(cache_dir)) == 2
@@ -1,20 +1,71 @@
 import streamlit as st
 import io
+import math
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from app_config import (
     SESS_API_KEY,
     SESS_UPLOADED_IMAGES,
+    SESS_IMAGE_HASH_INDEX,
+    SESS_OPEN_CHARTS,
+    SESS_MODEL_NAME,
     GEMINI_MODEL_NAME,
-    SUPPORTED_IMAGE_TYPES
+    LOCAL_MODEL_NAMES,
+    SUPPORTED_IMAGE_TYPES,
+    BATCH_DEFAULT_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    UPLOAD_MAX_WORKERS,
+    CHARTS_PAGE_SIZES,
+    CHAT_WINDOW_SIZE,
+    CV_MIN_CONFIDENCE
 )
 from gemini_handler import (
-    generate_chat_response,
-    get_response_for_line_chart,
-    get_response_for_bar_chart,
-    get_response_for_scatter_plot
+    GeminiRequestError,
+    invalidate_gemini_models,
+    get_streaming_stats,
+    get_values_at_x,
+    select_conversation_history
+)
+from chart_extraction import (
+    describe_extraction_request,
+    describe_value_request,
+    format_value_predictions,
+    parse_x_values,
+    request_extraction,
+    parse_extraction_response,
+    request_local_extraction,
+    run_extractions
+)
+from local_backend import is_local_model, get_local_backend_stats
+from blob_store import compute_content_hash, write_blob
+from image_loader import has_image_data, get_pil_image, get_thumbnail
+from image_preprocessing import get_prepared_image
+from response_cache import get_cache_stats
+from request_scheduler import get_scheduler_stats
+from instrumentation import span, get_metrics_snapshot, export_prometheus, export_jsonl
+from structured_results import (
+    format_structured_result,
+    store_structured_result,
+    get_structured_results,
+    structured_results_to_csv
 )
 
+ANALYSIS_MODES = (
+    "Manual Question",
+    "Line Chart: Point Detection",
+    "Bar Chart: Value Extraction",
+    "Scatter Plot: Point Extraction"
+)
+# The local engine reads clean, matplotlib-style charts without a model call
+EXTRACTION_ENGINES = ("Gemini", "Local (Gemini fallback)")
+ANALYSIS_MODE_KEYS = {
+    "Manual Question": "manual",
+    "Line Chart: Point Detection": "line",
+    "Bar Chart: Value Extraction": "bar",
+    "Scatter Plot: Point Extraction": "scatter"
+}
+
 
 def render_sidebar():
     with st.sidebar:
@@ -32,6 +83,7 @@ def render_sidebar():
         with col1:
             if st.button("Save Key", key="save_api_key_button_sidebar_main"):
                 if new_api_key:
+                    invalidate_gemini_models(st.session_state.get(SESS_API_KEY))
                     st.session_state[SESS_API_KEY] = new_api_key
                     st.success("API Key saved!", icon="✅")
                     st.rerun()
@@ -39,6 +91,7 @@ def render_sidebar():
                     st.warning("Please enter an API Key to save.", icon="⚠️")
         with col2:
             if st.button("Clear Key", key="clear_api_key_button_sidebar_main"):
+                invalidate_gemini_models(st.session_state.get(SESS_API_KEY))
                 st.session_state[SESS_API_KEY] = None
                 st.info("API Key cleared.")
                 st.rerun()
@@ -50,7 +103,83 @@ def render_sidebar():
 
         st.markdown("---")
         st.caption("Upload chart images and ask questions about them.")
-        st.markdown(f"Using model: **{GEMINI_MODEL_NAME}**")
+        st.selectbox(
+            "Model:",
+            [GEMINI_MODEL_NAME] + [name for name in LOCAL_MODEL_NAMES if name != GEMINI_MODEL_NAME],
+            key=SESS_MODEL_NAME,
+            help="local: models run on this machine and need no API key. Requests from all sessions are batched."
+        )
+        local_stats = get_local_backend_stats().get(_get_model_name())
+        if local_stats:
+            col1, col2 = st.columns(2)
+            col1.metric("Avg batch size", f"{local_stats['avg_batch_size'] or 0:.1f}")
+            col2.metric("Waiting", local_stats["waiting"])
+
+        cache_stats = get_cache_stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Cache hits", cache_stats["hits"])
+        col2.metric("Cache misses", cache_stats["misses"])
+
+        streaming_stats = get_streaming_stats()
+        if streaming_stats["last_time_to_first_token"] is not None:
+            col1, col2 = st.columns(2)
+            col1.metric("Last TTFT", f"{streaming_stats['last_time_to_first_token']:.2f} s")
+            col2.metric("Avg TTFT", f"{streaming_stats['avg_time_to_first_token']:.2f} s")
+
+        if st.session_state.get(SESS_API_KEY):
+            scheduler_stats = get_scheduler_stats(st.session_state[SESS_API_KEY])
+            col1, col2 = st.columns(2)
+            col1.metric("Concurrency limit", scheduler_stats["concurrency_limit"])
+            col2.metric("In flight", scheduler_stats["in_flight"], f"{scheduler_stats['waiting']} waiting",
+                        delta_color="off")
+            col1.metric("Retries", scheduler_stats["retries"])
+            col2.metric("Throttled (429)", scheduler_stats["throttled"])
+
+        _render_diagnostics()
+
+
+def _get_model_name() -> str:
+    return st.session_state.get(SESS_MODEL_NAME) or GEMINI_MODEL_NAME
+
+
+def _has_model_access() -> bool:
+    return is_local_model(_get_model_name()) or bool(st.session_state.get(SESS_API_KEY))
+
+
+def _render_diagnostics():
+    with st.expander("Diagnostics", expanded=False):
+        metrics = get_metrics_snapshot()
+        if not metrics["spans"]:
+            st.caption("No timings recorded yet.")
+            return
+
+        st.dataframe(
+            [
+                {
+                    "operation": name,
+                    "calls": span_stats["count"],
+                    "errors": span_stats["errors"],
+                    "avg ms": round(span_stats["avg_seconds"] * 1000, 1),
+                    "p50 ≤ ms": span_stats["p50_seconds"] * 1000,
+                    "p95 ≤ ms": span_stats["p95_seconds"] * 1000
+                }
+                for name, span_stats in metrics["spans"].items()
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        for name, value in metrics["counters"].items():
+            st.caption(f"{name}: {value:,.0f}")
+
+        col1, col2 = st.columns(2)
+        col1.download_button(
+            "Prometheus", data=export_prometheus(), file_name="graphchat_metrics.prom",
+            mime="text/plain", key="download_metrics_prometheus"
+        )
+        col2.download_button(
+            "Spans (JSONL)", data=export_jsonl(), file_name="graphchat_spans.jsonl",
+            mime="application/jsonl", key="download_metrics_jsonl"
+        )
 
 
 def render_image_uploader():
@@ -63,41 +192,171 @@ def render_image_uploader():
     )
 
     if uploaded_files:
-        new_files_processed = False
+        hash_index = st.session_state[SESS_IMAGE_HASH_INDEX]
+        pending_uploads = {}
         for uploaded_file in uploaded_files:
-            is_duplicate = any(
-                img_data['name'] == uploaded_file.name and
-                img_data.get('size') == uploaded_file.size
-                for img_data in st.session_state[SESS_UPLOADED_IMAGES].values()
-            )
+            bytes_data = uploaded_file.getvalue()
+            blob_hash = compute_content_hash(bytes_data)
+            # Identical content is skipped whatever its file name, including repeats within one drop
+            if blob_hash not in hash_index and blob_hash not in pending_uploads:
+                pending_uploads[blob_hash] = (uploaded_file.name, uploaded_file.size, bytes_data)
 
-            if not is_duplicate:
-                img_id = str(uuid.uuid4())
-                bytes_data = uploaded_file.getvalue()
+        new_files_processed = False
+        with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(_load_uploaded_image, *upload): upload[0]
+                for upload in pending_uploads.values()
+            }
+            # Collected in drop order so charts are listed the way they were uploaded
+            for future in futures:
                 try:
-                    pil_image = Image.open(io.BytesIO(bytes_data))
-                    pil_image.verify()
-                    pil_image = Image.open(io.BytesIO(bytes_data))
-
-                    st.session_state[SESS_UPLOADED_IMAGES][img_id] = {
-                        "id": img_id,
-                        "name": uploaded_file.name,
-                        "size": uploaded_file.size,
-                        "bytes_data": bytes_data,
-                        "pil_image": pil_image,
-                        "chat_log": []
-                    }
-                    new_files_processed = True
+                    img_record = future.result()
                 except Exception as e:
                     st.error(
-                        f"Error processing file '{uploaded_file.name}': {e}. It might not be a valid image format."
+                        f"Error processing file '{futures[future]}': {e}. It might not be a valid image format."
                     )
+                    continue
+                st.session_state[SESS_UPLOADED_IMAGES][img_record['id']] = img_record
+                st.session_state[SESS_OPEN_CHARTS].add(img_record['id'])
+                hash_index[img_record['blob_hash']] = img_record['id']
+                new_files_processed = True
 
         if new_files_processed:
             st.session_state['file_uploader_key'] += 1
             st.rerun()
 
 
+def _load_uploaded_image(name: str, size: int, bytes_data: bytes) -> dict:
+    with span("upload_decode") as attributes:
+        attributes["bytes"] = size
+        pil_image = Image.open(io.BytesIO(bytes_data))
+        pil_image.verify()
+        pil_image = Image.open(io.BytesIO(bytes_data))
+
+        img_id = str(uuid.uuid4())
+        img_record = {
+            "id": img_id,
+            "name": name,
+            "size": size,
+            "bytes_data": bytes_data,
+            "blob_hash": write_blob(bytes_data),
+            "pil_image": pil_image,
+            "chat_log": []
+        }
+        get_prepared_image(img_record)
+        return img_record
+
+
+def _remove_image(img_id: str):
+    img_data = st.session_state[SESS_UPLOADED_IMAGES].pop(img_id)
+    st.session_state[SESS_OPEN_CHARTS].discard(img_id)
+    hash_index = st.session_state[SESS_IMAGE_HASH_INDEX]
+    if hash_index.get(img_data.get('blob_hash')) == img_id:
+        del hash_index[img_data['blob_hash']]
+
+
+def _record_structured_response(img_data: dict, mode: str, response_text: str) -> str:
+    # Structured modes answer in JSON; keep the numbers as arrays and show a readable summary in the chat
+    structured_result = parse_extraction_response(mode, response_text)
+    if structured_result is None:
+        return response_text
+    store_structured_result(img_data, mode, structured_result)
+    return format_structured_result(structured_result)
+
+
+def render_batch_analysis():
+    uploaded_images = st.session_state[SESS_UPLOADED_IMAGES]
+    if not uploaded_images:
+        return
+
+    with st.expander("Analyze All Charts", expanded=False):
+        with st.form(key="batch_analysis_form"):
+            selected_ids = st.multiselect(
+                "Charts to analyze:",
+                options=list(uploaded_images),
+                default=list(uploaded_images),
+                format_func=lambda img_id: uploaded_images[img_id]['name']
+            )
+            analysis_mode = st.selectbox("Choose analysis method:", ANALYSIS_MODES)
+            user_prompt = st.text_input("Question (Manual Question only):")
+            num_points = st.number_input(
+                "Number of points to detect (line and scatter only):", min_value=2, step=1, value=10
+            )
+            max_workers = st.slider(
+                "Concurrent requests:", min_value=1, max_value=BATCH_MAX_CONCURRENCY, value=BATCH_DEFAULT_CONCURRENCY
+            )
+            submitted = st.form_submit_button("Analyze Selected Charts")
+
+        if submitted:
+            current_api_key = st.session_state.get(SESS_API_KEY)
+            selected_images = [
+                uploaded_images[img_id] for img_id in selected_ids
+                if has_image_data(uploaded_images[img_id])
+            ]
+            if not _has_model_access():
+                st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
+            elif analysis_mode == "Manual Question" and not user_prompt:
+                st.warning("Please enter a question to ask about the selected charts.")
+            elif not selected_images:
+                st.warning("No image data available for the selected charts.")
+            else:
+                mode = ANALYSIS_MODE_KEYS[analysis_mode]
+                model_name = _get_model_name()
+                user_display_message = describe_extraction_request(mode, num_points, user_prompt)
+
+                def extract(img_data: dict) -> str:
+                    return request_extraction(
+                        mode, current_api_key, get_prepared_image(img_data), num_points=num_points,
+                        user_prompt=user_prompt, image_hash=img_data['prepared_blob_hash'], model_name=model_name
+                    )
+
+                progress_bar = st.progress(0.0, text=f"Analyzing {len(selected_images)} charts...")
+                for img_data in selected_images:
+                    img_data['chat_log'].append({"role": "user", "parts": [user_display_message]})
+                results = run_extractions(selected_images, extract, max_workers)
+                for completed, (img_data, response_text, error) in enumerate(results, start=1):
+                    if error is not None:
+                        response_text = f"An error occurred while preparing this chart for Gemini: {error}. "
+                    response_text = _record_structured_response(img_data, mode, response_text)
+                    img_data['chat_log'].append({"role": "model", "parts": [response_text]})
+                    progress_bar.progress(
+                        completed / len(selected_images), text=f"Analyzed {completed} of {len(selected_images)} charts"
+                    )
+                st.rerun()
+
+
+def _get_visible_chart_ids(uploaded_images: dict) -> list:
+    search_col, page_size_col, page_col = st.columns([0.6, 0.2, 0.2])
+    with search_col:
+        search_query = st.text_input("Search charts by name:", key="chart_search_query").strip().lower()
+    matching_ids = [
+        img_id for img_id, img_data in uploaded_images.items()
+        if search_query in img_data['name'].lower()
+    ]
+    with page_size_col:
+        page_size = st.selectbox("Charts per page:", CHARTS_PAGE_SIZES, key="charts_page_size")
+    num_pages = max(1, math.ceil(len(matching_ids) / page_size))
+    with page_col:
+        page = st.selectbox("Page:", range(1, num_pages + 1))
+
+    first_index = (page - 1) * page_size
+    page_ids = matching_ids[first_index:first_index + page_size]
+    if page_ids:
+        st.caption(f"Showing charts {first_index + 1}-{first_index + len(page_ids)} of {len(matching_ids)}")
+    else:
+        st.caption("No charts match the search.")
+    return page_ids
+
+
+def _render_chart_summary_row(img_id: str, img_data: dict):
+    with st.container(border=True):
+        name_col, button_col = st.columns([0.85, 0.15])
+        name_col.markdown(f"**{img_data['name']}** · {len(img_data['chat_log'])} messages")
+        if button_col.button("Open", key=f"open_chart_{img_id}"):
+            st.session_state[SESS_OPEN_CHARTS].add(img_id)
+            st.rerun()
+
+
 def render_analysis_sections():
     if not st.session_state[SESS_UPLOADED_IMAGES]:
         st.info("No images uploaded yet. Use the uploader above to add some charts to analyze.")
@@ -105,41 +364,64 @@ def render_analysis_sections():
 
     st.subheader("Your Uploaded Charts & Analysis")
 
-    for img_id, img_data in list(st.session_state[SESS_UPLOADED_IMAGES].items()):
+    uploaded_images = st.session_state[SESS_UPLOADED_IMAGES]
+    open_charts = st.session_state[SESS_OPEN_CHARTS]
+    # Only one page of charts is rendered per rerun, and only open charts render their full section
+    for img_id in _get_visible_chart_ids(uploaded_images):
+        img_data = uploaded_images[img_id]
+        if img_id not in open_charts:
+            _render_chart_summary_row(img_id, img_data)
+            continue
+
         with st.expander(f"Analyze Chart: {img_data['name']}", expanded=True):
+            if st.button("Collapse", key=f"collapse_chart_{img_id}"):
+                open_charts.discard(img_id)
+                st.rerun()
             col1, col2 = st.columns([0.4, 0.6])
 
             with col1:
-                if 'pil_image' not in img_data or img_data['pil_image'] is None:
-                    if 'bytes_data' in img_data and img_data['bytes_data']:
-                        try:
-                            current_bytes_data = img_data['bytes_data']
-                            if isinstance(current_bytes_data, list):
-                                current_bytes_data = bytes(current_bytes_data)
-
-                            img_data['pil_image'] = Image.open(io.BytesIO(current_bytes_data))
-                        except Exception as e:
-                            st.error(f"Could not reconstruct image for '{img_data['name']}': {e}")
-                            if st.button(f"Remove Corrupted Image", key=f"remove_corrupted_{img_id}"):
-                                del st.session_state[SESS_UPLOADED_IMAGES][img_id]
-                                st.rerun()
-                            continue
-                    else:
-                        st.warning(f"No valid image data available for '{img_data['name']}'.")
-                        continue
-
-                if 'pil_image' in img_data and img_data['pil_image'] is not None:
-                    st.image(img_data['pil_image'], caption=img_data['name'], use_container_width=True)
-                else:
-                    st.warning(f"Image '{img_data['name']}' could not be displayed.")
+                try:
+                    thumbnail = get_thumbnail(img_data)
+                except Exception as e:
+                    st.error(f"Could not reconstruct image for '{img_data['name']}': {e}")
+                    if st.button(f"Remove Corrupted Image", key=f"remove_corrupted_{img_id}"):
+                        _remove_image(img_id)
+                        st.rerun()
+                    continue
+
+                if thumbnail is None:
+                    st.warning(f"No valid image data available for '{img_data['name']}'.")
+                    continue
+
+                st.image(thumbnail, caption=img_data['name'], use_container_width=True)
+
+                structured_results = get_structured_results(img_data)
+                if structured_results:
+                    st.download_button(
+                        "Download Extracted Data (CSV)",
+                        data=structured_results_to_csv(structured_results),
+                        file_name=f"{img_data['name'].rsplit('.', 1)[0]}_extracted.csv",
+                        mime="text/csv",
+                        key=f"download_extracted_data_{img_id}"
+                    )
 
                 if st.button(f"Remove Image", key=f"delete_button_img_{img_id}"):
-                    del st.session_state[SESS_UPLOADED_IMAGES][img_id]
+                    _remove_image(img_id)
                     st.rerun()
 
             with col2:
                 st.write(f"**Chat with Gemini about: __{img_data['name']}__**")
-                for message in img_data['chat_log']:
+                chat_window_key = f"chat_window_{img_id}"
+                chat_window = st.session_state.get(chat_window_key, CHAT_WINDOW_SIZE)
+                hidden_messages = len(img_data['chat_log']) - chat_window
+                if hidden_messages > 0:
+                    if st.button(
+                        f"Show {min(hidden_messages, CHAT_WINDOW_SIZE)} earlier messages",
+                        key=f"show_earlier_messages_{img_id}"
+                    ):
+                        st.session_state[chat_window_key] = chat_window + CHAT_WINDOW_SIZE
+                        st.rerun()
+                for message in img_data['chat_log'][-chat_window:]:
                     avatar_icon = "❔" if message["role"] == "user" else "👾"
                     with st.chat_message(message["role"], avatar=avatar_icon):
                         st.markdown(message["parts"][0])
@@ -147,27 +429,61 @@ def render_analysis_sections():
                 st.write("")
                 analysis_mode = st.radio(
                     "Choose analysis method:",
-                    ("Manual Question", "Line Chart: Point Detection", "Bar Chart: Value Extraction", "Scatter Plot: Point Extraction"),
+                    ANALYSIS_MODES,
                     key=f"analysis_mode_radio_{img_id}"
                 )
 
-                current_pil_image = img_data.get('pil_image')
+                image_available = has_image_data(img_data)
+                use_local_engine = False
+                if analysis_mode != "Manual Question":
+                    use_local_engine = st.radio(
+                        "Extraction engine:",
+                        EXTRACTION_ENGINES,
+                        horizontal=True,
+                        key=f"extraction_engine_radio_{img_id}"
+                    ) == EXTRACTION_ENGINES[1]
 
                 if analysis_mode == "Manual Question":
+                    use_cached_answers = st.checkbox(
+                        "Reuse cached answers", value=True, key=f"use_cache_checkbox_{img_id}"
+                    )
+                    continue_conversation = st.checkbox(
+                        "Answer follow-up questions in context", value=True, key=f"conversation_checkbox_{img_id}",
+                        help="Earlier questions and answers in this chat are sent with the question, and the chart is "
+                             "uploaded once instead of with every question. Extraction results and errors are left out."
+                    )
+                    with st.form(key=f"read_values_form_{img_id}"):
+                        x_values_text = st.text_input("Read the Y values at these X values (comma separated):")
+                        submitted = st.form_submit_button("Read Values")
+                        if submitted:
+                            _run_value_reading(img_data, parse_x_values(x_values_text), use_cached_answers,
+                                               image_available)
                     user_prompt = st.chat_input(f"Ask a question about {img_data['name']}...", key=f"chat_input_img_{img_id}")
                     if user_prompt:
                         current_api_key = st.session_state.get(SESS_API_KEY)
-                        if not current_api_key:
+                        if not _has_model_access():
                             st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
-                        elif not current_pil_image:
+                        elif not image_available:
                             st.warning("Image data not available for analysis.")
                         else:
-                            img_data['chat_log'].append({"role": "user", "parts": [user_prompt]})
-                            with st.spinner("Gemini is thinking..."):
-                                response_text = generate_chat_response(
-                                    api_key=current_api_key, pil_image=current_pil_image, user_prompt=user_prompt
-                                )
-                            img_data['chat_log'].append({"role": "model", "parts": [response_text]})
+                            history = select_conversation_history(img_data['chat_log']) if continue_conversation else None
+                            img_data['chat_log'].append({"role": "user", "parts": [user_prompt], "conversation": True})
+                            model_image = get_prepared_image(img_data)
+                            with st.chat_message("user", avatar="❔"):
+                                st.markdown(user_prompt)
+                            with st.chat_message("model", avatar="👾"):
+                                response_text = st.write_stream(request_extraction(
+                                    "manual",
+                                    api_key=current_api_key,
+                                    image=model_image,
+                                    user_prompt=user_prompt,
+                                    image_hash=img_data['prepared_blob_hash'],
+                                    use_cache=use_cached_answers,
+                                    stream=True,
+                                    model_name=_get_model_name(),
+                                    history=history
+                                ))
+                            img_data['chat_log'].append({"role": "model", "parts": [response_text], "conversation": True})
                             st.rerun()
 
                 elif analysis_mode == "Line Chart: Point Detection":
@@ -175,58 +491,95 @@ def render_analysis_sections():
                         num_points = st.number_input("Enter the number of points to detect:", min_value=2, step=1, value=10)
                         submitted = st.form_submit_button("Detect Points")
                         if submitted:
-                            current_api_key = st.session_state.get(SESS_API_KEY)
-                            if not current_api_key:
-                                st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
-                            elif not current_pil_image:
-                                st.warning("Image data not available for analysis.")
-                            else:
-                                user_display_message = f"Request for detection of {num_points} points on a line chart."
-                                img_data['chat_log'].append({"role": "user", "parts": [user_display_message]})
-                                with st.spinner("Gemini is analyzing the line chart..."):
-                                    response_text = get_response_for_line_chart(
-                                        api_key=current_api_key, pil_image=current_pil_image, num_points=num_points
-                                    )
-                                img_data['chat_log'].append({"role": "model", "parts": [response_text]})
-                                st.rerun()
+                            _run_structured_extraction(img_data, "line", use_local_engine, image_available, num_points)
 
                 elif analysis_mode == "Bar Chart: Value Extraction":
                     with st.form(key=f"bar_chart_form_{img_id}"):
                         submitted = st.form_submit_button("Extract Bar Values")
                         if submitted:
-                            current_api_key = st.session_state.get(SESS_API_KEY)
-                            if not current_api_key:
-                                st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
-                            elif not current_pil_image:
-                                st.warning("Image data not available for analysis.")
-                            else:
-                                user_display_message = "Request for bar chart value extraction."
-                                img_data['chat_log'].append({"role": "user", "parts": [user_display_message]})
-                                with st.spinner("Gemini is analyzing the bar chart..."):
-                                    response_text = get_response_for_bar_chart(
-                                        api_key=current_api_key, pil_image=current_pil_image
-                                    )
-                                img_data['chat_log'].append({"role": "model", "parts": [response_text]})
-                                st.rerun()
+                            _run_structured_extraction(img_data, "bar", use_local_engine, image_available)
 
                 elif analysis_mode == "Scatter Plot: Point Extraction":
                     with st.form(key=f"scatter_plot_form_{img_id}"):
                         num_points = st.number_input("Enter the number of points to detect:", min_value=2, step=1,value=10)
                         submitted = st.form_submit_button("Extract All Points")
                         if submitted:
-                            current_api_key = st.session_state.get(SESS_API_KEY)
-                            if not current_api_key:
-                                st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
-                            elif not current_pil_image:
-                                st.warning("Image data not available for analysis.")
-                            else:
-                                user_display_message = f"Request for detection of {num_points} points on a scatter plot."
-                                img_data['chat_log'].append({"role": "user", "parts": [user_display_message]})
-                                with st.spinner("Gemini is analyzing the scatter plot..."):
-                                    response_text = get_response_for_scatter_plot(
-                                        api_key=current_api_key,
-                                        pil_image=current_pil_image,
-                                        num_points=num_points
-                                    )
-                                img_data['chat_log'].append({"role": "model", "parts": [response_text]})
-                                st.rerun()
\ No newline at end of file
+                            _run_structured_extraction(img_data, "scatter", use_local_engine, image_available, num_points)
+
+
+def _run_structured_extraction(img_data: dict, mode: str, use_local_engine: bool, image_available: bool,
+                               num_points: int = None):
+    current_api_key = st.session_state.get(SESS_API_KEY)
+    if not use_local_engine and not _has_model_access():
+        st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
+        return
+    if not image_available:
+        st.warning("Image data not available for analysis.")
+        return
+
+    response_text, note = None, None
+    if use_local_engine:
+        local_text, confidence = request_local_extraction(mode, get_pil_image(img_data), num_points)
+        if local_text is not None and confidence >= CV_MIN_CONFIDENCE:
+            response_text = local_text
+            note = f"_Read locally (confidence {confidence:.0%})._"
+        elif not _has_model_access():
+            st.warning(
+                f"The local extractor could not read this chart reliably (confidence {confidence:.0%}). "
+                "Set your Gemini API Key in the sidebar to fall back to Gemini.", icon="🔑"
+            )
+            return
+        else:
+            note = f"_Local extraction was not confident ({confidence:.0%}), answered by {_get_model_name()}._"
+
+    user_display_message = describe_extraction_request(mode, num_points)
+    img_data['chat_log'].append({"role": "user", "parts": [user_display_message]})
+    with st.chat_message("user", avatar="❔"):
+        st.markdown(user_display_message)
+    if response_text is None:
+        with st.chat_message("model", avatar="👾"):
+            response_text = st.write_stream(request_extraction(
+                mode,
+                api_key=current_api_key,
+                image=get_prepared_image(img_data),
+                num_points=num_points,
+                image_hash=img_data['prepared_blob_hash'],
+                stream=True,
+                model_name=_get_model_name()
+            ))
+    response_text = _record_structured_response(img_data, mode, response_text)
+    if note:
+        response_text = f"{response_text}\n\n{note}"
+    img_data['chat_log'].append({"role": "model", "parts": [response_text]})
+    st.rerun()
+
+
+def _run_value_reading(img_data: dict, x_values: list, use_cache: bool, image_available: bool):
+    # All X values go to Gemini in one request
+    current_api_key = st.session_state.get(SESS_API_KEY)
+    if not x_values:
+        st.warning("Enter at least one X value.")
+        return
+    if not _has_model_access():
+        st.warning("Please set your Gemini API Key in the sidebar.", icon="🔑")
+        return
+    if not image_available:
+        st.warning("Image data not available for analysis.")
+        return
+
+    user_display_message = describe_value_request(x_values)
+    img_data['chat_log'].append({"role": "user", "parts": [user_display_message]})
+    with st.chat_message("user", avatar="❔"):
+        st.markdown(user_display_message)
+    with st.chat_message("model", avatar="👾"):
+        with st.spinner("Reading values..."):
+            try:
+                predictions, errors = get_values_at_x(
+                    current_api_key, get_prepared_image(img_data), x_values, image_hash=img_data['prepared_blob_hash'],
+                    use_cache=use_cache, raise_errors=True, model_name=_get_model_name()
+                )
+                response_text = format_value_predictions(x_values, predictions, errors)
+            except GeminiRequestError as e:
+                response_text = format_value_predictions(x_values, None, None, request_error=str(e))
+    img_data['chat_log'].append({"role": "model", "parts": [response_text]})
+    st.rerun()